@@ -0,0 +1,42 @@
+"""Measures `ExpiringDict.get` latency against the number of stored sessions.
+
+Run with: python benchmarks/bench_in_memory.py
+Lookup time should stay flat from 1k to 1M sessions.
+"""
+import random
+import time
+import uuid
+
+from sanic_session.utils import ExpiringDict
+
+
+SIZES = (1000, 10000, 100000, 1000000)
+LOOKUPS = 100000
+PAYLOAD = '{"user_id":42,"csrf":"%s"}' % uuid.uuid4().hex
+
+
+def bench(size):
+    store = ExpiringDict()
+    keys = ['session:' + uuid.uuid4().hex for _ in range(size)]
+    for key in keys:
+        store.set(key, PAYLOAD, 3600)
+
+    sample = [random.choice(keys) for _ in range(LOOKUPS)]
+    get = store.get
+
+    start = time.perf_counter()
+    for key in sample:
+        get(key)
+    elapsed = time.perf_counter() - start
+
+    return elapsed / LOOKUPS * 1e9
+
+
+def main():
+    print('{:>10}  {:>12}'.format('sessions', 'ns/lookup'))
+    for size in SIZES:
+        print('{:>10}  {:>12.1f}'.format(size, bench(size)))
+
+
+if __name__ == '__main__':
+    main()
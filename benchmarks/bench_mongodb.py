@@ -0,0 +1,73 @@
+"""Compares MongoDB session lookups: without and with the unique `sid`
+index, and fetching whole documents versus projecting only `data`, which
+is what MongoDBSessionInterface does.
+
+Needs motor and a running mongod; the `MONGO_URL` environment variable
+defaults to mongodb://localhost:27017. A throwaway database is created and
+dropped.
+
+Run with: python benchmarks/bench_mongodb.py
+"""
+import asyncio
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import ujson
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:  # pragma: no cover
+    AsyncIOMotorClient = None
+
+
+SESSIONS = 20000
+LOOKUPS = 2000
+PAYLOAD = ujson.dumps({
+    'user_id': 42,
+    'cart': [{'sku': 'SKU-{}'.format(i), 'qty': 1} for i in range(100)],
+})
+
+
+async def time_lookups(coll, sids, projection):
+    start = time.perf_counter()
+    for sid in sids:
+        await coll.find_one({'sid': sid}, projection)
+    return (time.perf_counter() - start) / len(sids) * 1e6
+
+
+async def main():
+    client = AsyncIOMotorClient(
+        os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    db = client['sanic_session_bench_{}'.format(uuid.uuid4().hex[:8])]
+    coll = db['session']
+
+    try:
+        expiry = datetime.utcnow() + timedelta(days=1)
+        sids = [uuid.uuid4().hex for _ in range(SESSIONS)]
+        await coll.insert_many([
+            {'sid': sid, 'expiry': expiry, 'data': PAYLOAD} for sid in sids
+        ])
+        sample = [random.choice(sids) for _ in range(LOOKUPS)]
+
+        print('{:>10} {:>12} {:>10}'.format('index', 'projection', 'us/read'))
+        for projection in (None, {'data': 1, '_id': 0}):
+            us = await time_lookups(coll, sample, projection)
+            print('{:>10} {:>12} {:>10.1f}'.format(
+                'none', 'data' if projection else 'all', us))
+
+        await coll.create_index('sid', unique=True)
+        for projection in (None, {'data': 1, '_id': 0}):
+            us = await time_lookups(coll, sample, projection)
+            print('{:>10} {:>12} {:>10.1f}'.format(
+                'sid', 'data' if projection else 'all', us))
+    finally:
+        await client.drop_database(db.name)
+
+
+if __name__ == '__main__':
+    if AsyncIOMotorClient is None:
+        raise SystemExit('Please install motor: pip install sanic_session[mongo]')
+    asyncio.get_event_loop().run_until_complete(main())
@@ -0,0 +1,84 @@
+"""Compares session serializers on realistic session payloads.
+
+Run with: python benchmarks/bench_serializers.py
+Serializers whose dependency is not installed are skipped.
+"""
+import time
+import uuid
+
+from sanic_session.serializers import (
+    JSONSerializer, OrjsonSerializer, MsgpackSerializer,
+    CompressedSerializer,
+)
+
+
+ROUNDS = 2000
+
+PAYLOADS = {
+    'login': {
+        'user_id': 1234567,
+        'csrf_token': uuid.uuid4().hex,
+        'locale': 'en_US',
+        'last_seen': 1537000000.123,
+    },
+    'cart': {
+        'user_id': 1234567,
+        'cart': [
+            {
+                'sku': 'SKU-{:06d}'.format(i),
+                'title': 'Product number {}'.format(i),
+                'qty': i % 5 + 1,
+                'price': 19.99 + i,
+                'options': {'color': 'blue', 'size': 'M'},
+            }
+            for i in range(150)
+        ],
+    },
+    'flags': {
+        'flags': {
+            'feature_{}'.format(i): {'enabled': i % 2 == 0, 'variant': i % 7}
+            for i in range(800)
+        },
+    },
+}
+
+
+def bench(serializer, payload):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        value = serializer.dumps(payload)
+    dumps = (time.perf_counter() - start) / ROUNDS * 1e6
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        serializer.loads(value)
+    loads = (time.perf_counter() - start) / ROUNDS * 1e6
+
+    return len(value), dumps, loads
+
+
+def main():
+    serializers = [
+        ('json', JSONSerializer),
+        ('json+zlib', CompressedSerializer),
+    ]
+    for name, cls in (('orjson', OrjsonSerializer),
+                      ('msgpack', MsgpackSerializer)):
+        try:
+            cls()
+        except RuntimeError:
+            print('{}: not installed, skipped'.format(name))
+        else:
+            serializers.append((name, cls))
+
+    print('{:>8} {:>10} {:>10} {:>11} {:>11}'.format(
+        'payload', 'codec', 'bytes', 'dumps, us', 'loads, us'))
+    for payload_name, payload in PAYLOADS.items():
+        for name, cls in serializers:
+            size, dumps, loads = bench(cls(), payload)
+            print('{:>8} {:>10} {:>10} {:>11.1f} {:>11.1f}'.format(
+                payload_name, name, size, dumps, loads))
+
+
+if __name__ == '__main__':
+    main()
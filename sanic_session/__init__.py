@@ -1,20 +1,41 @@
+from .base import SessionInterface, BaseSessionInterface
 from .aioredis import AIORedisSessionInterface
 from .asyncio_redis import AsyncioRedisSessionInterface
 from .memcache import MemcacheSessionInterface
 from .in_memory import InMemorySessionInterface
+from .shared_memory import SharedMemorySessionInterface
+from .mongodb import MongoDBSessionInterface
+from .sqlite import SQLiteSessionInterface
+from .tiered import TieredSessionInterface
+from .sharding import ShardedSessionInterface
+from .cookie import CookieSessionInterface
+from .hybrid import HybridSessionInterface
+from .serializers import (
+    JSONSerializer, OrjsonSerializer, MsgpackSerializer,
+    CompressedSerializer,
+)
 
 
 def install_middleware(app, interface, *args, **kwargs):
     """Installs middleware to application, which will be launched every request.
     'app' - sanic 'Application' instance to add middleware.
-    'interface' - name of interface to use.
-    Can be:
-        InMemorySessionInterface,
+    'interface' - name of interface to use, or an already created
+    session interface instance (e.g. a TieredSessionInterface wrapping
+    another one).
+    Names can be:
+        InMemorySessionInterface, SharedMemorySessionInterface,
         AIORedisSessionInterface, AsyncioRedisSessionInterface,
-        MemcacheSessionInterface, MongoDBSessionInterface
+        MemcacheSessionInterface, MongoDBSessionInterface,
+        SQLiteSessionInterface,
+        TieredSessionInterface, ShardedSessionInterface,
+        CookieSessionInterface, HybridSessionInterface
     """
-    if interface == 'InMemorySessionInterface':
+    if isinstance(interface, SessionInterface):
+        session_interface = interface
+    elif interface == 'InMemorySessionInterface':
         session_interface = InMemorySessionInterface(*args, **kwargs)
+    elif interface == 'SharedMemorySessionInterface':
+        session_interface = SharedMemorySessionInterface(*args, **kwargs)
     elif interface == 'AIORedisSessionInterface':
         session_interface = AIORedisSessionInterface(*args, **kwargs)
     elif interface == 'AsyncioRedisSessionInterface':
@@ -23,6 +44,16 @@ def install_middleware(app, interface, *args, **kwargs):
         session_interface = MemcacheSessionInterface(*args, **kwargs)
     elif interface == 'MongoDBSessionInterface':
         session_interface = MongoDBSessionInterface(*args, **kwargs)
+    elif interface == 'SQLiteSessionInterface':
+        session_interface = SQLiteSessionInterface(*args, **kwargs)
+    elif interface == 'TieredSessionInterface':
+        session_interface = TieredSessionInterface(*args, **kwargs)
+    elif interface == 'ShardedSessionInterface':
+        session_interface = ShardedSessionInterface(*args, **kwargs)
+    elif interface == 'CookieSessionInterface':
+        session_interface = CookieSessionInterface(*args, **kwargs)
+    elif interface == 'HybridSessionInterface':
+        session_interface = HybridSessionInterface(*args, **kwargs)
 
     if not hasattr(app, 'extensions'):
         app.extensions = {}
@@ -39,6 +70,13 @@ def install_middleware(app, interface, *args, **kwargs):
         """
         await session_interface.save(request, response)
 
+    @app.listener('before_server_stop')
+    async def flush_sessions(app, loop):
+        """Write sessions whose saves are still delayed (see
+        `write_behind_delay`) before the server stops.
+        """
+        await session_interface.flush()
+
     # open session before other middleware:
     app.request_middleware.appendleft(add_session_to_request)
     app.response_middleware.append(save_session)
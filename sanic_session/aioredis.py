@@ -1,4 +1,12 @@
-from .base import BaseSessionInterface
+import asyncio
+import math
+import time
+
+from .base import BaseSessionInterface, SessionDict
+from .batching import Batcher
+from .replicas import ReplicaRouter
+from .serializers import JSONSerializer
+from .utils import BoundedExpiringDict
 
 
 def check_aioredis_installed():
@@ -13,7 +21,7 @@ def check_aioredis_installed():
 class AIORedisSessionInterface(BaseSessionInterface):
     def __init__(
             self,
-            redis,
+            redis=None,
             domain: str=None,
             expiry: int = 2592000,
             httponly: bool=True,
@@ -21,11 +29,35 @@ class AIORedisSessionInterface(BaseSessionInterface):
             prefix: str='session:',
             sessioncookie: bool=False,
             pass_dependency_check: bool=False,
+            only_save_modified: bool=False,
+            touch_interval: int=0,
+            lazy: bool=False,
+            serializer=None,
+            use_hash: bool=False,
+            track_nested: bool=False,
+            coalesce_reads: bool=True,
+            write_behind_delay: float=None,
+            batch_window: float=None,
+            batch_max_size: int=100,
+            app=None,
+            redis_address=None,
+            pool_minsize: int=1,
+            pool_maxsize: int=10,
+            pool_idle_timeout: float=None,
+            command_timeout: float=None,
+            replicas: list=None,
+            replica_strategy: str='round_robin',
+            read_your_writes_window: float=1.0,
+            tracking_redis=None,
+            client_cache_max_sessions: int=10000,
+            client_cache_expiry: float=300,
         ):
         """Initializes a session interface backed by Redis.
         Args:
-            redis (Callable):
-                aioredis connection or connection pool instance.
+            redis (Callable, optional):
+                aioredis connection or connection pool instance. When
+                omitted, the interface creates and owns a connection pool,
+                see `redis_address`.
             domain (str, optional):
                 Optional domain which will be attached to the cookie.
             expiry (int, optional):
@@ -45,10 +77,123 @@ class AIORedisSessionInterface(BaseSessionInterface):
                 Specifies, whether to check: are dependencies for
                 session interface installed.
                 Check can be passed, for example, when running tests.
+            only_save_modified (bool, optional):
+                Write the session to the datastore only when it was modified
+                during the request. The expiration of unmodified sessions is
+                refreshed instead, see `touch_interval`.
+            touch_interval (int, optional):
+                With `only_save_modified`, minimal number of seconds between
+                expiration refreshes (in the datastore and in the cookie) of
+                an unmodified session. 0 refreshes it on every request,
+                None never refreshes it.
+            lazy (bool, optional):
+                Read the session from the datastore only when a handler
+                loads it with `await request['session'].load()`, so that
+                requests which do not use the session cost no datastore
+                round trip.
+            serializer (optional):
+                Object with `dumps` and `loads` methods which convert session
+                data to the stored value and back, see
+                `sanic_session.serializers`. Defaults to JSONSerializer.
+            use_hash (bool, optional):
+                Store each session as a Redis hash with one field per session
+                key, instead of a single serialized value. Saving a session
+                then writes only the keys which were changed or removed
+                during the request (HSET/HDEL and EXPIRE in one pipeline).
+                Sessions stored with the other mode can't be read, so use a
+                different `prefix` when switching.
+            track_nested (bool, optional):
+                Detect in-place changes of mutable session values, e.g.
+                `request['session']['cart'].append(item)`, by comparing them
+                with copies taken when the session was loaded. Costs a deep
+                copy of those values per request. Without it such changes
+                need an explicit `request['session']['cart'] = cart`.
+            coalesce_reads (bool, optional):
+                Share a single datastore read between concurrent requests
+                which open the same session in this worker, e.g. parallel
+                XHRs from one page. Enabled by default.
+            write_behind_delay (float, optional):
+                Delay writes of saved sessions by this many seconds, merging
+                all saves of a session within the delay into one datastore
+                write. Delayed writes are flushed before the server stops
+                when the interface is installed with `install_middleware`
+                outside of server listeners; otherwise call `flush()` in a
+                'before_server_stop' listener. Disabled by default.
+            batch_window (float, optional):
+                Collect store operations of concurrent requests for this many
+                seconds (e.g. 0.0005) and send them together: reads as one
+                MGET, writes as one pipeline. Raises throughput per connection
+                at high concurrency at the cost of up to `batch_window`
+                seconds of latency. Disabled by default.
+            batch_max_size (int, optional):
+                Maximum number of operations sent together; a full batch is
+                sent without waiting for the end of `batch_window`.
+            app (sanic.Sanic, optional):
+                Sanic instance, required when the interface creates its own
+                connection pool: the pool is created in a
+                'before_server_start' listener and closed in an
+                'after_server_stop' one, so the interface must be created
+                before the server starts.
+            redis_address (optional):
+                Address of the Redis server, e.g. 'redis://localhost' or
+                ('localhost', 6379). When given instead of `redis`, the
+                interface creates and owns a connection pool.
+            pool_minsize (int, optional):
+                Minimal number of connections of the owned pool.
+            pool_maxsize (int, optional):
+                Maximal number of connections of the owned pool.
+            pool_idle_timeout (float, optional):
+                Every this many seconds, idle connections of the owned pool
+                are closed if more than `pool_minsize` connections stayed
+                free since the previous check. Disabled by default.
+            command_timeout (float, optional):
+                Seconds after which a Redis command is abandoned and
+                asyncio.TimeoutError is raised. Disabled by default.
+            replicas (list, optional):
+                aioredis connections or connection pools of read replicas of
+                `redis`. Session reads are sent to them, and to `redis` when
+                a replica fails. Writes always go to `redis`.
+            replica_strategy (str, optional):
+                'round_robin' spreads reads evenly over the replicas,
+                'least_latency' sends them to the replica which answered
+                fastest recently.
+            read_your_writes_window (float, optional):
+                Seconds after a session is written during which it is read
+                from `redis` rather than from a replica which may not have
+                received the write yet. The time of the write is sent in a
+                `<cookie_name>-written` cookie, so that every worker knows
+                it. Statistics are available on `replica_router`.
+            tracking_redis (optional):
+                Dedicated aioredis connection (not a pool) which enables
+                server-assisted client side caching (Redis 6+): sessions
+                read by this worker are kept in a local cache, and the
+                connection turns on CLIENT TRACKING in broadcasting mode for
+                `prefix` and receives invalidation messages for sessions
+                changed by anyone. Until the subscription is set up, and
+                after the connection is lost, sessions are read from Redis.
+                Statistics are available as `client_cache_hits` and
+                `client_cache_misses`.
+            client_cache_max_sessions (int, optional):
+                Maximum number of sessions in the local cache, least
+                recently used ones are evicted.
+            client_cache_expiry (float, optional):
+                Seconds a session is served from the local cache before it
+                is read from Redis again.
         """
         if not pass_dependency_check:
             check_aioredis_installed()
 
+        if use_hash and write_behind_delay:
+            raise ValueError("write_behind_delay can't be used with use_hash")
+
+        if tracking_redis is not None and (use_hash or replicas):
+            raise ValueError(
+                "tracking_redis can't be used with use_hash or replicas")
+
+        if redis is None and (app is None or redis_address is None):
+            raise ValueError(
+                "Either redis, or app and redis_address should be passed")
+
         self.redis = redis
         self.expiry = expiry
         self.prefix = prefix
@@ -56,13 +201,333 @@ class AIORedisSessionInterface(BaseSessionInterface):
         self.domain = domain
         self.httponly = httponly
         self.sessioncookie = sessioncookie
+        self.only_save_modified = only_save_modified
+        self.touch_interval = touch_interval
+        self.lazy = lazy
+        self.serializer = serializer or JSONSerializer()
+        self.track_nested = track_nested
+        self.coalesce_reads = coalesce_reads
+        self.write_behind_delay = write_behind_delay
+        self.batch_window = batch_window
+        self._get_batcher = self._set_batcher = None
+        if batch_window is not None:
+            self._get_batcher = Batcher(
+                self._get_many, batch_window, batch_max_size)
+            self._set_batcher = Batcher(
+                self._set_many, batch_window, batch_max_size)
+        self.use_hash = use_hash
+        self.stores_serialized_values = not use_hash
+        self.command_timeout = command_timeout
+        self.command_timeouts = 0
+        self.replica_router = None
+        if replicas:
+            self.replica_router = ReplicaRouter(
+                replicas, replica_strategy, read_your_writes_window)
+
+        self.tracking_redis = tracking_redis
+        self.client_cache_expiry = client_cache_expiry
+        self.client_cache = BoundedExpiringDict(
+            max_items=client_cache_max_sessions)
+        self.client_cache_hits = 0
+        self.client_cache_misses = 0
+        self._tracking = None
+        self._tracking_ready = False
+        self._invalidation_seq = 0
+        self._reads_in_flight = {}
+        self._invalidated_at = {}
+
+        if redis is None:
+            self._register_pool_listeners(
+                app, redis_address, pool_minsize, pool_maxsize,
+                pool_idle_timeout)
+
+    def _register_pool_listeners(
+            self, app, address, minsize, maxsize, idle_timeout):
+        reaper = None
+
+        @app.listener('before_server_start')
+        async def create_session_redis_pool(app, loop):
+            """Create the connection pool owned by the session interface.
+            """
+            nonlocal reaper
+            import aioredis
+
+            self.redis = await aioredis.create_redis_pool(
+                address, minsize=minsize, maxsize=maxsize, loop=loop)
+            if idle_timeout:
+                reaper = asyncio.ensure_future(
+                    self._reap_idle_connections(idle_timeout))
+
+        @app.listener('after_server_stop')
+        async def close_session_redis_pool(app, loop):
+            """Close the connection pool owned by the session interface.
+            """
+            if reaper is not None:
+                reaper.cancel()
+            if self.redis is not None:
+                self.redis.close()
+                await self.redis.wait_closed()
+
+    async def _reap_idle_connections(self, idle_timeout):
+        pool = self.redis.connection
+        was_idle = False
+
+        while True:
+            await asyncio.sleep(idle_timeout)
+            idle = pool.freesize > pool.minsize
+            if idle and was_idle:
+                await self._close_idle_connections(pool)
+                idle = False
+            was_idle = idle
+
+    @staticmethod
+    async def _close_idle_connections(pool):
+        """Closes the free connections above `minsize`. aioredis only has
+        `clear()`, which closes all free connections, so the pool's deque of
+        free connections is used directly, as `clear()` does.
+        """
+        async with pool._cond:
+            closing = []
+            while pool.freesize > pool.minsize:
+                connection = pool._pool.popleft()
+                connection.close()
+                closing.append(connection.wait_closed())
+            await asyncio.gather(*closing)
+
+    def pool_stats(self) -> dict:
+        """Returns connection pool utilization: numbers of open (`size`),
+        free and used connections, pool limits, and the number of commands
+        abandoned because of `command_timeout`.
+        """
+        pool = getattr(self.redis, 'connection', self.redis)
+        size = pool.size
+        freesize = pool.freesize
+        return {
+            'size': size,
+            'freesize': freesize,
+            'in_use': size - freesize,
+            'minsize': pool.minsize,
+            'maxsize': pool.maxsize,
+            'utilization': (size - freesize) / pool.maxsize,
+            'command_timeouts': self.command_timeouts,
+        }
+
+    async def _execute(self, command):
+        """Awaits the Redis command, at most `command_timeout` seconds.
+        """
+        if self.command_timeout is None:
+            return await command
+
+        try:
+            return await asyncio.wait_for(command, self.command_timeout)
+        except asyncio.TimeoutError:
+            self.command_timeouts += 1
+            raise
+
+    async def _read(self, command, primary=False):
+        """Sends the read `command(connection)` to a replica, or to the
+        primary when there are no replicas, `primary` is set or the replica
+        fails.
+        """
+        if primary or self.replica_router is None:
+            return await self._execute(command(self.redis))
+
+        index = self.replica_router.choose()
+        replica = self.replica_router.replicas[index]
+        try:
+            return await self.replica_router.read(
+                index, self._execute(command(replica)))
+        except Exception:
+            return await self._execute(command(self.redis))
+
+    def _reads_primary(self, key):
+        return self.replica_router is not None and \
+            self.replica_router.use_primary(key)
+
+    def _written(self, key):
+        if self.replica_router is not None:
+            self.replica_router.written(key)
+
+    def _remaining_write_window(self, request) -> float:
+        """Seconds left of the read-your-writes window of the last write
+        of the request's session, as told by the cookie sent with it.
+        """
+        try:
+            written_at = float(
+                request.cookies.get(self.cookie_name + '-written', ''))
+        except ValueError:
+            return 0
+        window = self.replica_router.read_your_writes_window or 0
+        return min(window, written_at + window - time.time())
+
+    async def open(self, request) -> SessionDict:
+        """Opens a session onto the request, see `BaseSessionInterface.open`.
+        With replicas, a session written by any worker within
+        `read_your_writes_window` seconds is read from the primary.
+        """
+        sid = request.cookies.get(self.cookie_name)
+        if sid and self.replica_router is not None:
+            remaining = self._remaining_write_window(request)
+            if remaining > 0:
+                self.replica_router.written(self.prefix + sid, remaining)
+        return await super().open(request)
+
+    async def save(self, request, response) -> None:
+        """Saves the session, see `BaseSessionInterface.save`. With
+        replicas, a written session gets a cookie holding the time of the
+        write, which expires with the read-your-writes window.
+        """
+        await super().save(request, response)
+
+        window = self.replica_router and \
+            self.replica_router.read_your_writes_window
+        if window and getattr(request.get('session'), 'written', False):
+            name = self.cookie_name + '-written'
+            response.cookies[name] = '{:.3f}'.format(time.time())
+            response.cookies[name]['max-age'] = math.ceil(window)
+            response.cookies[name]['httponly'] = self.httponly
+            if self.domain:
+                response.cookies[name]['domain'] = self.domain
+
+    async def _track_invalidations(self):
+        """Turns on client tracking for session keys and drops sessions
+        from the local cache as invalidation messages arrive, until the
+        tracking connection is closed.
+        """
+        redis = self.tracking_redis
+        client_id = await redis.execute(b'CLIENT', b'ID')
+        await redis.execute(
+            b'CLIENT', b'TRACKING', b'ON', b'REDIRECT', client_id,
+            b'BCAST', b'PREFIX', self.prefix)
+        channel, = await redis.subscribe('__redis__:invalidate')
+        self._tracking_ready = True
+
+        try:
+            while await channel.wait_message():
+                keys = await channel.get()
+                if keys is None:
+                    # the server flushed the database or lost track
+                    self._invalidate_all()
+                    continue
+                for key in keys:
+                    self._invalidate(
+                        key.decode() if isinstance(key, bytes) else key)
+        finally:
+            # invalidations can't be received anymore
+            self._tracking_ready = False
+            self._invalidate_all()
+
+    def _invalidate(self, key):
+        self._invalidation_seq += 1
+        if key in self._reads_in_flight:
+            self._invalidated_at[key] = self._invalidation_seq
+        if key in self.client_cache:
+            self.client_cache.delete(key)
+
+    def _invalidate_all(self):
+        self._invalidation_seq += 1
+        for key in self._reads_in_flight:
+            self._invalidated_at[key] = self._invalidation_seq
+        self.client_cache = BoundedExpiringDict(
+            max_items=self.client_cache.max_items)
+
+    async def _get_cached_value(self, key, fetch):
+        if self._tracking is None:
+            self._tracking = asyncio.ensure_future(self._track_invalidations())
+        if not self._tracking_ready:
+            return await fetch()
+
+        val = self.client_cache.get(key)
+        if val is not None:
+            self.client_cache_hits += 1
+            return val
+
+        self.client_cache_misses += 1
+        # a value invalidated while it was being read must not be cached
+        seq = self._invalidation_seq
+        self._reads_in_flight[key] = self._reads_in_flight.get(key, 0) + 1
+        try:
+            val = await fetch()
+        finally:
+            invalidated_at = self._invalidated_at.get(key, 0)
+            self._reads_in_flight[key] -= 1
+            if not self._reads_in_flight[key]:
+                del self._reads_in_flight[key]
+                self._invalidated_at.pop(key, None)
+
+        if val is not None and invalidated_at <= seq and \
+                self._tracking_ready:
+            self.client_cache.set(key, val, self.client_cache_expiry)
+        return val
 
     async def _get_value(self, prefix, sid):
-        return await self.redis.get(self.prefix + sid)
+        key = self.prefix + sid
+        if self.tracking_redis is not None:
+            return await self._get_cached_value(
+                key, lambda: self._fetch_value(key))
+        return await self._fetch_value(key)
+
+    async def _fetch_value(self, key):
+        primary = self._reads_primary(key)
+        if self._get_batcher is not None and not primary:
+            return await self._get_batcher.submit(key)
+        return await self._read(lambda redis: redis.get(key), primary)
+
+    async def _get_many(self, keys):
+        return await self._read(lambda redis: redis.mget(*keys))
 
     async def _delete_key(self, key):
-        await self.redis.delete(key)
+        self._written(key)
+        self._invalidate(key)
+        await self._execute(self.redis.delete(key))
 
     async def _set_value(self, key, data):
-        await self.redis.setex(key, self.expiry, data)
+        self._written(key)
+        self._invalidate(key)
+        if self._set_batcher is not None:
+            return await self._set_batcher.submit((key, data))
+        await self._execute(self.redis.setex(key, self.expiry, data))
+
+    async def _set_many(self, items):
+        pipe = self.redis.pipeline()
+        for key, data in items:
+            pipe.setex(key, self.expiry, data)
+        return await self._execute(pipe.execute())
+
+    async def _touch_key(self, key):
+        await self._execute(self.redis.expire(key, self.expiry))
+
+    async def _load_session(self, sid):
+        if not self.use_hash:
+            return await super()._load_session(sid)
+
+        key = self.prefix + sid
+        primary = self._reads_primary(key)
+        fields = await self._single_flight(
+            key, lambda: self._read(lambda redis: redis.hgetall(key), primary))
+        data = {
+            (field.decode() if isinstance(field, bytes) else field):
+                self.serializer.loads(value)
+            for field, value in fields.items()
+        }
+        return SessionDict(data, sid=sid, track_nested=self.track_nested)
+
+    async def _store_session(self, key, session):
+        # tells `save` to send the time of the write
+        session.written = True
+        if not self.use_hash:
+            return await super()._store_session(key, session)
+
+        self._written(key)
+        pipe = self.redis.pipeline()
+        if session.changed_keys:
+            pipe.hmset_dict(key, {
+                field: self.serializer.dumps(session[field])
+                for field in session.changed_keys
+            })
+        if session.deleted_keys:
+            pipe.hdel(key, *session.deleted_keys)
+        pipe.expire(key, self.expiry)
+        await self._execute(pipe.execute())
+        self._forget_inflight_read(key)
 
@@ -1,6 +1,10 @@
+import asyncio
 from typing import Callable
 
 from .base import BaseSessionInterface
+from .batching import Batcher
+from .replicas import ReplicaRouter
+from .serializers import JSONSerializer
 
 
 def check_asyncio_redis_installed():
@@ -15,7 +19,7 @@ def check_asyncio_redis_installed():
 class AsyncioRedisSessionInterface(BaseSessionInterface):
     def __init__(
             self,
-            redis_connection: Callable,
+            redis_connection: Callable=None,
             domain: str=None,
             expiry: int=2592000,
             httponly :bool=True,
@@ -23,12 +27,30 @@ class AsyncioRedisSessionInterface(BaseSessionInterface):
             prefix: str='session:',
             sessioncookie: bool=False,
             pass_dependency_check: bool=False,
+            only_save_modified: bool=False,
+            touch_interval: int=0,
+            lazy: bool=False,
+            serializer=None,
+            track_nested: bool=False,
+            coalesce_reads: bool=True,
+            write_behind_delay: float=None,
+            batch_window: float=None,
+            batch_max_size: int=100,
+            app=None,
+            redis_address: tuple=None,
+            pool_size: int=10,
+            command_timeout: float=None,
+            replicas: list=None,
+            replica_strategy: str='round_robin',
+            read_your_writes_window: float=1.0,
         ):
         """Initializes a session interface backed by Redis.
         Args:
-            redis_connection (Callable):
+            redis_connection (Callable, optional):
                 asyncio_redis connection pool (suggested)
-                or an asyncio_redis Redis connection.
+                or an asyncio_redis Redis connection. When omitted, the
+                interface creates and owns a connection pool, see
+                `redis_address`.
             domain (str, optional):
                 Optional domain which will be attached to the cookie.
             expiry (int, optional):
@@ -48,10 +70,92 @@ class AsyncioRedisSessionInterface(BaseSessionInterface):
                 Specifies, whether to check: are dependencies for
                 session interface installed.
                 Check can be passed, for example, when running tests.
+            only_save_modified (bool, optional):
+                Write the session to the datastore only when it was modified
+                during the request. The expiration of unmodified sessions is
+                refreshed instead, see `touch_interval`.
+            touch_interval (int, optional):
+                With `only_save_modified`, minimal number of seconds between
+                expiration refreshes (in the datastore and in the cookie) of
+                an unmodified session. 0 refreshes it on every request,
+                None never refreshes it.
+            lazy (bool, optional):
+                Read the session from the datastore only when a handler
+                loads it with `await request['session'].load()`, so that
+                requests which do not use the session cost no datastore
+                round trip.
+            serializer (optional):
+                Object with `dumps` and `loads` methods which convert session
+                data to the stored value and back, see
+                `sanic_session.serializers`. Defaults to JSONSerializer.
+                asyncio_redis connections with the default UTF8Encoder can
+                only store text, so binary serializers can't be used.
+            track_nested (bool, optional):
+                Detect in-place changes of mutable session values, e.g.
+                `request['session']['cart'].append(item)`, by comparing them
+                with copies taken when the session was loaded. Costs a deep
+                copy of those values per request. Without it such changes
+                need an explicit `request['session']['cart'] = cart`.
+            coalesce_reads (bool, optional):
+                Share a single datastore read between concurrent requests
+                which open the same session in this worker, e.g. parallel
+                XHRs from one page. Enabled by default.
+            write_behind_delay (float, optional):
+                Delay writes of saved sessions by this many seconds, merging
+                all saves of a session within the delay into one datastore
+                write. Delayed writes are flushed before the server stops
+                when the interface is installed with `install_middleware`
+                outside of server listeners; otherwise call `flush()` in a
+                'before_server_stop' listener. Disabled by default.
+            batch_window (float, optional):
+                Collect store operations of concurrent requests for this many
+                seconds (e.g. 0.0005) and send them together: reads as one
+                MGET, writes as one pipeline. Raises throughput per connection
+                at high concurrency at the cost of up to `batch_window`
+                seconds of latency. Disabled by default.
+            batch_max_size (int, optional):
+                Maximum number of operations sent together; a full batch is
+                sent without waiting for the end of `batch_window`.
+            app (sanic.Sanic, optional):
+                Sanic instance, required when the interface creates its own
+                connection pool: the pool is created in a
+                'before_server_start' listener and closed in an
+                'after_server_stop' one, so the interface must be created
+                before the server starts.
+            redis_address (tuple, optional):
+                (host, port) of the Redis server. When given instead of
+                `redis_connection`, the interface creates and owns a
+                connection pool.
+            pool_size (int, optional):
+                Number of connections of the owned pool. asyncio_redis pools
+                have a fixed size, so there is no minimal size or idle
+                connection reaping.
+            command_timeout (float, optional):
+                Seconds after which a Redis command is abandoned and
+                asyncio.TimeoutError is raised. Disabled by default.
+            replicas (list, optional):
+                asyncio_redis connections or pools of read replicas of
+                `redis_connection`. Session reads are sent to them, and to
+                `redis_connection` when a replica fails. Writes always go to
+                `redis_connection`.
+            replica_strategy (str, optional):
+                'round_robin' spreads reads evenly over the replicas,
+                'least_latency' sends them to the replica which answered
+                fastest recently.
+            read_your_writes_window (float, optional):
+                Seconds after this worker writes a session during which the
+                session is read from `redis_connection` rather than from a
+                replica which may not have received the write yet.
+                Statistics are available on `replica_router`.
         """
         if not pass_dependency_check:
             check_asyncio_redis_installed()
 
+        if redis_connection is None and (app is None or redis_address is None):
+            raise ValueError(
+                "Either redis_connection, or app and redis_address "
+                "should be passed")
+
         self.redis_connection = redis_connection
         self.expiry = expiry
         self.prefix = prefix
@@ -59,13 +163,132 @@ class AsyncioRedisSessionInterface(BaseSessionInterface):
         self.domain = domain
         self.httponly = httponly
         self.sessioncookie = sessioncookie
+        self.only_save_modified = only_save_modified
+        self.touch_interval = touch_interval
+        self.lazy = lazy
+        self.serializer = serializer or JSONSerializer()
+        self.track_nested = track_nested
+        self.coalesce_reads = coalesce_reads
+        self.write_behind_delay = write_behind_delay
+        self.batch_window = batch_window
+        self._get_batcher = self._set_batcher = None
+        if batch_window is not None:
+            self._get_batcher = Batcher(
+                self._get_many, batch_window, batch_max_size)
+            self._set_batcher = Batcher(
+                self._set_many, batch_window, batch_max_size)
+        self.command_timeout = command_timeout
+        self.command_timeouts = 0
+        self.replica_router = None
+        if replicas:
+            self.replica_router = ReplicaRouter(
+                replicas, replica_strategy, read_your_writes_window)
+
+        if redis_connection is None:
+            self._register_pool_listeners(app, redis_address, pool_size)
+
+    def _register_pool_listeners(self, app, address, pool_size):
+        @app.listener('before_server_start')
+        async def create_session_redis_pool(app, loop):
+            """Create the connection pool owned by the session interface.
+            """
+            import asyncio_redis
+
+            host, port = address
+            self.redis_connection = await asyncio_redis.Pool.create(
+                host=host, port=port, poolsize=pool_size, loop=loop)
+
+        @app.listener('after_server_stop')
+        async def close_session_redis_pool(app, loop):
+            """Close the connection pool owned by the session interface.
+            """
+            if self.redis_connection is not None:
+                self.redis_connection.close()
+
+    def pool_stats(self) -> dict:
+        """Returns connection pool utilization: numbers of open (`size`),
+        free and used connections, pool size, and the number of commands
+        abandoned because of `command_timeout`.
+        """
+        pool = self.redis_connection
+        size = pool.connections_connected
+        in_use = pool.connections_in_use
+        return {
+            'size': size,
+            'freesize': size - in_use,
+            'in_use': in_use,
+            'minsize': pool.poolsize,
+            'maxsize': pool.poolsize,
+            'utilization': in_use / pool.poolsize,
+            'command_timeouts': self.command_timeouts,
+        }
+
+    async def _execute(self, command):
+        """Awaits the Redis command, at most `command_timeout` seconds.
+        """
+        if self.command_timeout is None:
+            return await command
+
+        try:
+            return await asyncio.wait_for(command, self.command_timeout)
+        except asyncio.TimeoutError:
+            self.command_timeouts += 1
+            raise
+
+    async def _read(self, command, primary=False):
+        """Sends the read `command(connection)` to a replica, or to the
+        primary when there are no replicas, `primary` is set or the replica
+        fails.
+        """
+        if primary or self.replica_router is None:
+            return await self._execute(command(self.redis_connection))
+
+        index = self.replica_router.choose()
+        replica = self.replica_router.replicas[index]
+        try:
+            return await self.replica_router.read(
+                index, self._execute(command(replica)))
+        except Exception:
+            return await self._execute(command(self.redis_connection))
+
+    def _reads_primary(self, key):
+        return self.replica_router is not None and \
+            self.replica_router.use_primary(key)
+
+    def _written(self, key):
+        if self.replica_router is not None:
+            self.replica_router.written(key)
 
     async def _get_value(self, prefix, key):
-        return await self.redis_connection.get(prefix + key)
+        key = prefix + key
+        primary = self._reads_primary(key)
+        if self._get_batcher is not None and not primary:
+            return await self._get_batcher.submit(key)
+        return await self._read(lambda redis: redis.get(key), primary)
+
+    async def _get_many(self, keys):
+        reply = await self._read(lambda redis: redis.mget(keys))
+        return await reply.aslist()
 
     async def _delete_key(self, key):
-        await self.redis_connection.delete([key])
+        self._written(key)
+        await self._execute(self.redis_connection.delete([key]))
 
     async def _set_value(self, key, data):
-        await self.redis_connection.setex(key, self.expiry, data)
+        self._written(key)
+        if self._set_batcher is not None:
+            return await self._set_batcher.submit((key, data))
+        await self._execute(
+            self.redis_connection.setex(key, self.expiry, data))
+
+    async def _set_many(self, items):
+        # commands of a transaction are sent without waiting for replies
+        transaction = await self.redis_connection.multi()
+        for key, data in items:
+            await transaction.setex(key, self.expiry, data)
+        await self._execute(transaction.exec())
+        return [None] * len(items)
+
+    async def _touch_key(self, key):
+        await self._execute(self.redis_connection.expire(key, self.expiry))
 
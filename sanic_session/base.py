@@ -1,20 +1,162 @@
+import asyncio
+import copy
+import logging
 import time
 import abc
-import ujson
 import uuid
 
-from .utils import CallbackDict
+from .serializers import JSONSerializer
+from .utils import CallbackDict, BoundedExpiringDict
+
+
+# values of these types can't change in place, so assigning an equal value
+# of the same type is a no-op
+_IMMUTABLE_TYPES = (str, bytes, int, float, bool, type(None), tuple, frozenset)
+
+logger = logging.getLogger('sanic_session')
+
+
+def _is_same_value(current, value):
+    if type(current) is not type(value) or current != value:
+        return False
+    # assigning the very same mutable object again is the usual way to flag
+    # an in-place change, so it is not a no-op
+    return current is not value or isinstance(value, _IMMUTABLE_TYPES)
 
 
 class SessionDict(CallbackDict):
-    def __init__(self, initial=None, sid=None):
+    def __init__(self, initial=None, sid=None, track_nested=False):
         def on_update(self):
             self.modified = True
+            # a new session gets its id with the first write
+            if self.sid is None:
+                self.sid = uuid.uuid4().hex
 
         super().__init__(initial, on_update)
 
         self.sid = sid
         self.modified = False
+        # keys which were set or removed since the session was loaded,
+        # lets interfaces write only what has changed
+        self.changed_keys = set()
+        self.deleted_keys = set()
+
+        # copies of mutable values, to find in-place changes of them
+        self._snapshot = None
+        if track_nested:
+            self._snapshot = {
+                key: copy.deepcopy(value) for key, value in self.items()
+                if not isinstance(value, _IMMUTABLE_TYPES)
+            }
+
+    def _mark_changed(self, key):
+        self.changed_keys.add(key)
+        self.deleted_keys.discard(key)
+
+    def _mark_deleted(self, key):
+        self.deleted_keys.add(key)
+        self.changed_keys.discard(key)
+
+    def __setitem__(self, key, value):
+        if key in self and _is_same_value(self[key], value):
+            return
+        self._mark_changed(key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._mark_deleted(key)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._mark_changed(key)
+        return super().setdefault(key, default)
+
+    def pop(self, key, *args):
+        if key in self:
+            self._mark_deleted(key)
+        return super().pop(key, *args)
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._mark_deleted(key)
+        return key, value
+
+    def update(self, *args, **kwargs):
+        other = {
+            key: value for key, value in dict(*args, **kwargs).items()
+            if key not in self or not _is_same_value(self[key], value)
+        }
+        if not other:
+            return
+
+        for key in other:
+            self._mark_changed(key)
+        super().update(other)
+
+    def clear(self):
+        for key in self:
+            self._mark_deleted(key)
+        super().clear()
+
+    def collect_nested_changes(self):
+        """Marks as changed the keys whose mutable values (lists, dicts...)
+        were modified in place since the session was loaded. Only works for
+        sessions created with `track_nested`.
+        """
+        if self._snapshot is None:
+            return
+
+        for key, value in self._snapshot.items():
+            if key in self and key not in self.changed_keys \
+                    and self[key] != value:
+                self._mark_changed(key)
+                self.modified = True
+
+    async def load(self) -> 'SessionDict':
+        """The session is already loaded, returns itself. Lets handlers use
+        `await request['session'].load()` whether the interface is lazy or not.
+        """
+        return self
+
+
+class LazySession(object):
+    """Stand-in for a session which was not read from the datastore yet,
+    attached to requests by interfaces in `lazy` mode. The datastore is hit
+    only when the session is loaded with `await request['session'].load()`,
+    which also replaces this object on the request with the loaded
+    SessionDict. Sessions which were never loaded are not saved.
+    """
+    def __init__(self, interface, request, sid):
+        self.interface = interface
+        self.request = request
+        self.sid = sid
+        self._session = None
+
+    async def load(self) -> SessionDict:
+        if self._session is None:
+            self._session = await self.interface._load_session(self.sid)
+            self.request['session'] = self._session
+        return self._session
+
+    def _not_loaded(self, *args, **kwargs):
+        raise RuntimeError(
+            "Session is not loaded yet, "
+            "use `await request['session'].load()` first")
+
+    __getitem__ = __setitem__ = __delitem__ = _not_loaded
+    __contains__ = __iter__ = __len__ = _not_loaded
+    get = setdefault = pop = popitem = update = clear = _not_loaded
+    keys = values = items = _not_loaded
+
+
+# cookie and storage settings, which interfaces wrapping other interfaces
+# take over from them
+INTERFACE_SETTINGS = (
+    'expiry', 'prefix', 'cookie_name', 'domain', 'httponly', 'sessioncookie',
+    'serializer', 'only_save_modified', 'touch_interval', 'lazy',
+    'track_nested', 'coalesce_reads', 'write_behind_delay',
+)
 
 
 def _calculate_expires(expiry):
@@ -22,8 +164,24 @@ def _calculate_expires(expiry):
     return time.strftime("%a, %d-%b-%Y %T GMT", time.gmtime(expires))
 
 
-class BaseSessionInterface(metaclass=abc.ABCMeta):
-    # this flag show does this Interface need request/responce middleware hooks
+class SessionInterface(metaclass=abc.ABCMeta):
+    """Cookie handling and settings shared by all session interfaces, and
+    the `open`/`save` hooks `install_middleware` calls. Interfaces which
+    keep sessions in a datastore derive from BaseSessionInterface; ones
+    which don't (e.g. CookieSessionInterface) can derive from this class.
+    """
+
+    # converts session data to values stored in the datastore and back
+    serializer = JSONSerializer()
+
+    # write-avoidance settings, see `BaseSessionInterface.save`
+    only_save_modified = False
+    # detect in-place changes of mutable session values
+    track_nested = False
+    touch_interval = 0
+    # how many recently refreshed keys are remembered per worker
+    touched_keys_limit = 100000
+    _touched_keys = None
 
     def _delete_cookie(self, request, response):
         response.cookies[self.cookie_name] = request['session'].sid
@@ -44,6 +202,63 @@ class BaseSessionInterface(metaclass=abc.ABCMeta):
         if self.domain:
             response.cookies[self.cookie_name]['domain'] = self.domain
 
+    def _should_touch(self, key: str) -> bool:
+        """Whether the expiration of an unmodified session should be
+        refreshed now: at most once per `touch_interval` seconds in
+        this worker.
+        """
+        if self.touch_interval is None:
+            return False
+        if not self.touch_interval:
+            return True
+
+        if self._touched_keys is None:
+            self._touched_keys = BoundedExpiringDict(
+                max_items=self.touched_keys_limit)
+
+        if self._touched_keys.get(key) is not None:
+            return False
+
+        self._touched_keys.set(key, True, self.touch_interval)
+        return True
+
+    async def flush(self) -> None:
+        """Writes delayed session saves; interfaces which don't delay them
+        have nothing to write.
+        """
+
+    @abc.abstractmethod
+    async def open(self, request) -> SessionDict:
+        """Opens a session onto the request."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def save(self, request, response) -> None:
+        """Saves the session of the request, setting cookies on the
+        response."""
+        raise NotImplementedError
+
+
+class BaseSessionInterface(SessionInterface):
+    # this flag show does this Interface need request/responce middleware hooks
+
+    # whether `_get_value`/`_set_value` deal with serialized sessions; False
+    # for interfaces which store sessions in a structured form
+    stores_serialized_values = True
+
+    # defer reading the datastore until the session is used, see `open`
+    lazy = False
+    # share one datastore read between concurrent opens of the same session
+    coalesce_reads = True
+    _inflight_reads = None
+    # seconds during which writes of a session are merged, see `flush`
+    write_behind_delay = None
+    _pending_writes = None
+    # writes taken by a running flush, until they are written
+    _flushing_writes = None
+    _flush_handle = None
+    _flush_task = None
+
     @abc.abstractmethod
     async def _get_value(self, prefix: str, sid: str):
         '''
@@ -66,11 +281,160 @@ class BaseSessionInterface(metaclass=abc.ABCMeta):
         '''Set value for datastore'''
         raise NotImplementedError
 
+    async def _touch_key(self, key: str):
+        '''Reset expiration of the key in datastore without rewriting its
+        value. Needed for `only_save_modified` mode.'''
+        raise NotImplementedError
+
+    async def _single_flight(self, key: str, fetch):
+        """Runs `fetch()`, unless a read of the same key is already in
+        progress in this worker: then its result is awaited instead, so that
+        concurrent requests with the same session cost one datastore read.
+        The result is shared, so it must not be modified.
+        """
+        if not self.coalesce_reads:
+            return await fetch()
+
+        if self._inflight_reads is None:
+            self._inflight_reads = {}
+
+        future = self._inflight_reads.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fetch())
+            self._inflight_reads[key] = future
+
+            def forget(_):
+                if self._inflight_reads.get(key) is future:
+                    del self._inflight_reads[key]
+            future.add_done_callback(forget)
+
+        # a cancelled request must not cancel the read for the others
+        return await asyncio.shield(future)
+
+    def _forget_inflight_read(self, key: str):
+        """Makes opens after a write of the session start a new read
+        instead of joining one which started before the write and may
+        return the older version.
+        """
+        if self._inflight_reads:
+            self._inflight_reads.pop(key, None)
+
+    async def _load_session(self, sid: str) -> SessionDict:
+        """Reads the session with the given id from the datastore.
+        """
+        key = self.prefix + sid
+        if self._pending_writes and key in self._pending_writes:
+            # not flushed yet, the datastore has an older version
+            val = self._pending_writes[key]
+        elif self._flushing_writes and key in self._flushing_writes:
+            val = self._flushing_writes[key]
+        else:
+            val = await self._single_flight(
+                key, lambda: self._get_value(self.prefix, sid))
+
+        if val is not None:
+            data = self.serializer.loads(val)
+            return SessionDict(data, sid=sid, track_nested=self.track_nested)
+        return SessionDict(sid=sid)
+
+    async def _store_session(self, key: str, session: SessionDict):
+        """Writes the non-empty session to the datastore.
+        """
+        val = self.serializer.dumps(dict(session))
+
+        if not self.write_behind_delay:
+            await self._set_value(key, val)
+            self._forget_inflight_read(key)
+            return
+
+        if self._pending_writes is None:
+            self._pending_writes = {}
+        self._pending_writes[key] = val
+        self._forget_inflight_read(key)
+
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_handle is None:
+            loop = asyncio.get_event_loop()
+            self._flush_handle = loop.call_later(
+                self.write_behind_delay, self._start_flush)
+
+    def _start_flush(self):
+        self._flush_handle = None
+        self._flush_task = asyncio.ensure_future(self._write_pending())
+
+    def _drop_pending_write(self, key: str):
+        """Cancels the delayed write of a session which is being deleted.
+        """
+        if self._pending_writes:
+            self._pending_writes.pop(key, None)
+        if self._flushing_writes:
+            self._flushing_writes.pop(key, None)
+
+    async def flush(self) -> None:
+        """Writes sessions whose saves are delayed by `write_behind_delay`
+        to the datastore. Is called `write_behind_delay` seconds after the
+        first delayed save, and should be called before the server stops
+        (`install_middleware` registers a 'before_server_stop' listener for
+        it), otherwise delayed writes are lost.
+        Failed writes are logged and retried with the next flush, unless
+        the session was saved or deleted again meanwhile.
+        Waits for the writes of a flush started by the timer first, so that
+        none of them is still running when this returns.
+        """
+        task = self._flush_task
+        if task is not None and not task.done():
+            await asyncio.wait([task])
+        await self._write_pending()
+
+    async def _write_pending(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if not self._pending_writes:
+            return
+
+        pending, self._pending_writes = self._pending_writes, {}
+        self._flushing_writes = pending
+        items = list(pending.items())
+        try:
+            results = await asyncio.gather(*[
+                self._set_value(key, val) for key, val in items
+            ], return_exceptions=True)
+        finally:
+            if self._flushing_writes is pending:
+                self._flushing_writes = None
+
+        failed = 0
+        for (key, val), result in zip(items, results):
+            if isinstance(result, Exception):
+                failed += 1
+                if key not in self._pending_writes and pending.get(key) is val:
+                    self._pending_writes[key] = val
+            else:
+                self._forget_inflight_read(key)
+
+        if failed:
+            logger.error(
+                'Failed to write %d delayed sessions, retrying with the next '
+                'flush: %r', failed,
+                next(r for r in results if isinstance(r, Exception)))
+            if self._pending_writes:
+                self._schedule_flush()
+
     async def open(self, request) -> SessionDict:
         """
         Opens a session onto the request. Restores the client's session
         from the datastore if one exists.The session data will be available on
         `request.session`.
+        Requests without a session cookie get a new session, whose id is
+        only generated when data is first stored in it; sessions which are
+        never written to are neither saved nor sent as a cookie.
+        In `lazy` mode the datastore is not read here: a LazySession is
+        attached instead, and the session is read when it is loaded with
+        `await request['session'].load()`.
         Args:
             request (sanic.request.Request):
                 The request, which a sessionwill be opened onto.
@@ -82,16 +446,12 @@ class BaseSessionInterface(metaclass=abc.ABCMeta):
         sid = request.cookies.get(self.cookie_name)
 
         if not sid:
-            sid = uuid.uuid4().hex
-            session_dict = SessionDict(sid=sid)
+            # the session id is generated once data is stored in the session
+            session_dict = SessionDict()
+        elif self.lazy:
+            session_dict = LazySession(self, request, sid)
         else:
-            val = await self._get_value(self.prefix, sid)
-
-            if val is not None:
-                data = ujson.loads(val)
-                session_dict = SessionDict(data, sid=sid)
-            else:
-                session_dict = SessionDict(sid=sid)
+            session_dict = await self._load_session(sid)
 
         # attach the session data to the request, return it for convenience
         request['session'] = session_dict
@@ -99,6 +459,11 @@ class BaseSessionInterface(metaclass=abc.ABCMeta):
 
     async def save(self, request, response) -> None:
         """Saves the session to the datastore.
+        With `only_save_modified` enabled, a session which was not modified
+        during the request is not rewritten; only its expiration is
+        refreshed, at most once per `touch_interval` seconds.
+        With `write_behind_delay`, the write is delayed and merged with
+        further saves of the same session, see `flush`.
         Args:
             request (sanic.request.Request):
                 The sanic request which has an attached session.
@@ -111,14 +476,37 @@ class BaseSessionInterface(metaclass=abc.ABCMeta):
         if 'session' not in request:
             return
 
+        if isinstance(request['session'], LazySession):
+            # never loaded, so never modified
+            return
+
+        if request['session'].sid is None:
+            # new session which was never written to
+            return
+
+        if self.track_nested:
+            request['session'].collect_nested_changes()
+
         key = (self.prefix + request['session'].sid)
+        if self.only_save_modified and not request['session'].modified:
+            # nothing to write: just keep the session alive
+            if request['session'] and self._should_touch(key):
+                await self._touch_key(key)
+                self._set_cookie_expiration(request, response)
+            return
+
         if not request['session']:
+            if request.cookies.get(self.cookie_name) != request['session'].sid:
+                # new session which was emptied again: nothing to remove
+                return
+
+            self._drop_pending_write(key)
             await self._delete_key(key)
+            self._forget_inflight_read(key)
 
             if request['session'].modified:
                 self._delete_cookie(request, response)
             return
 
-        val = ujson.dumps(dict(request['session']))
-        await self._set_value(key, val)
+        await self._store_session(key, request['session'])
         self._set_cookie_expiration(request, response)
@@ -0,0 +1,73 @@
+import asyncio
+from typing import Any, Callable
+
+
+class Batcher(object):
+    """Collects operations submitted by concurrent requests and dispatches
+    them to the datastore together, e.g. as one MGET instead of many GETs.
+    A batch is dispatched `window` seconds after its first operation, or as
+    soon as it holds `max_size` operations. A longer window makes batches
+    bigger, raising throughput per connection at high concurrency, and adds
+    up to `window` seconds of latency to every operation.
+    Statistics are available as `batches` and `operations`.
+    """
+    def __init__(
+            self, dispatch: Callable, window: float=0.0005,
+            max_size: int=100):
+        """
+        Args:
+            dispatch (Callable):
+                Coroutine function which takes a list of operations and
+                returns a list with a result for each of them.
+            window (float, optional):
+                Seconds to wait for more operations before dispatching.
+            max_size (int, optional):
+                Maximum number of operations in a batch.
+        """
+        self.dispatch = dispatch
+        self.window = window
+        self.max_size = max_size
+
+        self.batches = 0
+        self.operations = 0
+        self._pending = []
+        self._handle = None
+
+    async def submit(self, operation: Any):
+        """Adds the operation to the current batch and waits for its result.
+        """
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._pending.append((operation, future))
+
+        if len(self._pending) >= self.max_size:
+            self._dispatch_pending()
+        elif self._handle is None:
+            self._handle = loop.call_later(self.window, self._dispatch_pending)
+
+        return await future
+
+    def _dispatch_pending(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        self.batches += 1
+        self.operations += len(batch)
+
+        try:
+            results = await self.dispatch([operation for operation, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,348 @@
+import base64
+import hashlib
+import hmac
+import os
+import time
+from typing import List, Union
+
+from .base import SessionInterface, SessionDict, _calculate_expires
+from .serializers import JSONSerializer
+
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:  # pragma: no cover
+    AESGCM = None
+
+
+def check_cryptography_installed():
+    """Check cryptography installed, if absent - raises error.
+    """
+    if AESGCM is None:
+        raise RuntimeError(
+            "Please install cryptography: pip install sanic_session[cryptography]")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _derive_key(secret_key: Union[str, bytes], purpose: bytes) -> bytes:
+    if isinstance(secret_key, str):
+        secret_key = secret_key.encode()
+    return hmac.new(secret_key, purpose, hashlib.sha256).digest()
+
+
+# value of the main cookie when the session is split into several cookies,
+# followed by their number
+_CHUNKED_MARKER = '*'
+
+
+class CookieSessionInterface(SessionInterface):
+    def __init__(
+            self,
+            secret_keys: Union[str, List[str]],
+            domain: str=None,
+            expiry: int=2592000,
+            httponly: bool=True,
+            cookie_name: str='session',
+            sessioncookie: bool=False,
+            only_save_modified: bool=False,
+            touch_interval: int=0,
+            serializer=None,
+            track_nested: bool=False,
+            encrypt: bool=False,
+            max_cookie_size: int=4000,
+            max_cookies: int=5,
+            pass_dependency_check: bool=False,
+        ):
+        """Initializes a session interface which keeps the serialized
+        session in the client's cookie, signed with HMAC-SHA256 and
+        optionally encrypted, so that no datastore is needed.
+        Sessions are limited in size, readable by the client unless
+        `encrypt` is set, and can't be revoked on the server before they
+        expire: a client can replay an older, validly signed cookie.
+        Args:
+            secret_keys (str or list):
+                Secret key, or list of secret keys for key rotation: cookies
+                are signed with the first one and accepted when signed with
+                any of them.
+            domain (str, optional):
+                Optional domain which will be attached to the cookie.
+            expiry (int, optional):
+                Seconds until the session should expire. The signing time is
+                part of the signed cookie, so expired cookies are rejected
+                even when the client keeps them.
+            httponly (bool, optional):
+                Adds the `httponly` flag to the session cookie.
+            cookie_name (str, optional):
+                Name used for the client cookie.
+            sessioncookie (bool, optional):
+                Specifies if the sent cookie should be a 'session cookie', i.e
+                no Expires or Max-age headers are included. Expiry is still
+                enforced with the signing time. Default setting is False.
+            only_save_modified (bool, optional):
+                Send the cookie again only when the session was modified
+                during the request. The expiration of unmodified sessions is
+                refreshed instead, see `touch_interval`.
+            touch_interval (int, optional):
+                With `only_save_modified`, minimal number of seconds between
+                expiration refreshes (re-signed cookies) of an unmodified
+                session. 0 refreshes it on every request, None never
+                refreshes it.
+            serializer (optional):
+                Object with `dumps` and `loads` methods which convert session
+                data to the stored value and back, see
+                `sanic_session.serializers`. Defaults to JSONSerializer.
+                CompressedSerializer helps to stay within cookie limits.
+            track_nested (bool, optional):
+                Detect in-place changes of mutable session values, e.g.
+                `request['session']['cart'].append(item)`, by comparing them
+                with copies taken when the session was loaded. Costs a deep
+                copy of those values per request. Without it such changes
+                need an explicit `request['session']['cart'] = cart`.
+            encrypt (bool, optional):
+                Encrypt the session with AES-GCM, with a key derived from the
+                secret key, so that clients can't read it. Needs the
+                cryptography package.
+            max_cookie_size (int, optional):
+                Maximum length of a cookie value. Larger sessions are split
+                into several cookies named `<cookie_name>-<n>`.
+            max_cookies (int, optional):
+                Maximum number of cookies a session is split into. Saving a
+                larger session raises ValueError.
+            pass_dependency_check (bool, optional):
+                Specifies, whether to check: are dependencies for
+                session interface installed.
+                Check can be passed, for example, when running tests.
+        """
+        if isinstance(secret_keys, (str, bytes)):
+            secret_keys = [secret_keys]
+        if not secret_keys:
+            raise ValueError('At least one secret key should be passed')
+
+        if encrypt and not pass_dependency_check:
+            check_cryptography_installed()
+
+        self.expiry = expiry
+        self.cookie_name = cookie_name
+        self.domain = domain
+        self.httponly = httponly
+        self.sessioncookie = sessioncookie
+        self.only_save_modified = only_save_modified
+        self.touch_interval = touch_interval
+        self.serializer = serializer or JSONSerializer()
+        self.track_nested = track_nested
+        self.encrypt = encrypt
+        self.max_cookie_size = max_cookie_size
+        self.max_cookies = max_cookies
+        self.prefix = ''
+        # sessions aren't stored in a datastore, so interfaces which wrap
+        # datastores can't wrap this one
+        self.stores_serialized_values = False
+
+        self._signing_keys = [
+            _derive_key(key, b'sanic_session.signing') for key in secret_keys
+        ]
+        self._encryption_keys = [
+            _derive_key(key, b'sanic_session.encryption')
+            for key in secret_keys
+        ]
+
+    def _sign(self, message: str, key_index: int=0) -> str:
+        signature = hmac.new(
+            self._signing_keys[key_index], message.encode(), hashlib.sha256)
+        return _b64encode(signature.digest())
+
+    def _encode_session(self, data: dict) -> str:
+        """Serializes, encrypts if enabled and signs the session data,
+        returning the cookie value.
+        """
+        payload = self.serializer.dumps(data)
+        if isinstance(payload, str):
+            payload = payload.encode()
+
+        if self.encrypt:
+            nonce = os.urandom(12)
+            payload = nonce + AESGCM(self._encryption_keys[0]).encrypt(
+                nonce, payload, None)
+
+        message = '{}.{}'.format(int(time.time()), _b64encode(payload))
+        return '{}.{}'.format(message, self._sign(message))
+
+    def _decode_session(self, value: str):
+        """Checks the signature and the age of the cookie value, returning
+        the session data and the signing time, or None if the value is
+        invalid or expired.
+        """
+        message, _, signature = value.rpartition('.')
+        issued_at, _, payload = message.partition('.')
+        if not payload or not issued_at.isdigit():
+            return None
+
+        for key_index in range(len(self._signing_keys)):
+            # constant time comparison, not to leak the expected signature
+            if hmac.compare_digest(self._sign(message, key_index), signature):
+                break
+        else:
+            return None
+
+        issued_at = int(issued_at)
+        if time.time() - issued_at > self.expiry:
+            return None
+
+        try:
+            payload = _b64decode(payload)
+            if self.encrypt:
+                payload = AESGCM(self._encryption_keys[key_index]).decrypt(
+                    payload[:12], payload[12:], None)
+            return self.serializer.loads(payload), issued_at
+        except Exception:
+            # signed, but not readable with the current settings
+            return None
+
+    def _read_cookie(self, request) -> str:
+        value = request.cookies.get(self.cookie_name)
+        if not value or not value.startswith(_CHUNKED_MARKER):
+            return value
+
+        count = value[len(_CHUNKED_MARKER):]
+        if not count.isdigit() or int(count) > self.max_cookies:
+            return None
+        chunks = [
+            request.cookies.get('{}-{}'.format(self.cookie_name, n))
+            for n in range(1, int(count) + 1)
+        ]
+        if not all(chunks):
+            return None
+        return ''.join(chunks)
+
+    def _set_cookie(self, response, name, value):
+        response.cookies[name] = value
+        response.cookies[name]['httponly'] = self.httponly
+
+        if not self.sessioncookie:
+            response.cookies[name]['expires'] = _calculate_expires(self.expiry)
+            response.cookies[name]['max-age'] = self.expiry
+
+        if self.domain:
+            response.cookies[name]['domain'] = self.domain
+
+    def _expire_cookie(self, response, name):
+        response.cookies[name] = ''
+        response.cookies[name]['expires'] = 0
+        response.cookies[name]['max-age'] = 0
+
+        if self.domain:
+            response.cookies[name]['domain'] = self.domain
+
+    def _stale_chunks(self, request, count):
+        """Names of chunk cookies sent by the client beyond the first
+        `count` ones.
+        """
+        prefix = self.cookie_name + '-'
+        return [
+            name for name in request.cookies
+            if name.startswith(prefix) and
+            name[len(prefix):].isdigit() and int(name[len(prefix):]) > count
+        ]
+
+    def _write_cookie(self, request, response, value):
+        size = self.max_cookie_size
+        if len(value) <= size:
+            self._set_cookie(response, self.cookie_name, value)
+            count = 0
+        else:
+            chunks = [
+                value[i:i + size] for i in range(0, len(value), size)
+            ]
+            if len(chunks) > self.max_cookies:
+                raise ValueError(
+                    'Session of {} bytes exceeds the cookie size limit of '
+                    '{} bytes'.format(len(value), size * self.max_cookies))
+
+            count = len(chunks)
+            self._set_cookie(
+                response, self.cookie_name,
+                '{}{}'.format(_CHUNKED_MARKER, count))
+            for n, chunk in enumerate(chunks, 1):
+                self._set_cookie(
+                    response, '{}-{}'.format(self.cookie_name, n), chunk)
+
+        for name in self._stale_chunks(request, count):
+            self._expire_cookie(response, name)
+
+    def _delete_cookies(self, request, response):
+        self._expire_cookie(response, self.cookie_name)
+        for name in self._stale_chunks(request, 0):
+            self._expire_cookie(response, name)
+
+    async def open(self, request) -> SessionDict:
+        """Opens a session onto the request, read from the signed cookie.
+        Invalid or expired cookies give a new, empty session. No datastore
+        is involved, so sessions are never loaded lazily.
+        Args:
+            request (sanic.request.Request):
+                The request, which a session will be opened onto.
+        Returns:
+            SessionDict:
+                the client's session data,
+                attached as well to `request.session`.
+        """
+        value = self._read_cookie(request)
+        loaded = self._decode_session(value) if value else None
+
+        if loaded is None or not isinstance(loaded[0], dict):
+            session_dict = SessionDict()
+            session_dict.issued_at = None
+        else:
+            data, issued_at = loaded
+            # the session id is only used to tell written sessions apart
+            session_dict = SessionDict(
+                data, sid=self.cookie_name, track_nested=self.track_nested)
+            session_dict.issued_at = issued_at
+
+        request['session'] = session_dict
+        return session_dict
+
+    async def save(self, request, response) -> None:
+        """Sends the signed session in cookies, or expires them when the
+        session was emptied.
+        Args:
+            request (sanic.request.Request):
+                The sanic request which has an attached session.
+            response (sanic.response.Response):
+                The Sanic response, which the cookies are added onto.
+        Returns:
+            None
+        """
+        if 'session' not in request:
+            return
+
+        session = request['session']
+        if session.sid is None:
+            # new session which was never written to
+            return
+
+        if self.track_nested:
+            session.collect_nested_changes()
+
+        if self.only_save_modified and not session.modified:
+            # nothing changed: re-sign the cookie to keep the session alive
+            if self.touch_interval is None or not session or \
+                    time.time() - session.issued_at < self.touch_interval:
+                return
+
+        if not session:
+            if session.issued_at is not None or self._stale_chunks(request, 0):
+                self._delete_cookies(request, response)
+            return
+
+        await self._write_session(request, response, session)
+
+    async def _write_session(self, request, response, session):
+        value = self._encode_session(dict(session))
+        self._write_cookie(request, response, value)
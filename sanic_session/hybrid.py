@@ -0,0 +1,163 @@
+import re
+import uuid
+from typing import List, Union
+
+from .base import BaseSessionInterface, SessionDict, INTERFACE_SETTINGS
+from .cookie import CookieSessionInterface
+
+
+# ids of sessions moved to the backend, see `_write_session`
+_SESSION_ID = re.compile('[0-9a-f]{32}')
+
+
+class HybridSessionInterface(CookieSessionInterface):
+    def __init__(
+            self,
+            backend: BaseSessionInterface,
+            secret_keys: Union[str, List[str]],
+            threshold: int=2048,
+            encrypt: bool=False,
+            max_cookie_size: int=4000,
+            pass_dependency_check: bool=False,
+        ):
+        """Initializes a session interface which keeps small sessions in a
+        signed cookie, like CookieSessionInterface, and moves a session to
+        another session interface once its cookie would exceed `threshold`
+        characters. The cookie then only holds the session id. Only large
+        sessions cost a datastore round trip; they stay in the datastore
+        when they shrink again. Cookie and storage settings are taken from
+        the backend, sessions are never loaded lazily.
+        Args:
+            backend (BaseSessionInterface):
+                Session interface which stores large sessions.
+            secret_keys (str or list):
+                Secret key, or list of secret keys for key rotation: cookies
+                are signed with the first one and accepted when signed with
+                any of them.
+            threshold (int, optional):
+                Maximum length of the signed cookie of a session kept in the
+                cookie.
+            encrypt (bool, optional):
+                Encrypt sessions kept in the cookie with AES-GCM, so that
+                clients can't read them. Needs the cryptography package.
+            max_cookie_size (int, optional):
+                Maximum length of a cookie value; when `threshold` is larger,
+                sessions kept in the cookie are split into several cookies
+                named `<cookie_name>-<n>`.
+            pass_dependency_check (bool, optional):
+                Specifies, whether to check: are dependencies for
+                session interface installed.
+                Check can be passed, for example, when running tests.
+        """
+        max_cookies = -(-threshold // max_cookie_size)
+        super().__init__(
+            secret_keys,
+            encrypt=encrypt,
+            max_cookie_size=max_cookie_size,
+            max_cookies=max_cookies,
+            pass_dependency_check=pass_dependency_check,
+        )
+
+        self.backend = backend
+        for name in INTERFACE_SETTINGS:
+            setattr(self, name, getattr(backend, name))
+        self.lazy = False
+        self.threshold = threshold
+
+    async def flush(self) -> None:
+        await self.backend.flush()
+
+    async def open(self, request) -> SessionDict:
+        """Opens a session onto the request, read from the signed cookie, or
+        from the backend when the cookie holds a session id.
+        Args:
+            request (sanic.request.Request):
+                The request, which a session will be opened onto.
+        Returns:
+            SessionDict:
+                the client's session data,
+                attached as well to `request.session`.
+        """
+        value = self._read_cookie(request)
+        loaded = self._decode_session(value) if value else None
+
+        session_dict = None
+        if loaded is not None and isinstance(loaded[0], dict):
+            data, issued_at = loaded
+            session_dict = SessionDict(
+                data, sid=self.cookie_name, track_nested=self.track_nested)
+            session_dict.issued_at = issued_at
+            session_dict.in_backend = False
+        elif value and request.cookies.get(self.cookie_name) == value \
+                and _SESSION_ID.fullmatch(value):
+            # not a signed session: the id of a session in the backend;
+            # other values (e.g. tampered cookies) cost no backend read
+            stored = await self.backend._load_session(value)
+            if stored:
+                session_dict = stored
+                session_dict.in_backend = True
+
+        if session_dict is None:
+            # no session, or it expired in the backend
+            session_dict = SessionDict()
+            session_dict.issued_at = None
+            session_dict.in_backend = False
+
+        request['session'] = session_dict
+        return session_dict
+
+    async def save(self, request, response) -> None:
+        """Sends the session in a signed cookie, or stores it in the backend
+        and sends its id when it is too large.
+        Args:
+            request (sanic.request.Request):
+                The sanic request which has an attached session.
+            response (sanic.response.Response):
+                The Sanic response, which the cookies are added onto.
+        Returns:
+            None
+        """
+        if 'session' not in request:
+            return
+
+        session = request['session']
+        if not getattr(session, 'in_backend', False):
+            await super().save(request, response)
+            return
+
+        if self.track_nested:
+            session.collect_nested_changes()
+
+        key = self.backend.prefix + session.sid
+        if self.only_save_modified and not session.modified:
+            if session and self._should_touch(key):
+                await self.backend._touch_key(key)
+                self._write_cookie(request, response, session.sid)
+            return
+
+        if not session:
+            self.backend._drop_pending_write(key)
+            await self.backend._delete_key(key)
+            self.backend._forget_inflight_read(key)
+            if session.modified:
+                self._delete_cookies(request, response)
+            return
+
+        await self.backend._store_session(key, session)
+        self._write_cookie(request, response, session.sid)
+
+    async def _write_session(self, request, response, session):
+        value = self._encode_session(dict(session))
+        if len(value) <= self.threshold:
+            self._write_cookie(request, response, value)
+            return
+
+        # too large for the cookie: move the session to the backend
+        session.sid = uuid.uuid4().hex
+        session.in_backend = True
+        # interfaces which update stored sessions in place write only the
+        # changed keys, so the whole session has to be written
+        session.changed_keys.update(session.keys())
+        await self.backend._store_session(
+            self.backend.prefix + session.sid, session)
+        self._write_cookie(request, response, session.sid)
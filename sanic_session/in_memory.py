@@ -1,5 +1,71 @@
+import asyncio
+import os
+import struct
+import tempfile
+import time
+
 from .base import BaseSessionInterface
-from .utils import ExpiringDict
+from .serializers import JSONSerializer
+from .utils import ExpiringDict, BoundedExpiringDict
+
+
+_SNAPSHOT_MAGIC = b'SSNP\x01'
+# per entry: expiration time, whether the value is bytes, key and value
+# lengths, followed by the key and the value
+_SNAPSHOT_ENTRY = struct.Struct('<d?HI')
+
+
+def _write_snapshot(path, data, expiry_times):
+    """Writes the entries to a temporary file which then replaces `path`,
+    so that a crash never leaves a truncated snapshot behind.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=name + '.', suffix='.tmp', dir=directory)
+    count = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_SNAPSHOT_MAGIC)
+            for key, val in data.items():
+                is_bytes = isinstance(val, bytes)
+                encoded_key = key.encode()
+                encoded_val = val if is_bytes else val.encode()
+                f.write(_SNAPSHOT_ENTRY.pack(
+                    expiry_times[key], is_bytes,
+                    len(encoded_key), len(encoded_val)))
+                f.write(encoded_key)
+                f.write(encoded_val)
+                count += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return count
+
+
+def _read_snapshot(path, now):
+    """Reads the entries of a snapshot which haven't expired yet.
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+    if not content.startswith(_SNAPSHOT_MAGIC):
+        raise ValueError('{} is not a session snapshot'.format(path))
+
+    entries = []
+    offset = len(_SNAPSHOT_MAGIC)
+    while offset < len(content):
+        expires, is_bytes, key_len, val_len = _SNAPSHOT_ENTRY.unpack_from(
+            content, offset)
+        offset += _SNAPSHOT_ENTRY.size
+        key = content[offset:offset + key_len].decode()
+        offset += key_len
+        val = content[offset:offset + val_len]
+        offset += val_len
+        if expires > now:
+            entries.append((key, val if is_bytes else val.decode(), expires))
+    return entries
 
 
 class InMemorySessionInterface(BaseSessionInterface):
@@ -7,14 +73,174 @@ class InMemorySessionInterface(BaseSessionInterface):
             self, domain: str=None, expiry: int = 2592000,
             httponly: bool=True, cookie_name: str = 'session',
             prefix: str='session:',
-            sessioncookie: bool=False):
+            sessioncookie: bool=False,
+            sweep_interval: float=60,
+            sweep_batch_size: int=1000,
+            max_sessions: int=None,
+            max_bytes: int=None,
+            eviction_policy: str='lru',
+            only_save_modified: bool=False,
+            touch_interval: int=0,
+            lazy: bool=False,
+            serializer=None,
+            track_nested: bool=False,
+            coalesce_reads: bool=True,
+            write_behind_delay: float=None,
+            app=None,
+            snapshot_path: str=None,
+            snapshot_interval: float=60):
+        """Initializes the interface for storing client sessions in memory.
+        Args:
+            domain (str, optional):
+                Optional domain which will be attached to the cookie.
+            expiry (int, optional):
+                Seconds until the session should expire.
+            httponly (bool, optional):
+                Adds the `httponly` flag to the session cookie.
+            cookie_name (str, optional):
+                Name used for the client cookie.
+            prefix (str, optional):
+                Storage keys will take the format of `prefix+session_id`;
+                specify the prefix here.
+            sessioncookie (bool, optional):
+                Specifies if the sent cookie should be a 'session cookie', i.e
+                no Expires or Max-age headers are included. Expiry is still
+                fully tracked on the server side. Default setting is False.
+            sweep_interval (float, optional):
+                Seconds between passes of the background task which evicts
+                expired sessions that are never read again. The task is
+                started on the running loop with the first stored session.
+                Set to None or 0 to disable it.
+            sweep_batch_size (int, optional):
+                Maximum number of expired entries examined before the
+                sweeper yields back to the event loop.
+            max_sessions (int, optional):
+                Maximum number of sessions kept in the store. When the limit
+                is reached, storing a new session evicts an existing one.
+            max_bytes (int, optional):
+                Maximum total size of the serialized sessions kept in the
+                store. Sessions are evicted to make room for new data;
+                saving a session larger than `max_bytes` raises ValueError.
+            eviction_policy (str, optional):
+                Which session is evicted when `max_sessions` or `max_bytes`
+                is reached: 'lru' (least recently used, default) or 'lfu'
+                (least frequently used). The number of evictions is available
+                as `session_store.evictions`.
+            only_save_modified (bool, optional):
+                Write the session to the datastore only when it was modified
+                during the request. The expiration of unmodified sessions is
+                refreshed instead, see `touch_interval`.
+            touch_interval (int, optional):
+                With `only_save_modified`, minimal number of seconds between
+                expiration refreshes (in the datastore and in the cookie) of
+                an unmodified session. 0 refreshes it on every request,
+                None never refreshes it.
+            lazy (bool, optional):
+                Read the session from the datastore only when a handler
+                loads it with `await request['session'].load()`, so that
+                requests which do not use the session cost no datastore
+                round trip.
+            serializer (optional):
+                Object with `dumps` and `loads` methods which convert session
+                data to the stored value and back, see
+                `sanic_session.serializers`. Defaults to JSONSerializer.
+            track_nested (bool, optional):
+                Detect in-place changes of mutable session values, e.g.
+                `request['session']['cart'].append(item)`, by comparing them
+                with copies taken when the session was loaded. Costs a deep
+                copy of those values per request. Without it such changes
+                need an explicit `request['session']['cart'] = cart`.
+            coalesce_reads (bool, optional):
+                Share a single datastore read between concurrent requests
+                which open the same session in this worker, e.g. parallel
+                XHRs from one page. Enabled by default.
+            write_behind_delay (float, optional):
+                Delay writes of saved sessions by this many seconds, merging
+                all saves of a session within the delay into one datastore
+                write. Delayed writes are flushed before the server stops
+                when the interface is installed with `install_middleware`
+                outside of server listeners; otherwise call `flush()` in a
+                'before_server_stop' listener. Disabled by default.
+            app (sanic.Sanic, optional):
+                Sanic instance; when passed, `close` is called when the
+                server stops. Required with `snapshot_path` to register
+                listeners which load the snapshot when the server starts and
+                write a last one when it stops.
+            snapshot_path (str, optional):
+                File the sessions are saved to every `snapshot_interval`
+                seconds and when the server stops, and restored from when it
+                starts, so that sessions survive restarts. Expired sessions
+                are skipped. The file is written in a thread by a single
+                worker process only, so use it with one worker.
+                Disabled by default.
+            snapshot_interval (float, optional):
+                Seconds between snapshots. Set to None or 0 to only write a
+                snapshot when the server stops.
+        """
+        if snapshot_path is not None and app is None:
+            raise ValueError('app should be passed with snapshot_path')
+
         self.expiry = expiry
         self.prefix = prefix
         self.cookie_name = cookie_name
         self.domain = domain
         self.httponly = httponly
-        self.session_store = ExpiringDict()
+        if max_sessions is None and max_bytes is None:
+            self.session_store = ExpiringDict()
+        else:
+            self.session_store = BoundedExpiringDict(
+                max_items=max_sessions, max_bytes=max_bytes,
+                eviction_policy=eviction_policy)
         self.sessioncookie = sessioncookie
+        self.only_save_modified = only_save_modified
+        self.touch_interval = touch_interval
+        self.lazy = lazy
+        self.serializer = serializer or JSONSerializer()
+        self.track_nested = track_nested
+        self.coalesce_reads = coalesce_reads
+        self.write_behind_delay = write_behind_delay
+
+        self.sweep_interval = sweep_interval
+        self.sweep_batch_size = sweep_batch_size
+        self.sweep_stats = {
+            'passes': 0,
+            'evicted': 0,
+            'last_evicted': 0,
+            'last_duration': 0.0,
+        }
+        self._sweeper = None
+
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self._snapshot_write = None
+        if app is not None:
+            self._register_listeners(app)
+
+    def _register_listeners(self, app):
+        snapshotter = None
+
+        if self.snapshot_path is not None:
+            @app.listener('before_server_start')
+            async def load_session_snapshot(app, loop):
+                """Restore the sessions of the last snapshot, and start
+                taking snapshots periodically.
+                """
+                nonlocal snapshotter
+                await self.load_snapshot()
+                if self.snapshot_interval:
+                    snapshotter = asyncio.ensure_future(
+                        self._snapshot_periodically())
+
+        @app.listener('after_server_stop')
+        async def close_session_store(app, loop):
+            """Stop the background tasks, and save the sessions before the
+            process exits when snapshots are enabled.
+            """
+            if snapshotter is not None:
+                snapshotter.cancel()
+            if self.snapshot_path is not None:
+                await self.snapshot()
+            await self.close()
 
     async def _get_value(self, prefix, sid):
         return self.session_store.get(self.prefix + sid)
@@ -28,3 +254,87 @@ class InMemorySessionInterface(BaseSessionInterface):
             key, data,
             self.expiry
         )
+
+        if self.sweep_interval and self._sweeper is None:
+            self._sweeper = asyncio.ensure_future(self._sweep_periodically())
+
+    async def _touch_key(self, key):
+        self.session_store.touch(key, self.expiry)
+
+    async def _snapshot_periodically(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            await self.snapshot()
+
+    async def snapshot(self) -> int:
+        """Writes the sessions to `snapshot_path`. The store is copied on
+        the event loop, the file is written in a thread, after the previous
+        snapshot was written.
+        Returns:
+            int:
+                Number of written sessions.
+        """
+        # a cancelled snapshot keeps writing in its thread: wait for it
+        while self._snapshot_write is not None and \
+                not self._snapshot_write.done():
+            await asyncio.wait([self._snapshot_write])
+
+        data = dict(self.session_store)
+        expiry_times = dict(self.session_store.expiry_times)
+        loop = asyncio.get_event_loop()
+        self._snapshot_write = loop.run_in_executor(
+            None, _write_snapshot, self.snapshot_path, data, expiry_times)
+        return await asyncio.shield(self._snapshot_write)
+
+    async def load_snapshot(self) -> int:
+        """Restores the sessions of `snapshot_path` which haven't expired,
+        if the file exists. The file is read in a thread.
+        Returns:
+            int:
+                Number of restored sessions.
+        """
+        if not os.path.exists(self.snapshot_path):
+            return 0
+
+        now = time.time()
+        loop = asyncio.get_event_loop()
+        entries = await loop.run_in_executor(
+            None, _read_snapshot, self.snapshot_path, now)
+        for key, val, expires in entries:
+            self.session_store.set(key, val, expires - now)
+        return len(entries)
+
+    async def _sweep_periodically(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            await self.sweep()
+
+    async def close(self) -> None:
+        """Stops the periodic sweep of expired sessions.
+        """
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    async def sweep(self) -> int:
+        """Evicts all expired sessions from the store in batches of
+        `sweep_batch_size`, yielding to the event loop between batches.
+        Updates `sweep_stats`.
+        Returns:
+            int:
+                Number of evicted sessions.
+        """
+        start = time.monotonic()
+        evicted = 0
+
+        while True:
+            evicted += self.session_store.sweep(self.sweep_batch_size)
+            if not self.session_store.has_expired():
+                break
+            await asyncio.sleep(0)
+
+        self.sweep_stats['passes'] += 1
+        self.sweep_stats['evicted'] += evicted
+        self.sweep_stats['last_evicted'] = evicted
+        self.sweep_stats['last_duration'] = time.monotonic() - start
+        return evicted
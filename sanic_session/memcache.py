@@ -1,4 +1,6 @@
 from .base import BaseSessionInterface
+from .batching import Batcher
+from .serializers import JSONSerializer
 
 
 def check_aiomcache_installed():
@@ -20,7 +22,16 @@ class MemcacheSessionInterface(BaseSessionInterface):
             httponly: bool=True, cookie_name: str = 'session',
             prefix: str = 'session:',
             sessioncookie: bool=False,
-            pass_dependency_check: bool=False):
+            pass_dependency_check: bool=False,
+            only_save_modified: bool=False,
+            touch_interval: int=0,
+            lazy: bool=False,
+            serializer=None,
+            track_nested: bool=False,
+            coalesce_reads: bool=True,
+            write_behind_delay: float=None,
+            batch_window: float=None,
+            batch_max_size: int=100):
         """Initializes the interface for storing client sessions in memcache.
         Requires a client object establised with `asyncio_memcache`.
         Args:
@@ -45,6 +56,51 @@ class MemcacheSessionInterface(BaseSessionInterface):
                 Specifies, whether to check: are dependencies for
                 session interface installed.
                 Check can be passed, for example, when running tests.
+            only_save_modified (bool, optional):
+                Write the session to the datastore only when it was modified
+                during the request. The expiration of unmodified sessions is
+                refreshed instead, see `touch_interval`.
+            touch_interval (int, optional):
+                With `only_save_modified`, minimal number of seconds between
+                expiration refreshes (in the datastore and in the cookie) of
+                an unmodified session. 0 refreshes it on every request,
+                None never refreshes it.
+            lazy (bool, optional):
+                Read the session from the datastore only when a handler
+                loads it with `await request['session'].load()`, so that
+                requests which do not use the session cost no datastore
+                round trip.
+            serializer (optional):
+                Object with `dumps` and `loads` methods which convert session
+                data to the stored value and back, see
+                `sanic_session.serializers`. Defaults to JSONSerializer.
+            track_nested (bool, optional):
+                Detect in-place changes of mutable session values, e.g.
+                `request['session']['cart'].append(item)`, by comparing them
+                with copies taken when the session was loaded. Costs a deep
+                copy of those values per request. Without it such changes
+                need an explicit `request['session']['cart'] = cart`.
+            coalesce_reads (bool, optional):
+                Share a single datastore read between concurrent requests
+                which open the same session in this worker, e.g. parallel
+                XHRs from one page. Enabled by default.
+            write_behind_delay (float, optional):
+                Delay writes of saved sessions by this many seconds, merging
+                all saves of a session within the delay into one datastore
+                write. Delayed writes are flushed before the server stops
+                when the interface is installed with `install_middleware`
+                outside of server listeners; otherwise call `flush()` in a
+                'before_server_stop' listener. Disabled by default.
+            batch_window (float, optional):
+                Collect reads of concurrent requests for this many seconds
+                (e.g. 0.0005) and send them as one `multi_get`. Raises
+                throughput per connection at high concurrency at the cost of
+                up to `batch_window` seconds of latency. memcache has no
+                multi-key write, so writes are not batched. Disabled by
+                default.
+            batch_max_size (int, optional):
+                Maximum number of reads sent together; a full batch is sent
+                without waiting for the end of `batch_window`.
         """
         if not pass_dependency_check:
             check_aiomcache_installed()
@@ -62,17 +118,40 @@ class MemcacheSessionInterface(BaseSessionInterface):
         self.domain = domain
         self.httponly = httponly
         self.sessioncookie = sessioncookie
+        self.only_save_modified = only_save_modified
+        self.touch_interval = touch_interval
+        self.lazy = lazy
+        self.serializer = serializer or JSONSerializer()
+        self.track_nested = track_nested
+        self.coalesce_reads = coalesce_reads
+        self.write_behind_delay = write_behind_delay
+        self.batch_window = batch_window
+        self._get_batcher = None
+        if batch_window is not None:
+            self._get_batcher = Batcher(
+                self._get_many, batch_window, batch_max_size)
 
     async def _get_value(self, prefix, sid):
         key = (self.prefix + sid).encode()
-        value = await self.memcache_connection.get(key)
-        return value.decode() if value else None
+        if self._get_batcher is not None:
+            return await self._get_batcher.submit(key)
+        # values are passed to the serializer as bytes, without decoding
+        return await self.memcache_connection.get(key)
+
+    async def _get_many(self, keys):
+        return await self.memcache_connection.multi_get(*keys)
 
     async def _delete_key(self, key):
         return await self.memcache_connection.delete(key.encode())
 
     async def _set_value(self, key, data):
+        if isinstance(data, str):
+            data = data.encode()
         return await self.memcache_connection.set(
-            key.encode(), data.encode(),
+            key.encode(), data,
             exptime=self.expiry
         )
+
+    async def _touch_key(self, key):
+        return await self.memcache_connection.touch(
+            key.encode(), self.expiry)
@@ -1,6 +1,8 @@
+import copy
 from datetime import datetime, timedelta
 
-from .base import BaseSessionInterface
+from .base import BaseSessionInterface, SessionDict, logger
+from .serializers import JSONSerializer
 
 
 def check_sanic_motor_installed():
@@ -38,6 +40,27 @@ def get_base_model():
 
 _SessionModel = get_base_model()
 
+# MongoDB error codes of duplicate key errors
+_DUPLICATE_KEY_CODES = (11000, 11001)
+
+
+def _is_updatable_field(field):
+    """Whether the session key can be updated with a `data.<key>` path.
+    """
+    return isinstance(field, str) and field and \
+        '.' not in field and not field.startswith('$')
+
+
+def _to_document(value):
+    """Converts dict keys to strings, in nested values as well, like the
+    JSON serializer does: BSON documents only have string keys.
+    """
+    if isinstance(value, dict):
+        return {str(key): _to_document(val) for key, val in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_document(val) for val in value]
+    return value
+
 
 class MongoDBSessionInterface(BaseSessionInterface):
     def __init__(
@@ -47,9 +70,19 @@ class MongoDBSessionInterface(BaseSessionInterface):
             httponly: bool=True,
             cookie_name: str='session',
             sessioncookie: bool=False,
-            pass_dependency_check: bool=False):
+            pass_dependency_check: bool=False,
+            only_save_modified: bool=False,
+            touch_interval: int=0,
+            lazy: bool=False,
+            serializer=None,
+            track_nested: bool=False,
+            coalesce_reads: bool=True,
+            write_behind_delay: float=None):
 
         """Initializes the interface for storing client sessions in MongoDB.
+        Sessions are stored as BSON subdocuments in the `data` field, and
+        saving a loaded session updates only the keys which were changed or
+        removed, with `$set`/`$unset`.
         Args:
             app (sanic.Sanic):
                 Sanic instance to register listener('after_server_start')
@@ -67,17 +100,69 @@ class MongoDBSessionInterface(BaseSessionInterface):
                 Specifies if the sent cookie should be a 'session cookie', i.e
                 no Expires or Max-age headers are included. Expiry is still
                 fully tracked on the server side. Default setting is False.
+            pass_dependency_check (bool, optional):
+                Specifies, whether to check: are dependencies for
+                session interface installed.
+                Check can be passed, for example, when running tests.
+            only_save_modified (bool, optional):
+                Write the session to the datastore only when it was modified
+                during the request. The expiration of unmodified sessions is
+                refreshed instead, see `touch_interval`.
+            touch_interval (int, optional):
+                With `only_save_modified`, minimal number of seconds between
+                expiration refreshes (in the datastore and in the cookie) of
+                an unmodified session. 0 refreshes it on every request,
+                None never refreshes it.
+            lazy (bool, optional):
+                Read the session from the datastore only when a handler
+                loads it with `await request['session'].load()`, so that
+                requests which do not use the session cost no datastore
+                round trip.
+            serializer (optional):
+                Sessions are stored as documents, so the serializer is only
+                used to read sessions stored as serialized strings by earlier
+                versions. Defaults to JSONSerializer.
+            track_nested (bool, optional):
+                Detect in-place changes of mutable session values, e.g.
+                `request['session']['cart'].append(item)`, by comparing them
+                with copies taken when the session was loaded. Costs a deep
+                copy of those values per request. Without it such changes
+                need an explicit `request['session']['cart'] = cart`.
+            coalesce_reads (bool, optional):
+                Share a single datastore read between concurrent requests
+                which open the same session in this worker, e.g. parallel
+                XHRs from one page. Enabled by default.
+            write_behind_delay (float, optional):
+                Delay writes of saved sessions by this many seconds, merging
+                all saves of a session within the delay into one datastore
+                write. Delayed writes are flushed before the server stops
+                when the interface is installed with `install_middleware`
+                outside of server listeners; otherwise call `flush()` in a
+                'before_server_stop' listener. Disabled by default.
+                Not supported by this interface.
         """
         if not pass_dependency_check:
             check_sanic_motor_installed()
 
+        if write_behind_delay:
+            raise ValueError(
+                "write_behind_delay isn't supported by MongoDBSessionInterface")
+
         self.expiry = expiry
         self.cookie_name = cookie_name
         self.domain = domain
-        self.httponly = True
+        self.httponly = httponly
         self.sessioncookie = sessioncookie
+        self.only_save_modified = only_save_modified
+        self.touch_interval = touch_interval
+        self.lazy = lazy
+        self.serializer = serializer or JSONSerializer()
+        self.track_nested = track_nested
+        self.coalesce_reads = coalesce_reads
+        self.write_behind_delay = write_behind_delay
         # prefix not needed for mongodb as mongodb uses uuid4 natively
         self.prefix = ''
+        self.stores_serialized_values = False
 
         # set collection name
         _SessionModel.__coll__ = coll
@@ -88,15 +173,79 @@ class MongoDBSessionInterface(BaseSessionInterface):
             if doesn't exist.
             Indexes:
                 sid:
-                    For faster lookup.
+                    Unique, for faster lookup and to prevent duplicates
+                    from concurrent upserts.
                 expiry:
                     For document expiration.
             """
-            await _SessionModel.create_index('sid')
+            indexes = await _SessionModel.index_information()
+            sid_index = indexes.get('sid_1')
+            if sid_index is not None and not sid_index.get('unique'):
+                # created without `unique` by earlier versions, MongoDB
+                # can't change the options of an existing index
+                await _SessionModel.drop_index('sid_1')
+
+            try:
+                await _SessionModel.create_index('sid', unique=True)
+            except Exception as exc:
+                if getattr(exc, 'code', None) not in _DUPLICATE_KEY_CODES:
+                    raise
+                logger.error(
+                    "Can't create a unique index on session sids, the "
+                    "%s collection holds duplicate sids; remove them and "
+                    "restart. Using a non-unique index meanwhile.",
+                    _SessionModel.__coll__)
+                await _SessionModel.create_index('sid')
             await _SessionModel.create_index('expiry', expireAfterSeconds=0)
 
     async def _get_value(self, prefix, key):
-        await _SessionModel.find_one({'sid': key}, as_raw=True)
+        # only fetch the session data, served from the `sid` index
+        document = await _SessionModel.find_one(
+            {'sid': key}, {'data': 1, '_id': 0}, as_raw=True)
+        return document['data'] if document else None
+
+    async def _load_session(self, sid):
+        data = await self._single_flight(
+            sid, lambda: self._get_value(self.prefix, sid))
+
+        if data is None:
+            return SessionDict(sid=sid)
+
+        if isinstance(data, dict):
+            # the read may be shared by concurrent requests, which must not
+            # see each other's changes of nested values
+            session = SessionDict(
+                copy.deepcopy(data), sid=sid, track_nested=self.track_nested)
+            # lets `_store_session` update just the changed fields
+            session.stored_as_document = True
+            return session
+
+        # stored as a serialized string by an earlier version
+        return SessionDict(
+            self.serializer.loads(data), sid=sid,
+            track_nested=self.track_nested)
+
+    async def _store_session(self, key, session):
+        fields = session.changed_keys | session.deleted_keys
+        if getattr(session, 'stored_as_document', False) and \
+                all(_is_updatable_field(field) for field in fields):
+            expiry = datetime.utcnow() + timedelta(seconds=self.expiry)
+            update = {'$set': {'expiry': expiry}}
+            for field in session.changed_keys:
+                update['$set']['data.' + field] = _to_document(session[field])
+            if session.deleted_keys:
+                update['$unset'] = {
+                    'data.' + field: '' for field in session.deleted_keys
+                }
+
+            result = await _SessionModel.update_one({'sid': key}, update)
+            if result.matched_count:
+                self._forget_inflight_read(key)
+                return
+            # the document expired meanwhile, write it as a whole
+
+        await self._set_value(key, _to_document(dict(session)))
+        self._forget_inflight_read(key)
 
     async def _delete_key(self, key):
         await _SessionModel.delete_one({'sid': key})
@@ -112,3 +261,10 @@ class MongoDBSessionInterface(BaseSessionInterface):
             },
             upsert=True
         )
+
+    async def _touch_key(self, key):
+        expiry = datetime.utcnow() + timedelta(seconds=self.expiry)
+        await _SessionModel.update_one(
+            {'sid': key},
+            {'$set': {'expiry': expiry}}
+        )
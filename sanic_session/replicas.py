@@ -0,0 +1,133 @@
+import itertools
+import time
+from typing import Any, Awaitable, List
+
+from .utils import BoundedExpiringDict
+
+
+REPLICA_STRATEGIES = ('round_robin', 'least_latency')
+
+
+class ReplicaRouter(object):
+    """Chooses the Redis connection session reads are sent to: one of the
+    replicas, or the primary for sessions written by this worker within the
+    last `read_your_writes_window` seconds, so that a request never reads an
+    older version of a session than the one it saved just before (replicas
+    are updated asynchronously).
+    A replica whose read fails gets no reads for `error_backoff` seconds,
+    doubled after each further failure, up to `max_error_backoff`.
+    Statistics are available as `replica_reads`, `primary_reads`,
+    `replica_errors` and `latencies` (moving average of the read latency of
+    each replica, in seconds).
+    """
+    def __init__(
+            self, replicas: List, strategy: str='round_robin',
+            read_your_writes_window: float=1.0,
+            max_recent_writes: int=100000,
+            error_backoff: float=1.0,
+            max_error_backoff: float=30.0):
+        """
+        Args:
+            replicas (list):
+                Connections or connection pools of the replicas.
+            strategy (str, optional):
+                'round_robin' spreads reads evenly over the replicas,
+                'least_latency' sends them to the replica with the lowest
+                moving average of read latency.
+            read_your_writes_window (float, optional):
+                Seconds after a write during which the session is read from
+                the primary.
+            max_recent_writes (int, optional):
+                Maximum number of recently written sessions remembered;
+                sessions forgotten earlier are read from the replicas.
+            error_backoff (float, optional):
+                Seconds a replica gets no reads after a failed read.
+            max_error_backoff (float, optional):
+                Maximum seconds a replica gets no reads after repeated
+                failures.
+        """
+        if not replicas:
+            raise ValueError('At least one replica should be passed')
+        if strategy not in REPLICA_STRATEGIES:
+            raise ValueError(
+                "strategy must be one of: {}".format(
+                    ', '.join(REPLICA_STRATEGIES)))
+
+        self.replicas = list(replicas)
+        self.strategy = strategy
+        self.read_your_writes_window = read_your_writes_window
+        self.recent_writes = BoundedExpiringDict(max_items=max_recent_writes)
+        self.latencies = [0.0] * len(self.replicas)
+        self.error_backoff = error_backoff
+        self.max_error_backoff = max_error_backoff
+        self._excluded_until = [0.0] * len(self.replicas)
+        self._failures = [0] * len(self.replicas)
+
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.replica_errors = 0
+        self._next = itertools.cycle(range(len(self.replicas)))
+
+    def written(self, key: str, window: float=None):
+        """Remembers that the session stored under `key` was just written,
+        for `window` seconds (by default `read_your_writes_window`), e.g.
+        what is left of the window of a write by another worker.
+        """
+        if self.read_your_writes_window:
+            self.recent_writes.set(
+                key, True, window or self.read_your_writes_window)
+
+    def use_primary(self, key: str) -> bool:
+        """Whether the session stored under `key` must be read from the
+        primary.
+        """
+        if self.recent_writes.get(key) is not None:
+            self.primary_reads += 1
+            return True
+        return False
+
+    def choose(self) -> int:
+        """Returns the index of the replica to read from. Replicas backing
+        off after errors are skipped, unless all of them are.
+        """
+        now = time.monotonic()
+        available = [
+            index for index, until in enumerate(self._excluded_until)
+            if until <= now
+        ] or range(len(self.replicas))
+
+        if self.strategy == 'least_latency':
+            # replicas not measured yet have a latency of 0, so each of
+            # them is tried first
+            return min(available, key=self.latencies.__getitem__)
+
+        for _ in range(len(self.replicas)):
+            index = next(self._next)
+            if index in available:
+                return index
+
+    async def read(self, index: int, command: Awaitable) -> Any:
+        """Awaits a read sent to the replica `index`, measuring its latency.
+        """
+        self.replica_reads += 1
+        start = time.monotonic()
+        try:
+            result = await command
+        except Exception:
+            self.replica_errors += 1
+            backoff = min(
+                self.error_backoff * 2 ** self._failures[index],
+                self.max_error_backoff)
+            self._failures[index] += 1
+            self._excluded_until[index] = time.monotonic() + backoff
+            raise
+
+        self._failures[index] = 0
+        elapsed = time.monotonic() - start
+        for other in range(len(self.latencies)):
+            if other != index:
+                # replicas which get no reads slowly become candidates
+                # again, so that a recovered one is measured anew
+                self.latencies[other] *= 0.99
+        self.latencies[index] += 0.2 * (elapsed - self.latencies[index])
+        return result
@@ -0,0 +1,127 @@
+import zlib
+
+import ujson
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+
+def check_orjson_installed():
+    """Check orjson installed, if absent - raises error.
+    """
+    if orjson is None:
+        raise RuntimeError("Please install orjson: pip install sanic_session[orjson]")
+
+
+def check_msgpack_installed():
+    """Check msgpack installed, if absent - raises error.
+    """
+    if msgpack is None:
+        raise RuntimeError("Please install msgpack: pip install sanic_session[msgpack]")
+
+
+class JSONSerializer(object):
+    """Stores sessions as JSON text, using ujson. This is the default
+    serializer, its output is compatible with sessions stored by earlier
+    versions.
+    """
+    def dumps(self, data: dict) -> str:
+        return ujson.dumps(data)
+
+    def loads(self, value) -> dict:
+        # ujson reads bytes as well, so values don't need decoding
+        return ujson.loads(value)
+
+
+class OrjsonSerializer(object):
+    """Stores sessions as JSON, using orjson, which reads and writes bytes
+    directly. Reads sessions stored by JSONSerializer.
+    """
+    def __init__(self):
+        check_orjson_installed()
+
+    def dumps(self, data: dict) -> bytes:
+        return orjson.dumps(data)
+
+    def loads(self, value) -> dict:
+        return orjson.loads(value)
+
+
+class MsgpackSerializer(object):
+    """Stores sessions in the compact msgpack binary format. Sessions stored
+    by JSON serializers can't be read with it.
+    """
+    def __init__(self):
+        check_msgpack_installed()
+
+    def dumps(self, data: dict) -> bytes:
+        return msgpack.packb(data, use_bin_type=True)
+
+    def loads(self, value) -> dict:
+        return msgpack.unpackb(value, raw=False)
+
+
+class CompressedSerializer(object):
+    """Wraps another serializer and zlib-compresses values which are at
+    least `threshold` bytes long. Compressed values start with a magic
+    header, which can't start a JSON or msgpack value, so values stored
+    before compression was enabled are still read.
+    Compression statistics are available as `bytes_in`, `bytes_out` and
+    `compression_ratio`.
+    """
+    MAGIC = b'\x00zl'
+
+    def __init__(self, serializer=None, threshold: int=1024, level: int=6):
+        """
+        Args:
+            serializer (optional):
+                Serializer whose output is compressed.
+                Defaults to JSONSerializer.
+            threshold (int, optional):
+                Minimal size in bytes of values which get compressed,
+                smaller ones are stored as they are.
+            level (int, optional):
+                zlib compression level, from 1 (fastest) to 9 (smallest).
+        """
+        self.serializer = serializer or JSONSerializer()
+        self.threshold = threshold
+        self.level = level
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def compression_ratio(self) -> float:
+        """Size of serialized values divided by the size of stored values.
+        """
+        if not self.bytes_out:
+            return 1.0
+        return self.bytes_in / self.bytes_out
+
+    def dumps(self, data: dict):
+        value = self.serializer.dumps(data)
+        if isinstance(value, str):
+            value = value.encode()
+
+        size = len(value)
+        if size >= self.threshold:
+            compressed = self.MAGIC + zlib.compress(value, self.level)
+            if len(compressed) < size:
+                value = compressed
+
+        self.bytes_in += size
+        self.bytes_out += len(value)
+        return value
+
+    def loads(self, value) -> dict:
+        if isinstance(value, (bytes, bytearray)) and \
+                value.startswith(self.MAGIC):
+            value = zlib.decompress(value[len(self.MAGIC):])
+        return self.serializer.loads(value)
@@ -0,0 +1,137 @@
+import bisect
+import hashlib
+from typing import Dict
+
+from .base import BaseSessionInterface, INTERFACE_SETTINGS
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], 'big')
+
+
+class HashRing(object):
+    """Consistent hash ring: maps keys to node names so that adding or
+    removing a node only remaps about 1/N of the keys. Every node is
+    placed on the ring `vnodes` times to spread keys evenly.
+    """
+    def __init__(self, nodes=(), vnodes: int=160):
+        self.vnodes = vnodes
+        self._points = []
+        self._nodes = {}
+        for node in nodes:
+            self.add_node(node)
+
+    def add_node(self, node: str):
+        for i in range(self.vnodes):
+            point = _hash('{}#{}'.format(node, i))
+            bisect.insort(self._points, point)
+            self._nodes[point] = node
+
+    def remove_node(self, node: str):
+        for i in range(self.vnodes):
+            point = _hash('{}#{}'.format(node, i))
+            if self._nodes.get(point) == node:
+                del self._nodes[point]
+                del self._points[bisect.bisect_left(self._points, point)]
+
+    def get_node(self, key: str) -> str:
+        if not self._points:
+            raise LookupError('HashRing has no nodes')
+
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._nodes[self._points[index]]
+
+
+class ShardedSessionInterface(BaseSessionInterface):
+    def __init__(
+            self,
+            shards: Dict[str, BaseSessionInterface],
+            vnodes: int=160,
+            shard_hint: bool=False,
+        ):
+        """Initializes a session interface which spreads sessions over
+        several session interfaces (e.g. one per Redis node or memcache
+        server), routing every session id to one of them with consistent
+        hashing. Cookie and storage settings are taken from the first shard;
+        all shards must use the same `prefix`.
+        Args:
+            shards (dict):
+                Shard names mapped to session interfaces storing serialized
+                sessions. Names can't contain '.'.
+            vnodes (int, optional):
+                Number of points per shard on the hash ring.
+            shard_hint (bool, optional):
+                Prefix ids of new sessions with the name of their shard
+                (`<shard>.<id>`), so that they are routed without hashing
+                and stay on their shard when shards are added. Ids without
+                a hint, or with the hint of a removed shard, are routed by
+                hashing. The hint is added when the session is saved.
+        """
+        if not shards:
+            raise ValueError('At least one shard should be passed')
+
+        interfaces = list(shards.values())
+        for interface in interfaces:
+            if not interface.stores_serialized_values:
+                raise ValueError(
+                    "ShardedSessionInterface needs shards "
+                    "which store serialized sessions")
+            if interface.prefix != interfaces[0].prefix:
+                raise ValueError('All shards should use the same prefix')
+
+        for name in INTERFACE_SETTINGS:
+            setattr(self, name, getattr(interfaces[0], name))
+
+        self.shard_hint = shard_hint
+        self.shards = {}
+        self.ring = HashRing(vnodes=vnodes)
+        for name, interface in shards.items():
+            self.add_shard(name, interface)
+
+    def add_shard(self, name: str, interface: BaseSessionInterface):
+        """Adds a shard; about 1/N of the sessions routed by hashing move
+        to it.
+        """
+        if '.' in name:
+            raise ValueError("Shard names can't contain '.'")
+
+        self.shards[name] = interface
+        self.ring.add_node(name)
+
+    def remove_shard(self, name: str):
+        """Removes a shard; only its sessions are remapped to other shards.
+        """
+        del self.shards[name]
+        self.ring.remove_node(name)
+
+    def _shard_for(self, sid: str) -> BaseSessionInterface:
+        name, dot, _ = sid.partition('.')
+        if dot and name in self.shards:
+            return self.shards[name]
+        return self.shards[self.ring.get_node(sid)]
+
+    def _shard_for_key(self, key: str) -> BaseSessionInterface:
+        return self._shard_for(key[len(self.prefix):])
+
+    async def _get_value(self, prefix, sid):
+        return await self._shard_for(sid)._get_value(prefix, sid)
+
+    async def _delete_key(self, key):
+        await self._shard_for_key(key)._delete_key(key)
+
+    async def _set_value(self, key, data):
+        await self._shard_for_key(key)._set_value(key, data)
+
+    async def _touch_key(self, key):
+        await self._shard_for_key(key)._touch_key(key)
+
+    async def save(self, request, response) -> None:
+        session = request.get('session')
+        if self.shard_hint and getattr(session, 'sid', None) and \
+                '.' not in session.sid and \
+                request.cookies.get(self.cookie_name) != session.sid:
+            # new session: embed its shard in the id before it is stored
+            session.sid = '{}.{}'.format(
+                self.ring.get_node(session.sid), session.sid)
+
+        await super().save(request, response)
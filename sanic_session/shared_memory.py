@@ -0,0 +1,253 @@
+import mmap
+import multiprocessing
+import struct
+import time
+import zlib
+from typing import Union
+
+from .base import BaseSessionInterface
+from .serializers import JSONSerializer
+
+
+# slot header: used flag, expiration time, key length, value length
+_SLOT_HEADER = struct.Struct('<BdHI')
+_EXPIRES = struct.Struct('<d')
+
+
+class SharedMemoryStore(object):
+    """Fixed size hash table of expiring values in anonymous shared memory,
+    shared with the processes forked after it was created, e.g. Sanic
+    workers. Keys are hashed to buckets of `bucket_size` slots; a bucket is
+    guarded by one of `lock_stripes` process-shared locks, held only while
+    its slots are copied. When a bucket is full, the entry of the bucket
+    which expires first is evicted (`evictions` counts them in this
+    process).
+    """
+    def __init__(
+            self, max_items: int=10000, max_key_size: int=64,
+            max_value_size: int=4096, bucket_size: int=8,
+            lock_stripes: int=64):
+        self.max_key_size = max_key_size
+        self.max_value_size = max_value_size
+        self.bucket_size = bucket_size
+        self.buckets = max(1, -(-max_items // bucket_size))
+        self.slot_size = _SLOT_HEADER.size + max_key_size + max_value_size
+
+        self.memory = mmap.mmap(
+            -1, self.buckets * bucket_size * self.slot_size)
+        self.locks = [multiprocessing.Lock() for _ in range(lock_stripes)]
+        self.evictions = 0
+
+    def _bucket(self, key: bytes):
+        bucket = zlib.crc32(key) % self.buckets
+        offset = bucket * self.bucket_size * self.slot_size
+        return offset, self.locks[bucket % len(self.locks)]
+
+    def _find(self, offset: int, key: bytes, now: float):
+        """Offset of the live slot holding `key` in the bucket, or None.
+        """
+        for slot in range(offset, offset + self.bucket_size * self.slot_size,
+                          self.slot_size):
+            used, expires, key_len, _ = _SLOT_HEADER.unpack_from(
+                self.memory, slot)
+            start = slot + _SLOT_HEADER.size
+            if used and expires > now and key_len == len(key) and \
+                    self.memory[start:start + key_len] == key:
+                return slot
+        return None
+
+    def _free_slot(self, offset: int, now: float) -> int:
+        """Offset of an unused or expired slot in the bucket, evicting the
+        entry which expires first when there is none.
+        """
+        victim, victim_expires = None, None
+        for slot in range(offset, offset + self.bucket_size * self.slot_size,
+                          self.slot_size):
+            used, expires, _, _ = _SLOT_HEADER.unpack_from(self.memory, slot)
+            if not used or expires <= now:
+                return slot
+            if victim is None or expires < victim_expires:
+                victim, victim_expires = slot, expires
+
+        self.evictions += 1
+        return victim
+
+    @staticmethod
+    def _encode(value: Union[str, bytes]) -> bytes:
+        return value.encode() if isinstance(value, str) else value
+
+    def set(self, key: str, val: Union[str, bytes], expiry: float):
+        key, val = self._encode(key), self._encode(val)
+        if len(key) > self.max_key_size:
+            raise ValueError(
+                'Key of {} bytes exceeds max_key_size'.format(len(key)))
+        if len(val) > self.max_value_size:
+            raise ValueError(
+                'Session of {} bytes exceeds max_value_size'.format(len(val)))
+
+        now = time.time()
+        offset, lock = self._bucket(key)
+        with lock:
+            slot = self._find(offset, key, now)
+            if slot is None:
+                slot = self._free_slot(offset, now)
+            start = slot + _SLOT_HEADER.size
+            self.memory[start:start + len(key)] = key
+            start += self.max_key_size
+            self.memory[start:start + len(val)] = val
+            _SLOT_HEADER.pack_into(
+                self.memory, slot, 1, now + expiry, len(key), len(val))
+
+    def get(self, key: str):
+        key = self._encode(key)
+        offset, lock = self._bucket(key)
+        with lock:
+            slot = self._find(offset, key, time.time())
+            if slot is None:
+                return None
+            val_len = _SLOT_HEADER.unpack_from(self.memory, slot)[3]
+            start = slot + _SLOT_HEADER.size + self.max_key_size
+            return self.memory[start:start + val_len]
+
+    def touch(self, key: str, expiry: float):
+        """Resets expiration time of an existing, not yet expired key.
+        """
+        key = self._encode(key)
+        offset, lock = self._bucket(key)
+        with lock:
+            now = time.time()
+            slot = self._find(offset, key, now)
+            if slot is not None:
+                _EXPIRES.pack_into(self.memory, slot + 1, now + expiry)
+
+    def delete(self, key: str):
+        key = self._encode(key)
+        offset, lock = self._bucket(key)
+        with lock:
+            slot = self._find(offset, key, time.time())
+            if slot is not None:
+                self.memory[slot] = 0
+
+    def __len__(self):
+        """Number of live entries; scans the whole table.
+        """
+        now = time.time()
+        count = 0
+        for slot in range(0, len(self.memory), self.slot_size):
+            used, expires, _, _ = _SLOT_HEADER.unpack_from(self.memory, slot)
+            if used and expires > now:
+                count += 1
+        return count
+
+
+class SharedMemorySessionInterface(BaseSessionInterface):
+    def __init__(
+            self, domain: str=None, expiry: int=2592000,
+            httponly: bool=True, cookie_name: str='session',
+            prefix: str='session:',
+            sessioncookie: bool=False,
+            max_sessions: int=10000,
+            max_session_size: int=4096,
+            max_key_size: int=64,
+            only_save_modified: bool=False,
+            touch_interval: int=0,
+            lazy: bool=False,
+            serializer=None,
+            track_nested: bool=False,
+            coalesce_reads: bool=True,
+            write_behind_delay: float=None):
+        """Initializes the interface for storing client sessions in memory
+        shared by all worker processes of a host, so that a session is
+        visible to every worker without a network datastore.
+        The memory is allocated here and inherited by the processes forked
+        later, so the interface must be created before the server starts
+        its workers (e.g. when the module creating the app is imported),
+        on a platform which forks them.
+        Args:
+            domain (str, optional):
+                Optional domain which will be attached to the cookie.
+            expiry (int, optional):
+                Seconds until the session should expire.
+            httponly (bool, optional):
+                Adds the `httponly` flag to the session cookie.
+            cookie_name (str, optional):
+                Name used for the client cookie.
+            prefix (str, optional):
+                Storage keys will take the format of `prefix+session_id`;
+                specify the prefix here.
+            sessioncookie (bool, optional):
+                Specifies if the sent cookie should be a 'session cookie', i.e
+                no Expires or Max-age headers are included. Expiry is still
+                fully tracked on the server side. Default setting is False.
+            max_sessions (int, optional):
+                Number of sessions the shared memory is sized for. When the
+                part of the table a new session hashes to is full, the
+                session which expires first there is evicted.
+            max_session_size (int, optional):
+                Maximum size of a serialized session in bytes. Saving a
+                larger session raises ValueError. The shared memory takes
+                about `max_sessions * max_session_size` bytes.
+            max_key_size (int, optional):
+                Maximum length of `prefix+session_id` in bytes.
+            only_save_modified (bool, optional):
+                Write the session to the datastore only when it was modified
+                during the request. The expiration of unmodified sessions is
+                refreshed instead, see `touch_interval`.
+            touch_interval (int, optional):
+                With `only_save_modified`, minimal number of seconds between
+                expiration refreshes (in the datastore and in the cookie) of
+                an unmodified session. 0 refreshes it on every request,
+                None never refreshes it.
+            lazy (bool, optional):
+                Read the session from the datastore only when a handler
+                loads it with `await request['session'].load()`.
+            serializer (optional):
+                Object with `dumps` and `loads` methods which convert session
+                data to the stored value and back, see
+                `sanic_session.serializers`. Defaults to JSONSerializer.
+            track_nested (bool, optional):
+                Detect in-place changes of mutable session values, e.g.
+                `request['session']['cart'].append(item)`, by comparing them
+                with copies taken when the session was loaded. Costs a deep
+                copy of those values per request. Without it such changes
+                need an explicit `request['session']['cart'] = cart`.
+            coalesce_reads (bool, optional):
+                Share a single datastore read between concurrent requests
+                which open the same session in this worker, e.g. parallel
+                XHRs from one page. Enabled by default.
+            write_behind_delay (float, optional):
+                Delay writes of saved sessions by this many seconds, merging
+                all saves of a session within the delay into one datastore
+                write. Delayed writes are flushed before the server stops
+                when the interface is installed with `install_middleware`
+                outside of server listeners; otherwise call `flush()` in a
+                'before_server_stop' listener. Disabled by default.
+        """
+        self.expiry = expiry
+        self.prefix = prefix
+        self.cookie_name = cookie_name
+        self.domain = domain
+        self.httponly = httponly
+        self.session_store = SharedMemoryStore(
+            max_items=max_sessions, max_key_size=max_key_size,
+            max_value_size=max_session_size)
+        self.sessioncookie = sessioncookie
+        self.only_save_modified = only_save_modified
+        self.touch_interval = touch_interval
+        self.lazy = lazy
+        self.serializer = serializer or JSONSerializer()
+        self.track_nested = track_nested
+        self.coalesce_reads = coalesce_reads
+        self.write_behind_delay = write_behind_delay
+
+    async def _get_value(self, prefix, sid):
+        return self.session_store.get(self.prefix + sid)
+
+    async def _delete_key(self, key):
+        self.session_store.delete(key)
+
+    async def _set_value(self, key, data):
+        self.session_store.set(key, data, self.expiry)
+
+    async def _touch_key(self, key):
+        self.session_store.touch(key, self.expiry)
@@ -0,0 +1,269 @@
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .base import BaseSessionInterface
+from .batching import Batcher
+from .serializers import JSONSerializer
+
+
+class SQLiteSessionInterface(BaseSessionInterface):
+    def __init__(
+            self,
+            path: str='sessions.sqlite3',
+            domain: str=None,
+            expiry: int=2592000,
+            httponly: bool=True,
+            cookie_name: str='session',
+            prefix: str='session:',
+            sessioncookie: bool=False,
+            mmap_size: int=256 * 1024 * 1024,
+            purge_interval: float=600,
+            busy_timeout: float=5,
+            only_save_modified: bool=False,
+            touch_interval: int=0,
+            lazy: bool=False,
+            serializer=None,
+            track_nested: bool=False,
+            coalesce_reads: bool=True,
+            write_behind_delay: float=None,
+            batch_window: float=None,
+            batch_max_size: int=100,
+            app=None,
+        ):
+        """Initializes the interface for storing client sessions in a local
+        SQLite database, so that they survive restarts without a datastore
+        server. The database is used in WAL mode, so reads don't wait for
+        writes, and is read through a memory map. All database calls run in
+        a single thread of each worker process, never blocking the event
+        loop; worker processes of a host can share the database file.
+        Args:
+            path (str, optional):
+                Path of the database file, created if it doesn't exist.
+            domain (str, optional):
+                Optional domain which will be attached to the cookie.
+            expiry (int, optional):
+                Seconds until the session should expire.
+            httponly (bool, optional):
+                Adds the `httponly` flag to the session cookie.
+            cookie_name (str, optional):
+                Name used for the client cookie.
+            prefix (str, optional):
+                Storage keys will take the format of `prefix+session_id`;
+                specify the prefix here.
+            sessioncookie (bool, optional):
+                Specifies if the sent cookie should be a 'session cookie', i.e
+                no Expires or Max-age headers are included. Expiry is still
+                fully tracked on the server side. Default setting is False.
+            mmap_size (int, optional):
+                Bytes of the database file read through a memory map
+                (`PRAGMA mmap_size`). 0 disables memory-mapped reads.
+            purge_interval (float, optional):
+                Seconds between purges of expired sessions, using the index
+                on the expiration column, see `purge_expired`. The purge is
+                started with the first stored session. Set to None or 0 to
+                disable it.
+            busy_timeout (float, optional):
+                Seconds a write waits for a write of another worker process
+                to finish.
+            only_save_modified (bool, optional):
+                Write the session to the datastore only when it was modified
+                during the request. The expiration of unmodified sessions is
+                refreshed instead, see `touch_interval`.
+            touch_interval (int, optional):
+                With `only_save_modified`, minimal number of seconds between
+                expiration refreshes (in the datastore and in the cookie) of
+                an unmodified session. 0 refreshes it on every request,
+                None never refreshes it.
+            lazy (bool, optional):
+                Read the session from the datastore only when a handler
+                loads it with `await request['session'].load()`, so that
+                requests which do not use the session cost no datastore
+                round trip.
+            serializer (optional):
+                Object with `dumps` and `loads` methods which convert session
+                data to the stored value and back, see
+                `sanic_session.serializers`. Defaults to JSONSerializer.
+            track_nested (bool, optional):
+                Detect in-place changes of mutable session values, e.g.
+                `request['session']['cart'].append(item)`, by comparing them
+                with copies taken when the session was loaded. Costs a deep
+                copy of those values per request. Without it such changes
+                need an explicit `request['session']['cart'] = cart`.
+            coalesce_reads (bool, optional):
+                Share a single datastore read between concurrent requests
+                which open the same session in this worker, e.g. parallel
+                XHRs from one page. Enabled by default.
+            write_behind_delay (float, optional):
+                Delay writes of saved sessions by this many seconds, merging
+                all saves of a session within the delay into one datastore
+                write. Delayed writes are flushed before the server stops
+                when the interface is installed with `install_middleware`
+                outside of server listeners; otherwise call `flush()` in a
+                'before_server_stop' listener. Disabled by default.
+            batch_window (float, optional):
+                Collect writes of concurrent requests for this many seconds
+                (e.g. 0.001) and commit them in one transaction, which saves
+                a commit per session at high write rates at the cost of up
+                to `batch_window` seconds of latency. Disabled by default.
+            batch_max_size (int, optional):
+                Maximum number of writes committed together; a full batch is
+                committed without waiting for the end of `batch_window`.
+            app (sanic.Sanic, optional):
+                Sanic instance; when passed, `close` is called when the
+                server stops. Otherwise call `close()` in an
+                'after_server_stop' listener.
+        """
+        self.path = path
+        self.expiry = expiry
+        self.prefix = prefix
+        self.cookie_name = cookie_name
+        self.domain = domain
+        self.httponly = httponly
+        self.sessioncookie = sessioncookie
+        self.mmap_size = mmap_size
+        self.purge_interval = purge_interval
+        self.busy_timeout = busy_timeout
+        self.only_save_modified = only_save_modified
+        self.touch_interval = touch_interval
+        self.lazy = lazy
+        self.serializer = serializer or JSONSerializer()
+        self.track_nested = track_nested
+        self.coalesce_reads = coalesce_reads
+        self.write_behind_delay = write_behind_delay
+        self.batch_window = batch_window
+        self._set_batcher = None
+        if batch_window is not None:
+            self._set_batcher = Batcher(
+                self._set_many, batch_window, batch_max_size)
+
+        # created on first use, so that each worker process has its own
+        self._executor = None
+        self._connection = None
+        self._purger = None
+
+        if app is not None:
+            self._register_close_listener(app)
+
+    def _register_close_listener(self, app):
+        @app.listener('after_server_stop')
+        async def close_session_database(app, loop):
+            """Stop the purge and close the database connection.
+            """
+            await self.close()
+
+    def _connect(self):
+        """Opens the database connection, in the database thread.
+        """
+        connection = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, isolation_level=None,
+            check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        # with WAL, commits are durable across application crashes without
+        # waiting for fsync
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('PRAGMA mmap_size={:d}'.format(self.mmap_size))
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+            'expires REAL NOT NULL)')
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS sessions_expires '
+            'ON sessions (expires)')
+        return connection
+
+    def _call(self, method, *args):
+        if self._connection is None:
+            self._connection = self._connect()
+        return method(self._connection, *args)
+
+    async def _run(self, method, *args):
+        """Runs `method(connection, *args)` in the database thread.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self._executor, self._call, method, *args)
+
+    @staticmethod
+    def _select(connection, key, now):
+        row = connection.execute(
+            'SELECT value FROM sessions WHERE key = ? AND expires > ?',
+            (key, now)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _replace(connection, items):
+        with connection:
+            connection.execute('BEGIN')
+            connection.executemany(
+                'INSERT OR REPLACE INTO sessions (key, value, expires) '
+                'VALUES (?, ?, ?)', items)
+
+    @staticmethod
+    def _delete(connection, key):
+        connection.execute('DELETE FROM sessions WHERE key = ?', (key,))
+
+    @staticmethod
+    def _update_expires(connection, key, expires, now):
+        connection.execute(
+            'UPDATE sessions SET expires = ? WHERE key = ? AND expires > ?',
+            (expires, key, now))
+
+    @staticmethod
+    def _delete_expired(connection, now):
+        return connection.execute(
+            'DELETE FROM sessions WHERE expires <= ?', (now,)).rowcount
+
+    async def _get_value(self, prefix, sid):
+        return await self._run(self._select, self.prefix + sid, time.time())
+
+    async def _delete_key(self, key):
+        await self._run(self._delete, key)
+
+    async def _set_value(self, key, data):
+        if self.purge_interval and self._purger is None:
+            self._purger = asyncio.ensure_future(self._purge_periodically())
+
+        if self._set_batcher is not None:
+            return await self._set_batcher.submit((key, data))
+        await self._run(
+            self._replace, [(key, data, time.time() + self.expiry)])
+
+    async def _set_many(self, items):
+        expires = time.time() + self.expiry
+        await self._run(
+            self._replace, [(key, data, expires) for key, data in items])
+        return [None] * len(items)
+
+    async def _touch_key(self, key):
+        now = time.time()
+        await self._run(self._update_expires, key, now + self.expiry, now)
+
+    async def _purge_periodically(self):
+        while True:
+            await asyncio.sleep(self.purge_interval)
+            await self.purge_expired()
+
+    async def purge_expired(self) -> int:
+        """Deletes expired sessions from the database.
+        Returns:
+            int:
+                Number of deleted sessions.
+        """
+        return await self._run(self._delete_expired, time.time())
+
+    async def close(self) -> None:
+        """Stops the periodic purge and closes the database connection.
+        """
+        if self._purger is not None:
+            self._purger.cancel()
+            self._purger = None
+        if self._executor is not None:
+            if self._connection is not None:
+                await self._run(lambda connection: connection.close())
+                self._connection = None
+            self._executor.shutdown(wait=False)
+            self._executor = None
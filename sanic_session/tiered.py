@@ -0,0 +1,140 @@
+from .base import BaseSessionInterface, INTERFACE_SETTINGS
+from .utils import BoundedExpiringDict
+
+
+class TieredSessionInterface(BaseSessionInterface):
+    def __init__(
+            self,
+            backend: BaseSessionInterface,
+            l1_expiry: float=5,
+            l1_max_sessions: int=10000,
+            own_write_window: float=1.0,
+        ):
+        """Initializes a session interface which keeps recently used
+        sessions in a small in-process cache (L1) in front of another,
+        usually remote, session interface. Reads of hot sessions are served
+        from the cache without a network round trip; writes go to both.
+        Cookie and storage settings are taken from the backend.
+        Sessions changed by other workers are seen after at most `l1_expiry`
+        seconds, or immediately when keyspace notifications are consumed
+        with `listen_keyspace_notifications`.
+        Args:
+            backend (BaseSessionInterface):
+                Session interface which stores the sessions. Interfaces
+                storing structured sessions (Redis hash mode, MongoDB) are
+                not supported.
+            l1_expiry (float, optional):
+                Seconds a session is served from the cache before it is read
+                from the backend again.
+            l1_max_sessions (int, optional):
+                Maximum number of sessions in the cache, least recently used
+                ones are evicted.
+            own_write_window (float, optional):
+                Seconds the keyspace notification echoing a write of this
+                worker is waited for. One notification per such write is
+                ignored, so that it doesn't evict the session just written
+                from the cache; any further one invalidates it.
+        """
+        if not backend.stores_serialized_values:
+            raise ValueError(
+                "TieredSessionInterface needs a backend "
+                "which stores serialized sessions")
+
+        self.backend = backend
+        for name in INTERFACE_SETTINGS:
+            setattr(self, name, getattr(backend, name))
+
+        self.l1_expiry = l1_expiry
+        self.l1 = BoundedExpiringDict(max_items=l1_max_sessions)
+        self.own_write_window = own_write_window
+        self._own_writes = BoundedExpiringDict(max_items=l1_max_sessions)
+        self.l1_hits = 0
+        self.l1_misses = 0
+
+    async def _get_value(self, prefix, sid):
+        key = self.prefix + sid
+        val = self.l1.get(key)
+        if val is not None:
+            self.l1_hits += 1
+            return val
+
+        self.l1_misses += 1
+        val = await self.backend._get_value(prefix, sid)
+        if val is not None:
+            self.l1.set(key, val, self.l1_expiry)
+        return val
+
+    async def _delete_key(self, key):
+        self.invalidate(key)
+        await self.backend._delete_key(key)
+
+    async def _set_value(self, key, data):
+        # cached before writing, so that a change by another worker which
+        # is notified while the write is in flight evicts it
+        self._expect_echo(key)
+        self.l1.set(key, data, self.l1_expiry)
+        try:
+            await self.backend._set_value(key, data)
+        except Exception:
+            # nothing was written, so no notification will echo it
+            self._take_echo(key)
+            self.invalidate(key)
+            raise
+
+    async def _touch_key(self, key):
+        await self.backend._touch_key(key)
+
+    def _expect_echo(self, key: str):
+        if self.own_write_window:
+            count = self._own_writes.get(key) or 0
+            self._own_writes.set(key, count + 1, self.own_write_window)
+
+    def _take_echo(self, key: str) -> bool:
+        """Whether a write of `key` by this worker is still waiting for its
+        notification, which is then taken as received.
+        """
+        count = self._own_writes.get(key)
+        if not count:
+            return False
+        if count == 1:
+            self._own_writes.delete(key)
+        else:
+            self._own_writes.set(key, count - 1, self.own_write_window)
+        return True
+
+    def invalidate(self, key: str):
+        """Drops the session stored under `key` (`prefix + sid`) from the
+        cache, so that it is read from the backend next time.
+        """
+        if key in self.l1:
+            self.l1.delete(key)
+
+    async def listen_keyspace_notifications(self, redis, db: int=0):
+        """Invalidates cached sessions when they are changed in Redis by
+        other workers or hosts. Runs until the subscription is closed, so
+        start it as a task, e.g. `app.add_task(...)`.
+        Requires keyspace notifications to be enabled on the server, e.g.
+        `CONFIG SET notify-keyspace-events Kg$x`. Each write of this worker
+        is matched with one 'set' notification, which is ignored; expiration
+        refreshes don't change sessions and are ignored too.
+        Args:
+            redis:
+                aioredis connection dedicated to the subscription.
+            db (int, optional):
+                Number of the database sessions are stored in.
+        """
+        channel_prefix = '__keyspace@{}__:'.format(db)
+        channel, = await redis.psubscribe(channel_prefix + self.prefix + '*')
+
+        while await channel.wait_message():
+            name, event = await channel.get()
+            if isinstance(name, bytes):
+                name = name.decode()
+            if isinstance(event, bytes):
+                event = event.decode()
+            key = name[len(channel_prefix):]
+            if event == 'expire':
+                continue
+            if event == 'set' and self._take_echo(key):
+                continue
+            self.invalidate(key)
@@ -1,4 +1,7 @@
+import heapq
+import sys
 import time
+from collections import OrderedDict
 from typing import Union, Any
 
 
@@ -78,29 +81,77 @@ class CallbackDict(UpdateDictMixin, dict):
         )
 
 
+# entries of a heap being compacted which each `set` moves to the new heap
+_COMPACTION_STEP = 4
+
+
 class ExpiringDict(dict):
     def __init__(self, prefix=''):
         self.prefix = prefix
         super().__init__()
         self.expiry_times = {}
+        # min-heap of (expiry time, key); entries left behind by re-sets and
+        # deletes are skipped lazily and dropped by compaction
+        self._expiry_heap = []
+        # the previous heap while compaction moves its live entries to
+        # `_expiry_heap` a few at a time; dropping its last entry keeps it
+        # a heap, so expired entries are still popped from it meanwhile
+        self._compacted_heap = None
 
     def set(self, key: Union[str, int], val: Any, expiry: int):
+        expires = time.time() + expiry
         self[key] = val
-        self.expiry_times[key] = time.time() + expiry
+        self.expiry_times[key] = expires
+        heapq.heappush(self._expiry_heap, (expires, key))
+
+        if self._compacted_heap is not None:
+            self._compact_expiry_heap(_COMPACTION_STEP)
+        elif len(self._expiry_heap) > 2 * len(self.expiry_times) + 64:
+            # compact incrementally, so that no single call is O(n)
+            self._compacted_heap, self._expiry_heap = self._expiry_heap, []
+
+    def touch(self, key: Union[str, int], expiry: int):
+        """Resets expiration time of an existing, not yet expired key.
+        """
+        data = self.get(key)
+        if data is not None:
+            self.set(key, data, expiry)
+
+    def _compact_expiry_heap(self, limit: int):
+        """Moves up to `limit` entries of the heap being compacted to the
+        current one, dropping stale entries.
+        """
+        old = self._compacted_heap
+        for _ in range(min(limit, len(old))):
+            expires, key = old.pop()
+            if self.expiry_times.get(key) == expires:
+                heapq.heappush(self._expiry_heap, (expires, key))
+        if not old:
+            self._compacted_heap = None
+
+    def _first_expired_heap(self, now: float):
+        """The heap whose earliest entry expired before `now`, or None.
+        """
+        first = None
+        for heap in (self._expiry_heap, self._compacted_heap):
+            if heap and now > heap[0][0] and \
+                    (first is None or heap[0][0] < first[0][0]):
+                first = heap
+        return first
 
     def get_by_sid(self, key: str):
         key = self.prefix + key
         return self.get(key)
 
     def get(self, key: Union[str, int]):
-        data = dict(self).get(key)
+        # plain dict lookup: `dict(self)` would copy the whole store
+        data = super().get(key)
 
         if not data:
             return None
 
         if time.time() > self.expiry_times[key]:
-            del self[key]
-            del self.expiry_times[key]
+            self.delete(key)
             return None
 
         return data
@@ -108,3 +159,204 @@ class ExpiringDict(dict):
     def delete(self, key: Union[str, int]):
         del self[key]
         del self.expiry_times[key]
+
+    def has_expired(self) -> bool:
+        """Whether `sweep` has expired entries left to remove.
+        """
+        return self._first_expired_heap(time.time()) is not None
+
+    def sweep(self, limit: int=None) -> int:
+        """Removes expired entries in expiry order.
+        Args:
+            limit (int, optional):
+                Maximum number of index entries to examine, so that a single
+                call does a bounded amount of work.
+        Returns:
+            int:
+                Number of evicted entries.
+        """
+        now = time.time()
+        examined = evicted = 0
+
+        while limit is None or examined < limit:
+            heap = self._first_expired_heap(now)
+            if heap is None:
+                break
+
+            expires, key = heapq.heappop(heap)
+            examined += 1
+
+            # skip entries which were re-set or deleted after being indexed
+            if self.expiry_times.get(key) == expires:
+                self.delete(key)
+                evicted += 1
+
+        return evicted
+
+
+class _LRUPolicy(object):
+    """Tracks key recency, the least recently used key is evicted first.
+    """
+    def __init__(self):
+        self._order = OrderedDict()
+
+    def add(self, key):
+        self._order[key] = None
+
+    def touch(self, key):
+        self._order.move_to_end(key)
+
+    def remove(self, key):
+        del self._order[key]
+
+    def victim(self, exclude=None):
+        for key in self._order:
+            if key != exclude:
+                return key
+        return None
+
+
+class _LFUPolicy(object):
+    """Tracks key use counts, the least frequently used key is evicted first;
+    ties are broken by recency.
+    """
+    def __init__(self):
+        self._counts = {}
+        # use count -> keys with that count, for counts which have keys
+        self._buckets = {}
+        # the counts of the buckets form a sorted doubly linked list, so
+        # that the lowest one is known after any removal
+        self._next = {}
+        self._prev = {}
+        self._head = None
+
+    def _insert_bucket(self, after, count):
+        following = self._head if after is None else self._next[after]
+        self._prev[count] = after
+        self._next[count] = following
+        if following is not None:
+            self._prev[following] = count
+        if after is None:
+            self._head = count
+        else:
+            self._next[after] = count
+        self._buckets[count] = OrderedDict()
+
+    def _discard(self, key, count):
+        bucket = self._buckets[count]
+        del bucket[key]
+        if bucket:
+            return
+
+        previous, following = self._prev.pop(count), self._next.pop(count)
+        if previous is None:
+            self._head = following
+        else:
+            self._next[previous] = following
+        if following is not None:
+            self._prev[following] = previous
+        del self._buckets[count]
+
+    def add(self, key):
+        if 1 not in self._buckets:
+            self._insert_bucket(None, 1)
+        self._buckets[1][key] = None
+        self._counts[key] = 1
+
+    def touch(self, key):
+        count = self._counts[key]
+        if count + 1 not in self._buckets:
+            self._insert_bucket(count, count + 1)
+        self._buckets[count + 1][key] = None
+        self._counts[key] = count + 1
+        self._discard(key, count)
+
+    def remove(self, key):
+        self._discard(key, self._counts.pop(key))
+
+    def victim(self, exclude=None):
+        count = self._head
+        while count is not None:
+            for key in self._buckets[count]:
+                if key != exclude:
+                    return key
+            count = self._next[count]
+        return None
+
+
+EVICTION_POLICIES = {
+    'lru': _LRUPolicy,
+    'lfu': _LFUPolicy,
+}
+
+
+class BoundedExpiringDict(ExpiringDict):
+    """ExpiringDict with a cap on the number of entries and/or on the total
+    size of the stored values. When a new entry does not fit, entries are
+    evicted according to `eviction_policy` ('lru' or 'lfu'), each in
+    constant time. A value larger than `max_bytes` raises ValueError.
+    """
+    def __init__(
+            self, prefix='', max_items: int=None, max_bytes: int=None,
+            eviction_policy: str='lru'):
+        if eviction_policy not in EVICTION_POLICIES:
+            raise ValueError(
+                "eviction_policy must be one of: {}".format(
+                    ', '.join(sorted(EVICTION_POLICIES))))
+
+        super().__init__(prefix)
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.evictions = 0
+        self._sizes = {}
+        self._policy = EVICTION_POLICIES[eviction_policy]()
+
+    def set(self, key: Union[str, int], val: Any, expiry: int):
+        size = _sizeof(val)
+        if self.max_bytes is not None and size > self.max_bytes:
+            # evicting every other entry still wouldn't make it fit
+            raise ValueError(
+                'Value of {} bytes exceeds max_bytes'.format(size))
+
+        if key in self._sizes:
+            # the value may grow: evict other keys, never the one being set
+            self.size_bytes -= self._sizes[key]
+            self._policy.touch(key)
+            self._make_room(size, keep=key)
+        else:
+            self._make_room(size)
+            self._policy.add(key)
+
+        self._sizes[key] = size
+        self.size_bytes += size
+        super().set(key, val, expiry)
+
+    def _make_room(self, size, keep=None):
+        # an update doesn't add an entry, so only the size limit applies
+        while (keep is None and self.max_items is not None and
+                len(self._sizes) >= self.max_items) or \
+                (self.max_bytes is not None and
+                    self.size_bytes + size > self.max_bytes):
+            victim = self._policy.victim(keep)
+            if victim is None:
+                break
+            self.delete(victim)
+            self.evictions += 1
+
+    def get(self, key: Union[str, int]):
+        data = super().get(key)
+        if data is not None:
+            self._policy.touch(key)
+        return data
+
+    def delete(self, key: Union[str, int]):
+        super().delete(key)
+        self._policy.remove(key)
+        self.size_bytes -= self._sizes.pop(key)
+
+
+def _sizeof(val):
+    if isinstance(val, (str, bytes, bytearray)):
+        return len(val)
+    return sys.getsizeof(val)
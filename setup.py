@@ -15,6 +15,9 @@ extras_require = {
     'asyncio_redis': ['asyncio_redis'],
     'mongo': ['sanic_motor', 'pymongo'],
     'aiomcache': ['aiomcache>=0.5.2'],
+    'orjson': ['orjson'],
+    'msgpack': ['msgpack>=0.6.0'],
+    'cryptography': ['cryptography>=2.0'],
 }
 
 setup(
@@ -7,6 +7,7 @@ from unittest.mock import Mock
 
 from sanic.response import text
 from sanic_session.aioredis import AIORedisSessionInterface
+from sanic_session.base import SessionDict
 
 SID = '5235262626'
 COOKIE_NAME = 'cookie'
@@ -52,9 +53,13 @@ async def test_redis_should_create_new_sid_if_no_cookie(
     )
     await session_interface.open(request)
 
-    assert uuid.uuid4.call_count == 1, 'should create a new SID with uuid'
+    assert uuid.uuid4.call_count == 0, 'should not create a SID before write'
     assert request['session'] == {}, 'should return an empty dict as session'
 
+    request['session']['foo'] = 'bar'
+    assert uuid.uuid4.call_count == 1, 'should create a new SID with uuid'
+    assert request['session'].sid is not None
+
 
 @pytest.mark.asyncio
 async def test_should_return_data_from_redis(mocker, mock_dict, mock_redis):
@@ -306,3 +311,675 @@ async def test_sessioncookie_delete_has_expiration_headers(mocker, mock_dict):
 
     assert response.cookies[COOKIE_NAME]['max-age'] == 0
     assert response.cookies[COOKIE_NAME]['expires'] == 0
+
+
+@pytest.mark.asyncio
+async def test_should_not_rewrite_unmodified_session(mock_dict, mock_redis):
+    request = mock_dict()
+    request.cookies = COOKIES
+    redis_connection = mock_redis()
+    redis_connection.get = mock_coroutine(ujson.dumps({'foo': 'bar'}))
+    redis_connection.setex = mock_coroutine()
+    redis_connection.expire = mock_coroutine()
+    response = text('foo')
+
+    session_interface = AIORedisSessionInterface(
+        redis_connection,
+        cookie_name=COOKIE_NAME,
+        pass_dependency_check=True,
+        only_save_modified=True,
+    )
+
+    await session_interface.open(request)
+    await session_interface.save(request, response)
+
+    assert redis_connection.setex.call_count == 0
+    redis_connection.expire.assert_called_with(
+        'session:{}'.format(SID), 2592000)
+    assert response.cookies[COOKIE_NAME].value == SID
+
+
+@pytest.mark.asyncio
+async def test_should_refresh_expiry_once_per_touch_interval(
+        mock_dict, mock_redis):
+    redis_connection = mock_redis()
+    redis_connection.get = mock_coroutine(ujson.dumps({'foo': 'bar'}))
+    redis_connection.setex = mock_coroutine()
+    redis_connection.expire = mock_coroutine()
+
+    session_interface = AIORedisSessionInterface(
+        redis_connection,
+        cookie_name=COOKIE_NAME,
+        pass_dependency_check=True,
+        only_save_modified=True,
+        touch_interval=300,
+    )
+
+    for _ in range(3):
+        request = mock_dict()
+        request.cookies = COOKIES
+        response = text('foo')
+        await session_interface.open(request)
+        await session_interface.save(request, response)
+
+    assert redis_connection.setex.call_count == 0
+    assert redis_connection.expire.call_count == 1
+
+    request['session']['foo'] = 'baz'
+    await session_interface.save(request, response)
+
+    assert redis_connection.setex.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_lazy_session_is_read_on_load_only(mock_dict, mock_redis):
+    request = mock_dict()
+    request.cookies = COOKIES
+    redis_connection = mock_redis()
+    redis_connection.get = mock_coroutine(ujson.dumps({'foo': 'bar'}))
+    redis_connection.setex = mock_coroutine()
+    redis_connection.delete = mock_coroutine()
+    response = text('foo')
+
+    session_interface = AIORedisSessionInterface(
+        redis_connection,
+        cookie_name=COOKIE_NAME,
+        pass_dependency_check=True,
+        lazy=True,
+    )
+
+    await session_interface.open(request)
+    assert redis_connection.get.call_count == 0
+    with pytest.raises(RuntimeError):
+        request['session']['foo']
+
+    session = await request['session'].load()
+    assert await request['session'].load() is session
+    assert redis_connection.get.call_count == 1
+    assert request['session'] is session
+    assert session['foo'] == 'bar'
+
+    session['foo'] = 'baz'
+    await session_interface.save(request, response)
+    assert redis_connection.setex.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_lazy_session_not_loaded_is_not_saved(mock_dict, mock_redis):
+    request = mock_dict()
+    request.cookies = COOKIES
+    redis_connection = mock_redis()
+    redis_connection.get = mock_coroutine()
+    redis_connection.setex = mock_coroutine()
+    redis_connection.delete = mock_coroutine()
+    response = text('foo')
+
+    session_interface = AIORedisSessionInterface(
+        redis_connection,
+        cookie_name=COOKIE_NAME,
+        pass_dependency_check=True,
+        lazy=True,
+    )
+
+    await session_interface.open(request)
+    await session_interface.save(request, response)
+
+    assert redis_connection.get.call_count == 0
+    assert redis_connection.setex.call_count == 0
+    assert redis_connection.delete.call_count == 0
+    assert COOKIE_NAME not in response.cookies
+
+
+class MockPipeline:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def command(*args):
+            self.calls.append((name,) + args)
+        return command
+
+    async def execute(self):
+        return [None] * len(self.calls)
+
+
+@pytest.mark.asyncio
+async def test_hash_mode_reads_session_fields(mock_dict, mock_redis):
+    request = mock_dict()
+    request.cookies = COOKIES
+    redis_connection = mock_redis()
+    redis_connection.hgetall = mock_coroutine(
+        {b'foo': b'"bar"', b'count': b'2'})
+
+    session_interface = AIORedisSessionInterface(
+        redis_connection,
+        cookie_name=COOKIE_NAME,
+        pass_dependency_check=True,
+        use_hash=True,
+    )
+    session = await session_interface.open(request)
+
+    redis_connection.hgetall.assert_called_with('session:{}'.format(SID))
+    assert session == {'foo': 'bar', 'count': 2}
+
+
+@pytest.mark.asyncio
+async def test_hash_mode_writes_only_changed_fields(mock_dict, mock_redis):
+    request = mock_dict()
+    request.cookies = COOKIES
+    redis_connection = mock_redis()
+    redis_connection.hgetall = mock_coroutine(
+        {b'foo': b'"bar"', b'count': b'2', b'old': b'1'})
+    pipeline = MockPipeline()
+    redis_connection.pipeline = Mock(return_value=pipeline)
+    response = text('foo')
+
+    session_interface = AIORedisSessionInterface(
+        redis_connection,
+        cookie_name=COOKIE_NAME,
+        pass_dependency_check=True,
+        use_hash=True,
+    )
+    await session_interface.open(request)
+    request['session']['count'] += 1
+    del request['session']['old']
+    await session_interface.save(request, response)
+
+    key = 'session:{}'.format(SID)
+    assert pipeline.calls == [
+        ('hmset_dict', key, {'count': '3'}),
+        ('hdel', key, 'old'),
+        ('expire', key, 2592000),
+    ]
+    assert response.cookies[COOKIE_NAME].value == SID
+
+
+@pytest.mark.asyncio
+async def test_concurrent_opens_share_one_read(mock_dict, mock_redis):
+    import asyncio
+
+    async def slow_get(key):
+        await asyncio.sleep(0.01)
+        return ujson.dumps({'foo': 'bar'})
+
+    redis_connection = mock_redis()
+    redis_connection.get = Mock(wraps=slow_get)
+
+    session_interface = AIORedisSessionInterface(
+        redis_connection,
+        cookie_name=COOKIE_NAME,
+        pass_dependency_check=True,
+    )
+
+    requests = [mock_dict() for _ in range(5)]
+    for request in requests:
+        request.cookies = COOKIES
+    sessions = await asyncio.gather(
+        *[session_interface.open(request) for request in requests])
+
+    assert redis_connection.get.call_count == 1
+    assert all(session == {'foo': 'bar'} for session in sessions)
+    assert len({id(session) for session in sessions}) == 5, \
+        'every request should get its own session'
+
+    await session_interface.open(requests[0])
+    assert redis_connection.get.call_count == 2, \
+        'later opens should read again'
+
+
+@pytest.mark.asyncio
+async def test_concurrent_opens_not_shared_when_disabled(
+        mock_dict, mock_redis):
+    import asyncio
+
+    redis_connection = mock_redis()
+    redis_connection.get = mock_coroutine(ujson.dumps({'foo': 'bar'}))
+
+    session_interface = AIORedisSessionInterface(
+        redis_connection,
+        cookie_name=COOKIE_NAME,
+        pass_dependency_check=True,
+        coalesce_reads=False,
+    )
+
+    requests = [mock_dict() for _ in range(3)]
+    for request in requests:
+        request.cookies = COOKIES
+    await asyncio.gather(
+        *[session_interface.open(request) for request in requests])
+
+    assert redis_connection.get.call_count == 3
+
+
+@pytest.fixture
+def mock_app():
+    app = Mock()
+    app.listeners = {}
+
+    def listener(event):
+        def register(func):
+            app.listeners[event] = func
+            return func
+        return register
+
+    app.listener = listener
+    return app
+
+
+@pytest.mark.asyncio
+async def test_should_own_connection_pool(mocker, mock_app, mock_redis):
+    import sys
+
+    pool = Mock(size=3, freesize=1, minsize=2, maxsize=4)
+    redis_connection = mock_redis()
+    redis_connection.connection = pool
+    redis_connection.close = Mock()
+    redis_connection.wait_closed = mock_coroutine()
+    fake_aioredis = Mock()
+    fake_aioredis.create_redis_pool = mock_coroutine(redis_connection)
+    mocker.patch.dict(sys.modules, {'aioredis': fake_aioredis})
+
+    session_interface = AIORedisSessionInterface(
+        app=mock_app,
+        redis_address='redis://localhost',
+        pool_minsize=2,
+        pool_maxsize=4,
+        pass_dependency_check=True,
+    )
+    await mock_app.listeners['before_server_start'](mock_app, None)
+
+    fake_aioredis.create_redis_pool.assert_called_with(
+        'redis://localhost', minsize=2, maxsize=4, loop=None)
+    assert session_interface.redis is redis_connection
+    stats = session_interface.pool_stats()
+    assert stats['in_use'] == 2
+    assert stats['utilization'] == 0.5
+
+    await mock_app.listeners['after_server_stop'](mock_app, None)
+    assert redis_connection.close.call_count == 1
+
+
+def test_should_require_connection_or_address():
+    with pytest.raises(ValueError):
+        AIORedisSessionInterface(pass_dependency_check=True)
+
+
+@pytest.mark.asyncio
+async def test_should_abandon_slow_commands(mock_dict, mock_redis):
+    import asyncio
+
+    async def slow_get(key):
+        await asyncio.sleep(1)
+
+    redis_connection = mock_redis()
+    redis_connection.get = slow_get
+
+    session_interface = AIORedisSessionInterface(
+        redis_connection,
+        cookie_name=COOKIE_NAME,
+        pass_dependency_check=True,
+        command_timeout=0.01,
+    )
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    with pytest.raises(asyncio.TimeoutError):
+        await session_interface.open(request)
+    assert session_interface.command_timeouts == 1
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replicas_round_robin(mock_dict, mock_redis):
+    primary = mock_redis()
+    primary.get = mock_coroutine(ujson.dumps({'foo': 'bar'}))
+    replicas = [mock_redis(), mock_redis()]
+    for replica in replicas:
+        replica.get = mock_coroutine(ujson.dumps({'foo': 'bar'}))
+
+    session_interface = AIORedisSessionInterface(
+        primary,
+        cookie_name=COOKIE_NAME,
+        pass_dependency_check=True,
+        replicas=replicas,
+    )
+
+    for _ in range(4):
+        request = mock_dict()
+        request.cookies = COOKIES
+        session = await session_interface.open(request)
+        assert session['foo'] == 'bar'
+
+    assert primary.get.call_count == 0
+    assert [replica.get.call_count for replica in replicas] == [2, 2]
+    assert session_interface.replica_router.replica_reads == 4
+
+
+@pytest.mark.asyncio
+async def test_recently_written_session_is_read_from_primary(
+        mock_dict, mock_redis):
+    primary = mock_redis()
+    primary.get = mock_coroutine(ujson.dumps({'foo': 'baz'}))
+    primary.setex = mock_coroutine()
+    replica = mock_redis()
+    replica.get = mock_coroutine(ujson.dumps({'foo': 'bar'}))
+
+    session_interface = AIORedisSessionInterface(
+        primary,
+        cookie_name=COOKIE_NAME,
+        pass_dependency_check=True,
+        replicas=[replica],
+        read_your_writes_window=60,
+    )
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    await session_interface.open(request)
+    request['session']['foo'] = 'baz'
+    await session_interface.save(request, text('foo'))
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    session = await session_interface.open(request)
+
+    assert session['foo'] == 'baz', 'should read own write from the primary'
+    assert replica.get.call_count == 1
+    assert primary.get.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_session_written_by_other_worker_is_read_from_primary(
+        mock_dict, mock_redis):
+    primary = mock_redis()
+    primary.get = mock_coroutine(ujson.dumps({'foo': 'baz'}))
+    primary.setex = mock_coroutine()
+    replica = mock_redis()
+    replica.get = mock_coroutine(ujson.dumps({'foo': 'bar'}))
+
+    def make_worker():
+        return AIORedisSessionInterface(
+            primary,
+            cookie_name=COOKIE_NAME,
+            pass_dependency_check=True,
+            replicas=[replica],
+            read_your_writes_window=60,
+        )
+
+    writer, reader = make_worker(), make_worker()
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    await writer.open(request)
+    request['session']['foo'] = 'baz'
+    response = text('foo')
+    await writer.save(request, response)
+    written = response.cookies[COOKIE_NAME + '-written']
+    assert written['max-age'] == 60
+
+    replica_reads = replica.get.call_count
+    request = mock_dict()
+    request.cookies = dict(
+        COOKIES, **{COOKIE_NAME + '-written': written.value})
+    session = await reader.open(request)
+
+    assert session['foo'] == 'baz', 'should read the write from the primary'
+    assert replica.get.call_count == replica_reads
+
+    request = mock_dict()
+    request.cookies = dict(
+        COOKIES, **{COOKIE_NAME + '-written': str(time.time() - 61)})
+    session = await make_worker().open(request)
+    assert session['foo'] == 'bar', 'should read old writes from replicas'
+
+
+@pytest.mark.asyncio
+async def test_failing_replica_falls_back_to_primary(mock_dict, mock_redis):
+    async def failing_get(key):
+        raise ConnectionError()
+
+    primary = mock_redis()
+    primary.get = mock_coroutine(ujson.dumps({'foo': 'bar'}))
+    slow, failing = mock_redis(), mock_redis()
+    slow.get = mock_coroutine(ujson.dumps({'foo': 'bar'}))
+    failing.get = failing_get
+
+    session_interface = AIORedisSessionInterface(
+        primary,
+        cookie_name=COOKIE_NAME,
+        pass_dependency_check=True,
+        replicas=[failing, slow],
+        replica_strategy='least_latency',
+    )
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    session = await session_interface.open(request)
+
+    assert session['foo'] == 'bar'
+    assert primary.get.call_count == 1
+    assert session_interface.replica_router.replica_errors == 1
+    assert session_interface.replica_router.choose() == 1, \
+        'should avoid the failing replica'
+
+
+class MockInvalidationChannel:
+    """Pub/sub channel of a fake server, emitting invalidation messages.
+    """
+    def __init__(self):
+        import asyncio
+        self.messages = asyncio.Queue()
+
+    async def wait_message(self):
+        self.message = await self.messages.get()
+        return self.message != 'closed'
+
+    async def get(self):
+        return self.message
+
+
+async def make_tracking_interface(mock_redis, value):
+    import asyncio
+
+    redis_connection = mock_redis()
+    redis_connection.get = mock_coroutine(value)
+    redis_connection.setex = mock_coroutine()
+
+    channel = MockInvalidationChannel()
+    tracking_redis = mock_redis()
+    tracking_redis.execute = mock_coroutine(42)
+    tracking_redis.subscribe = mock_coroutine([channel])
+
+    session_interface = AIORedisSessionInterface(
+        redis_connection,
+        cookie_name=COOKIE_NAME,
+        pass_dependency_check=True,
+        tracking_redis=tracking_redis,
+    )
+    # the first read starts tracking
+    await session_interface._get_value('', SID)
+    await asyncio.sleep(0)
+    return session_interface, redis_connection, tracking_redis, channel
+
+
+@pytest.mark.asyncio
+async def test_client_tracking_serves_reads_from_cache(mock_dict, mock_redis):
+    session_interface, redis_connection, tracking_redis, _ = \
+        await make_tracking_interface(mock_redis, ujson.dumps({'foo': 'bar'}))
+
+    tracking_redis.execute.assert_called_with(
+        b'CLIENT', b'TRACKING', b'ON', b'REDIRECT', 42,
+        b'BCAST', b'PREFIX', 'session:')
+    tracking_redis.subscribe.assert_called_with('__redis__:invalidate')
+
+    for _ in range(3):
+        request = mock_dict()
+        request.cookies = COOKIES
+        session = await session_interface.open(request)
+        assert session['foo'] == 'bar'
+
+    assert redis_connection.get.call_count == 2
+    assert session_interface.client_cache_hits == 2
+
+
+@pytest.mark.asyncio
+async def test_client_tracking_drops_invalidated_sessions(
+        mock_dict, mock_redis):
+    import asyncio
+
+    session_interface, redis_connection, _, channel = \
+        await make_tracking_interface(mock_redis, ujson.dumps({'foo': 'bar'}))
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    await session_interface.open(request)
+    assert 'session:' + SID in session_interface.client_cache
+
+    redis_connection.get = mock_coroutine(ujson.dumps({'foo': 'baz'}))
+    channel.messages.put_nowait([('session:' + SID).encode()])
+    await asyncio.sleep(0)
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    session = await session_interface.open(request)
+    assert session['foo'] == 'baz'
+
+    # a flush invalidates everything, a lost connection disables the cache
+    channel.messages.put_nowait(None)
+    await asyncio.sleep(0)
+    assert len(session_interface.client_cache) == 0
+
+    channel.messages.put_nowait('closed')
+    await asyncio.sleep(0)
+    await session_interface._get_value('', SID)
+    assert len(session_interface.client_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_open_after_write_sees_the_write(mock_dict, mock_redis):
+    import asyncio
+
+    stored = {'value': ujson.dumps({'n': 0})}
+    release = asyncio.Event()
+
+    async def get(key):
+        value = stored['value']
+        await release.wait()
+        return value
+
+    async def setex(key, expiry, value):
+        stored['value'] = value
+
+    redis_connection = mock_redis()
+    redis_connection.get = Mock(wraps=get)
+    redis_connection.setex = setex
+
+    session_interface = AIORedisSessionInterface(
+        redis_connection,
+        cookie_name=COOKIE_NAME,
+        pass_dependency_check=True,
+    )
+
+    # a read which started before the write is still in flight
+    request = mock_dict()
+    request.cookies = COOKIES
+    old_open = asyncio.ensure_future(session_interface.open(request))
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+    await session_interface._store_session(
+        'session:' + SID, SessionDict({'n': 1}, sid=SID))
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    new_open = asyncio.ensure_future(session_interface.open(request))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert (await old_open) == {'n': 0}
+    assert (await new_open) == {'n': 1}
+    assert redis_connection.get.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_recovered_replica_gets_reads_again(
+        mocker, mock_dict, mock_redis):
+    failing = True
+
+    async def flaky_get(key):
+        if failing:
+            raise ConnectionError()
+        return ujson.dumps({'foo': 'bar'})
+
+    primary = mock_redis()
+    primary.get = mock_coroutine(ujson.dumps({'foo': 'bar'}))
+    flaky, other = mock_redis(), mock_redis()
+    flaky.get = Mock(wraps=flaky_get)
+    other.get = mock_coroutine(ujson.dumps({'foo': 'bar'}))
+
+    session_interface = AIORedisSessionInterface(
+        primary,
+        cookie_name=COOKIE_NAME,
+        pass_dependency_check=True,
+        replicas=[flaky, other],
+        replica_strategy='least_latency',
+    )
+
+    async def read_sessions(count):
+        for _ in range(count):
+            request = mock_dict()
+            request.cookies = COOKIES
+            await session_interface.open(request)
+
+    await read_sessions(20)
+    assert flaky.get.call_count == 1, 'should back off after the failure'
+
+    failing = False
+    now = time.monotonic()
+    mocker.patch('time.monotonic', return_value=now + 2)
+    await read_sessions(200)
+    assert flaky.get.call_count > 20, 'should read from it again'
+
+
+@pytest.mark.asyncio
+async def test_should_close_idle_connections_above_minsize(mock_redis):
+    import asyncio
+    import collections
+
+    class MockPool:
+        minsize = 2
+
+        def __init__(self):
+            self._cond = asyncio.Condition()
+            self._pool = collections.deque(
+                Mock(wait_closed=mock_coroutine()) for _ in range(4))
+
+        @property
+        def freesize(self):
+            return len(self._pool)
+
+    pool = MockPool()
+    connections = list(pool._pool)
+    redis_connection = mock_redis()
+    redis_connection.connection = pool
+    session_interface = AIORedisSessionInterface(
+        redis_connection, pass_dependency_check=True)
+
+    reaper = asyncio.ensure_future(
+        session_interface._reap_idle_connections(0))
+    for _ in range(5):
+        await asyncio.sleep(0)
+    reaper.cancel()
+
+    assert pool.freesize == 2
+    assert [c.close.call_count for c in connections] == [1, 1, 0, 0]
+
+
+@pytest.mark.asyncio
+async def test_should_stop_without_connection_pool(mock_app):
+    session_interface = AIORedisSessionInterface(
+        app=mock_app,
+        redis_address='redis://localhost',
+        pass_dependency_check=True,
+    )
+
+    await mock_app.listeners['after_server_stop'](mock_app, None)
+    assert session_interface.redis is None
@@ -51,9 +51,13 @@ async def test_redis_should_create_new_sid_if_no_cookie(
     )
     await session_interface.open(request)
 
-    assert uuid.uuid4.call_count == 1, 'should create a new SID with uuid'
+    assert uuid.uuid4.call_count == 0, 'should not create a SID before write'
     assert request['session'] == {}, 'should return an empty dict as session'
 
+    request['session']['foo'] = 'bar'
+    assert uuid.uuid4.call_count == 1, 'should create a new SID with uuid'
+    assert request['session'].sid is not None
+
 
 @pytest.mark.asyncio
 async def test_should_return_data_from_redis(mocker, mock_dict, mock_redis):
@@ -295,3 +299,66 @@ async def test_sessioncookie_delete_has_expiration_headers(mocker, mock_dict):
 
     assert response.cookies[COOKIE_NAME]['max-age'] == 0
     assert response.cookies[COOKIE_NAME]['expires'] == 0
+
+
+@pytest.mark.asyncio
+async def test_should_own_connection_pool(mocker, mock_redis):
+    import sys
+
+    app = Mock()
+    app.listeners = {}
+
+    def listener(event):
+        def register(func):
+            app.listeners[event] = func
+            return func
+        return register
+
+    app.listener = listener
+
+    pool = mock_redis()
+    pool.poolsize = 4
+    pool.connections_connected = 4
+    pool.connections_in_use = 1
+    pool.close = Mock()
+    fake_asyncio_redis = Mock()
+    fake_asyncio_redis.Pool.create = mock_coroutine(pool)
+    mocker.patch.dict(sys.modules, {'asyncio_redis': fake_asyncio_redis})
+
+    session_interface = AsyncioRedisSessionInterface(
+        app=app,
+        redis_address=('localhost', 6379),
+        pool_size=4,
+        pass_dependency_check=True,
+    )
+    await app.listeners['before_server_start'](app, None)
+
+    fake_asyncio_redis.Pool.create.assert_called_with(
+        host='localhost', port=6379, poolsize=4, loop=None)
+    assert session_interface.redis_connection is pool
+    assert session_interface.pool_stats()['utilization'] == 0.25
+
+    await app.listeners['after_server_stop'](app, None)
+    assert pool.close.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_should_stop_without_connection_pool():
+    app = Mock()
+    app.listeners = {}
+
+    def listener(event):
+        def register(func):
+            app.listeners[event] = func
+            return func
+        return register
+
+    app.listener = listener
+    session_interface = AsyncioRedisSessionInterface(
+        app=app,
+        redis_address=('localhost', 6379),
+        pass_dependency_check=True,
+    )
+
+    await app.listeners['after_server_stop'](app, None)
+    assert session_interface.redis_connection is None
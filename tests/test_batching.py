@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+import ujson
+from unittest.mock import Mock
+
+from sanic.response import text
+from sanic_session.aioredis import AIORedisSessionInterface
+from sanic_session.batching import Batcher
+
+
+@pytest.fixture
+def mock_dict():
+    class MockDict(dict):
+        pass
+
+    return MockDict
+
+
+@pytest.mark.asyncio
+async def test_batcher_dispatches_concurrent_operations_together():
+    batches = []
+
+    async def dispatch(operations):
+        batches.append(operations)
+        return [operation * 2 for operation in operations]
+
+    batcher = Batcher(dispatch, window=0.01)
+    results = await asyncio.gather(*[batcher.submit(i) for i in range(5)])
+
+    assert results == [0, 2, 4, 6, 8]
+    assert batches == [[0, 1, 2, 3, 4]]
+    assert batcher.batches == 1
+    assert batcher.operations == 5
+
+
+@pytest.mark.asyncio
+async def test_batcher_dispatches_full_batch_at_once():
+    batches = []
+
+    async def dispatch(operations):
+        batches.append(operations)
+        return operations
+
+    batcher = Batcher(dispatch, window=60, max_size=2)
+    results = await asyncio.gather(*[batcher.submit(i) for i in range(4)])
+
+    assert results == [0, 1, 2, 3]
+    assert batches == [[0, 1], [2, 3]]
+
+
+@pytest.mark.asyncio
+async def test_batcher_passes_errors_to_every_operation():
+    async def dispatch(operations):
+        raise ConnectionError('gone')
+
+    batcher = Batcher(dispatch, window=0.001)
+    results = await asyncio.gather(
+        batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_aioredis_batches_reads_and_writes(mock_dict):
+    class MockPipeline:
+        calls = []
+
+        def setex(self, *args):
+            self.calls.append(args)
+
+        async def execute(self):
+            return [True] * len(self.calls)
+
+    class MockRedisConnection:
+        pass
+
+    async def mget(*keys):
+        return [ujson.dumps({'key': key}) for key in keys]
+
+    redis_connection = MockRedisConnection()
+    redis_connection.mget = Mock(wraps=mget)
+    redis_connection.pipeline = Mock(return_value=MockPipeline())
+
+    session_interface = AIORedisSessionInterface(
+        redis_connection,
+        pass_dependency_check=True,
+        batch_window=0.01,
+    )
+
+    requests = []
+    for sid in ('a', 'b', 'c'):
+        request = mock_dict()
+        request.cookies = {'session': sid}
+        requests.append(request)
+    sessions = await asyncio.gather(
+        *[session_interface.open(request) for request in requests])
+
+    assert redis_connection.mget.call_count == 1
+    assert [session['key'] for session in sessions] == \
+        ['session:a', 'session:b', 'session:c']
+
+    for request in requests:
+        request['session']['foo'] = 'bar'
+    await asyncio.gather(*[
+        session_interface.save(request, text('foo')) for request in requests])
+
+    assert redis_connection.pipeline.call_count == 1
+    assert [call[0] for call in MockPipeline.calls] == \
+        ['session:a', 'session:b', 'session:c']
@@ -0,0 +1,182 @@
+import time
+
+import pytest
+
+from sanic.response import text
+from sanic_session.cookie import CookieSessionInterface
+from sanic_session.serializers import CompressedSerializer
+
+COOKIE_NAME = 'cookie'
+
+
+@pytest.fixture
+def mock_dict():
+    class MockDict(dict):
+        pass
+
+    return MockDict
+
+
+def make_interface(**kwargs):
+    kwargs.setdefault('secret_keys', ['secret'])
+    return CookieSessionInterface(cookie_name=COOKIE_NAME, **kwargs)
+
+
+async def roundtrip(session_interface, mock_dict, cookies=None, data=None):
+    """Opens a session with `cookies`, updates it with `data` and saves it,
+    returning the session and the response.
+    """
+    request = mock_dict()
+    request.cookies = cookies or {}
+    session = await session_interface.open(request)
+    if data:
+        session.update(data)
+    response = text('foo')
+    await session_interface.save(request, response)
+    return session, response
+
+
+def response_cookies(response):
+    return {name: cookie.value for name, cookie in response.cookies.items()}
+
+
+@pytest.mark.asyncio
+async def test_should_restore_session_from_cookie(mock_dict):
+    session_interface = make_interface()
+    _, response = await roundtrip(
+        session_interface, mock_dict, data={'foo': 'bar'})
+    cookies = response_cookies(response)
+
+    session, _ = await roundtrip(session_interface, mock_dict, cookies)
+    assert session == {'foo': 'bar'}
+
+
+@pytest.mark.asyncio
+async def test_should_not_send_cookie_for_unused_session(mock_dict):
+    _, response = await roundtrip(make_interface(), mock_dict)
+    assert COOKIE_NAME not in response.cookies
+
+
+@pytest.mark.asyncio
+async def test_should_reject_tampered_cookie(mock_dict):
+    session_interface = make_interface()
+    _, response = await roundtrip(
+        session_interface, mock_dict, data={'admin': False})
+    value = response.cookies[COOKIE_NAME].value
+
+    message, _, signature = value.rpartition('.')
+    tampered = message[:-1] + ('A' if message[-1] != 'A' else 'B')
+    session, _ = await roundtrip(
+        session_interface, mock_dict,
+        {COOKIE_NAME: tampered + '.' + signature})
+    assert session == {}
+
+    other_interface = make_interface(secret_keys='other secret')
+    session, _ = await roundtrip(
+        other_interface, mock_dict, {COOKIE_NAME: value})
+    assert session == {}
+
+
+@pytest.mark.asyncio
+async def test_should_accept_cookies_signed_with_old_keys(mock_dict):
+    old_interface = make_interface(secret_keys=['old'])
+    _, response = await roundtrip(
+        old_interface, mock_dict, data={'foo': 'bar'})
+
+    session_interface = make_interface(secret_keys=['new', 'old'])
+    session, response = await roundtrip(
+        session_interface, mock_dict, response_cookies(response))
+    assert session == {'foo': 'bar'}
+
+    # the session is signed again with the new key
+    session, _ = await roundtrip(
+        make_interface(secret_keys=['new']), mock_dict,
+        response_cookies(response))
+    assert session == {'foo': 'bar'}
+
+
+@pytest.mark.asyncio
+async def test_should_reject_expired_cookie(mocker, mock_dict):
+    session_interface = make_interface(expiry=60)
+    _, response = await roundtrip(
+        session_interface, mock_dict, data={'foo': 'bar'})
+
+    now = time.time()
+    mocker.patch('time.time', return_value=now + 120)
+    session, _ = await roundtrip(
+        session_interface, mock_dict, response_cookies(response))
+    assert session == {}
+
+
+@pytest.mark.asyncio
+async def test_should_split_large_session_into_cookies(mock_dict):
+    session_interface = make_interface(max_cookie_size=100, max_cookies=10)
+    data = {'foo': 'x' * 300}
+    _, response = await roundtrip(session_interface, mock_dict, data=data)
+    cookies = response_cookies(response)
+
+    assert cookies[COOKIE_NAME].startswith('*')
+    assert all(len(value) <= 100 for value in cookies.values())
+    session, _ = await roundtrip(session_interface, mock_dict, cookies)
+    assert session == data
+
+    # a smaller session expires the chunk cookies which aren't needed
+    _, response = await roundtrip(
+        session_interface, mock_dict, cookies, data={'foo': 'bar'})
+    assert response.cookies[COOKIE_NAME + '-1']['max-age'] == 0
+    assert not response.cookies[COOKIE_NAME].value.startswith('*')
+
+
+@pytest.mark.asyncio
+async def test_should_refuse_session_over_size_limit(mock_dict):
+    session_interface = make_interface(max_cookie_size=100, max_cookies=2)
+    with pytest.raises(ValueError):
+        await roundtrip(
+            session_interface, mock_dict, data={'foo': 'x' * 300})
+
+    session_interface.serializer = CompressedSerializer(threshold=0)
+    await roundtrip(session_interface, mock_dict, data={'foo': 'x' * 300})
+
+
+@pytest.mark.asyncio
+async def test_should_delete_cookie_of_emptied_session(mock_dict):
+    session_interface = make_interface()
+    _, response = await roundtrip(
+        session_interface, mock_dict, data={'foo': 'bar'})
+
+    request = mock_dict()
+    request.cookies = response_cookies(response)
+    session = await session_interface.open(request)
+    session.clear()
+    response = text('foo')
+    await session_interface.save(request, response)
+
+    assert response.cookies[COOKIE_NAME]['max-age'] == 0
+
+
+@pytest.mark.asyncio
+async def test_should_encrypt_session(mock_dict):
+    pytest.importorskip('cryptography')
+    session_interface = make_interface(encrypt=True)
+    _, response = await roundtrip(
+        session_interface, mock_dict, data={'secret': 'value'})
+    cookies = response_cookies(response)
+
+    assert b'value' not in str(cookies).encode()
+    session, _ = await roundtrip(session_interface, mock_dict, cookies)
+    assert session == {'secret': 'value'}
+
+
+def test_install_middleware_accepts_cookie_interface():
+    from sanic import Sanic
+    from sanic_session import install_middleware
+    from sanic_session.base import BaseSessionInterface
+
+    app = Sanic('test_cookie')
+    session_interface = make_interface()
+    install_middleware(app, session_interface)
+
+    assert not isinstance(session_interface, BaseSessionInterface)
+    assert app.extensions['session'] is session_interface
+    assert len(app.request_middleware) == 1
+    assert len(app.response_middleware) == 1
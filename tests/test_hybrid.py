@@ -0,0 +1,116 @@
+import pytest
+
+from sanic.response import text
+from sanic_session.hybrid import HybridSessionInterface
+from sanic_session.in_memory import InMemorySessionInterface
+
+COOKIE_NAME = 'cookie'
+
+
+@pytest.fixture
+def mock_dict():
+    class MockDict(dict):
+        pass
+
+    return MockDict
+
+
+def make_interface(**kwargs):
+    backend = InMemorySessionInterface(cookie_name=COOKIE_NAME)
+    return HybridSessionInterface(backend, 'secret', **kwargs)
+
+
+async def roundtrip(session_interface, mock_dict, cookies=None, data=None):
+    request = mock_dict()
+    request.cookies = cookies or {}
+    session = await session_interface.open(request)
+    if data:
+        session.update(data)
+    response = text('foo')
+    await session_interface.save(request, response)
+    return session, response
+
+
+def response_cookies(response):
+    return {name: cookie.value for name, cookie in response.cookies.items()}
+
+
+@pytest.mark.asyncio
+async def test_should_take_settings_from_backend():
+    session_interface = make_interface()
+    assert session_interface.cookie_name == COOKIE_NAME
+    assert session_interface.prefix == 'session:'
+
+
+@pytest.mark.asyncio
+async def test_should_keep_small_session_in_cookie(mock_dict):
+    session_interface = make_interface(threshold=200)
+    _, response = await roundtrip(
+        session_interface, mock_dict, data={'foo': 'bar'})
+
+    assert len(session_interface.backend.session_store) == 0
+    session, _ = await roundtrip(
+        session_interface, mock_dict, response_cookies(response))
+    assert session == {'foo': 'bar'}
+
+
+@pytest.mark.asyncio
+async def test_should_move_large_session_to_backend(mock_dict):
+    session_interface = make_interface(threshold=200)
+    _, response = await roundtrip(
+        session_interface, mock_dict, data={'foo': 'bar'})
+
+    session, response = await roundtrip(
+        session_interface, mock_dict, response_cookies(response),
+        data={'big': 'x' * 300})
+    sid = response.cookies[COOKIE_NAME].value
+
+    assert session.sid == sid
+    assert session_interface.backend.session_store.get(
+        'session:' + sid) is not None
+
+    session, _ = await roundtrip(
+        session_interface, mock_dict, {COOKIE_NAME: sid})
+    assert session == {'foo': 'bar', 'big': 'x' * 300}
+
+
+@pytest.mark.asyncio
+async def test_should_delete_emptied_session_from_backend(mock_dict):
+    session_interface = make_interface(threshold=200)
+    _, response = await roundtrip(
+        session_interface, mock_dict, data={'big': 'x' * 300})
+    sid = response.cookies[COOKIE_NAME].value
+
+    request = mock_dict()
+    request.cookies = {COOKIE_NAME: sid}
+    session = await session_interface.open(request)
+    session.clear()
+    response = text('foo')
+    await session_interface.save(request, response)
+
+    assert session_interface.backend.session_store.get(
+        'session:' + sid) is None
+    assert response.cookies[COOKIE_NAME]['max-age'] == 0
+
+
+@pytest.mark.asyncio
+async def test_unknown_session_id_gives_new_session(mock_dict):
+    session, _ = await roundtrip(
+        make_interface(), mock_dict, {COOKIE_NAME: 'unknown'})
+    assert session == {}
+    assert session.sid is None
+
+
+@pytest.mark.asyncio
+async def test_should_only_read_backend_for_session_ids(mocker, mock_dict):
+    session_interface = make_interface()
+    load_session = mocker.spy(session_interface.backend, '_load_session')
+
+    for value in ('unknown', 'a' * 32 + '.sig', 'A' * 32):
+        session, _ = await roundtrip(
+            session_interface, mock_dict, {COOKIE_NAME: value})
+        assert session == {}
+    assert load_session.call_count == 0
+
+    await roundtrip(session_interface, mock_dict, {COOKIE_NAME: 'a' * 32})
+    assert load_session.call_count == 1
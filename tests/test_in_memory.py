@@ -28,9 +28,13 @@ async def test_should_create_new_sid_if_no_cookie(mocker, mock_dict):
     session_interface = InMemorySessionInterface()
     await session_interface.open(request)
 
-    assert uuid.uuid4.call_count == 1, 'should create a new SID with uuid'
+    assert uuid.uuid4.call_count == 0, 'should not create a SID before write'
     assert request['session'] == {}, 'should return an empty dict as session'
 
+    request['session']['foo'] = 'bar'
+    assert uuid.uuid4.call_count == 1, 'should create a new SID with uuid'
+    assert request['session'].sid is not None
+
 
 @pytest.mark.asyncio
 async def test_should_return_data_from_session_store(mocker, mock_dict):
@@ -239,3 +243,316 @@ async def test_sessioncookie_delete_has_expiration_headers(mocker, mock_dict):
 
     assert response.cookies[COOKIE_NAME]['max-age'] == 0
     assert response.cookies[COOKIE_NAME]['expires'] == 0
+
+
+@pytest.mark.asyncio
+async def test_sweep_evicts_expired_sessions_in_batches():
+    session_interface = InMemorySessionInterface(
+        sweep_interval=None, sweep_batch_size=3)
+    for i in range(10):
+        session_interface.session_store.set(
+            'session:{}'.format(i), '{"foo":1}', -1)
+    session_interface.session_store.set('session:live', '{"foo":1}', 300)
+
+    evicted = await session_interface.sweep()
+
+    assert evicted == 10
+    assert list(session_interface.session_store) == ['session:live']
+    assert session_interface.sweep_stats['passes'] == 1
+    assert session_interface.sweep_stats['last_evicted'] == 10
+    assert session_interface.sweep_stats['last_duration'] >= 0
+
+
+@pytest.mark.asyncio
+async def test_sweeper_starts_with_first_stored_session():
+    session_interface = InMemorySessionInterface(sweep_interval=60)
+    assert session_interface._sweeper is None
+
+    await session_interface._set_value('session:{}'.format(SID), '{}')
+
+    assert session_interface._sweeper is not None
+    session_interface._sweeper.cancel()
+
+
+@pytest.mark.asyncio
+async def test_max_sessions_caps_the_store():
+    session_interface = InMemorySessionInterface(
+        max_sessions=2, sweep_interval=None)
+    for i in range(5):
+        await session_interface._set_value('session:{}'.format(i), '{}')
+
+    assert len(session_interface.session_store) == 2
+    assert session_interface.session_store.evictions == 3
+
+
+@pytest.mark.asyncio
+async def test_should_not_persist_unwritten_new_session(mocker, mock_dict):
+    request = mock_dict()
+    request.cookies = {}
+
+    session_interface = InMemorySessionInterface()
+    session_interface.session_store.set = mocker.MagicMock()
+    session_interface.session_store.delete = mocker.MagicMock()
+
+    await session_interface.open(request)
+    response = text('foo')
+    await session_interface.save(request, response)
+
+    assert session_interface.session_store.set.call_count == 0
+    assert session_interface.session_store.delete.call_count == 0
+    assert 'session' not in response.cookies
+
+
+@pytest.mark.asyncio
+async def test_should_persist_new_session_on_first_write(mock_dict):
+    request = mock_dict()
+    request.cookies = {}
+
+    session_interface = InMemorySessionInterface(sweep_interval=None)
+
+    await session_interface.open(request)
+    request['session']['foo'] = 'bar'
+    response = text('foo')
+    await session_interface.save(request, response)
+
+    sid = request['session'].sid
+    assert response.cookies['session'].value == sid
+    assert ujson.loads(session_interface.session_store.get(
+        'session:{}'.format(sid))) == {'foo': 'bar'}
+
+
+@pytest.mark.asyncio
+async def test_should_save_nested_changes_when_tracked(mocker, mock_dict):
+    request = mock_dict()
+    request.cookies = COOKIES
+
+    session_interface = InMemorySessionInterface(
+        cookie_name=COOKIE_NAME, only_save_modified=True,
+        track_nested=True, sweep_interval=None)
+    session_interface.session_store.get = mocker.MagicMock(
+        return_value=ujson.dumps({'cart': [1]}))
+    session_interface.session_store.set = mocker.MagicMock()
+
+    await session_interface.open(request)
+    request['session']['cart'].append(2)
+    await session_interface.save(request, text('foo'))
+
+    session_interface.session_store.set.assert_called_with(
+        'session:{}'.format(SID), ujson.dumps({'cart': [1, 2]}), 2592000)
+
+
+@pytest.mark.asyncio
+async def test_write_behind_merges_saves(mocker, mock_dict):
+    session_interface = InMemorySessionInterface(
+        cookie_name=COOKIE_NAME, write_behind_delay=60, sweep_interval=None)
+    session_interface.session_store.set = mocker.MagicMock()
+
+    for value in ('bar', 'baz'):
+        request = mock_dict()
+        request.cookies = COOKIES
+        await session_interface.open(request)
+        request['session']['foo'] = value
+        await session_interface.save(request, text('foo'))
+
+    assert session_interface.session_store.set.call_count == 0
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    session = await session_interface.open(request)
+    assert session == {'foo': 'baz'}, 'should read delayed writes'
+
+    await session_interface.flush()
+
+    assert session_interface.session_store.set.call_count == 1
+    session_interface.session_store.set.assert_called_with(
+        'session:{}'.format(SID), ujson.dumps({'foo': 'baz'}), 2592000)
+    assert session_interface._flush_handle is None
+
+
+@pytest.mark.asyncio
+async def test_write_behind_flushes_after_delay(mock_dict):
+    import asyncio
+
+    session_interface = InMemorySessionInterface(
+        cookie_name=COOKIE_NAME, write_behind_delay=0.01, sweep_interval=None)
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    await session_interface.open(request)
+    request['session']['foo'] = 'bar'
+    await session_interface.save(request, text('foo'))
+    await asyncio.sleep(0.05)
+
+    assert session_interface.session_store.get(
+        'session:{}'.format(SID)) == ujson.dumps({'foo': 'bar'})
+
+
+@pytest.mark.asyncio
+async def test_write_behind_keeps_failed_writes(mocker, mock_dict):
+    session_interface = InMemorySessionInterface(
+        cookie_name=COOKIE_NAME, write_behind_delay=60, sweep_interval=None)
+    store_set = session_interface.session_store.set
+
+    def flaky_set(key, val, expiry):
+        if key == 'session:a':
+            raise ConnectionError()
+        store_set(key, val, expiry)
+
+    session_interface.session_store.set = mocker.MagicMock(
+        side_effect=flaky_set)
+
+    for sid in ('a', 'b'):
+        request = mock_dict()
+        request.cookies = {COOKIE_NAME: sid}
+        await session_interface.open(request)
+        request['session']['foo'] = sid
+        await session_interface.save(request, text('foo'))
+
+    await session_interface.flush()
+
+    assert session_interface.session_store.get('session:b') is not None
+    assert session_interface._pending_writes == {
+        'session:a': ujson.dumps({'foo': 'a'})}, 'should retry failed writes'
+    assert session_interface._flush_handle is not None
+    session_interface._flush_handle.cancel()
+
+    session_interface.session_store.set = store_set
+    await session_interface.flush()
+    assert session_interface.session_store.get('session:a') == \
+        ujson.dumps({'foo': 'a'})
+
+
+@pytest.mark.asyncio
+async def test_flush_waits_for_running_timed_flush(mock_dict):
+    import asyncio
+
+    session_interface = InMemorySessionInterface(
+        cookie_name=COOKIE_NAME, write_behind_delay=60, sweep_interval=None)
+    store_set = session_interface.session_store.set
+    attempts = []
+
+    async def slow_set_value(key, data):
+        attempts.append(key)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise ConnectionError()
+        store_set(key, data, session_interface.expiry)
+
+    session_interface._set_value = slow_set_value
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    await session_interface.open(request)
+    request['session']['foo'] = 'bar'
+    await session_interface.save(request, text('foo'))
+
+    # the timer fires while the server starts to stop
+    session_interface._flush_handle.cancel()
+    session_interface._start_flush()
+    await asyncio.sleep(0)
+    await session_interface.flush()
+
+    assert attempts == ['session:{}'.format(SID)] * 2, \
+        'should retry the failed write of the timed flush'
+    assert session_interface.session_store.get(
+        'session:{}'.format(SID)) == ujson.dumps({'foo': 'bar'})
+    assert not session_interface._pending_writes
+
+
+def test_install_middleware_flushes_before_server_stop():
+    from sanic import Sanic
+    from sanic_session import install_middleware
+
+    app = Sanic('test_write_behind')
+    install_middleware(app, 'InMemorySessionInterface', write_behind_delay=1)
+
+    assert len(app.listeners['before_server_stop']) == 1
+
+
+@pytest.fixture
+def mock_app():
+    from unittest.mock import Mock
+
+    app = Mock()
+    app.listeners = {}
+
+    def listener(event):
+        def register(func):
+            app.listeners[event] = func
+            return func
+        return register
+
+    app.listener = listener
+    return app
+
+
+@pytest.mark.asyncio
+async def test_should_restore_sessions_from_snapshot(mocker, mock_app, tmpdir):
+    path = str(tmpdir.join('sessions.snapshot'))
+    session_interface = InMemorySessionInterface(
+        app=mock_app, snapshot_path=path, snapshot_interval=None)
+    session_interface.session_store.set('session:a', ujson.dumps({'a': 1}), 100)
+    session_interface.session_store.set('session:b', b'\x00binary', 100)
+    session_interface.session_store.set('session:c', ujson.dumps({}), 10)
+    await mock_app.listeners['after_server_stop'](mock_app, None)
+
+    restarted = InMemorySessionInterface(
+        app=mock_app, snapshot_path=path, snapshot_interval=None)
+    now = time.time()
+    mocker.patch('time.time', return_value=now + 50)
+    await mock_app.listeners['before_server_start'](mock_app, None)
+
+    store = restarted.session_store
+    assert store.get('session:a') == ujson.dumps({'a': 1})
+    assert store.get('session:b') == b'\x00binary'
+    assert 'session:c' not in store, 'should skip expired sessions'
+    assert 49 < store.expiry_times['session:a'] - now <= 100
+
+
+@pytest.mark.asyncio
+async def test_should_start_without_snapshot(mock_app, tmpdir):
+    session_interface = InMemorySessionInterface(
+        app=mock_app, snapshot_path=str(tmpdir.join('missing')),
+        snapshot_interval=None)
+    assert await session_interface.load_snapshot() == 0
+
+
+def test_snapshot_path_requires_app():
+    with pytest.raises(ValueError):
+        InMemorySessionInterface(snapshot_path='sessions.snapshot')
+
+
+@pytest.mark.asyncio
+async def test_final_snapshot_waits_for_cancelled_one(mock_app, tmpdir):
+    import asyncio
+
+    path = str(tmpdir.join('sessions.snapshot'))
+    session_interface = InMemorySessionInterface(
+        app=mock_app, snapshot_path=path, snapshot_interval=None)
+    for i in range(20000):
+        session_interface.session_store.set(
+            'session:{}'.format(i), 'x' * 100, 100)
+
+    periodic = asyncio.ensure_future(session_interface.snapshot())
+    await asyncio.sleep(0)
+    periodic.cancel()
+    assert await session_interface.snapshot() == 20000
+
+    assert tmpdir.listdir() == [tmpdir.join('sessions.snapshot')], \
+        'should leave no temporary files'
+
+
+@pytest.mark.asyncio
+async def test_should_stop_sweeper_when_server_stops(mock_app):
+    import asyncio
+
+    session_interface = InMemorySessionInterface(app=mock_app)
+    await session_interface._set_value('session:a', ujson.dumps({'a': 1}))
+    sweeper = session_interface._sweeper
+
+    assert 'before_server_start' not in mock_app.listeners
+    await mock_app.listeners['after_server_stop'](mock_app, None)
+    await asyncio.sleep(0)
+
+    assert sweeper.cancelled()
+    assert session_interface._sweeper is None
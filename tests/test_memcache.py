@@ -50,9 +50,13 @@ async def test_memcache_should_create_new_sid_if_no_cookie(
     )
     await session_interface.open(request)
 
-    assert uuid.uuid4.call_count == 1, 'should create a new SID with uuid'
+    assert uuid.uuid4.call_count == 0, 'should not create a SID before write'
     assert request['session'] == {}, 'should return an empty dict as session'
 
+    request['session']['foo'] = 'bar'
+    assert uuid.uuid4.call_count == 1, 'should create a new SID with uuid'
+    assert request['session'].sid is not None
+
 
 @pytest.mark.asyncio
 async def test_should_return_data_from_memcache(
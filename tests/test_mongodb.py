@@ -0,0 +1,303 @@
+import ujson
+
+import pytest
+from unittest.mock import Mock
+
+from sanic.response import text
+import sanic_session.mongodb
+from sanic_session.mongodb import MongoDBSessionInterface
+
+SID = '5235262626'
+COOKIE_NAME = 'cookie'
+COOKIES = {COOKIE_NAME: SID}
+
+
+@pytest.fixture
+def mock_dict():
+    class MockDict(dict):
+        pass
+
+    return MockDict
+
+
+@pytest.fixture
+def mock_app():
+    app = Mock()
+    app.listeners = {}
+
+    def listener(event):
+        def register(func):
+            app.listeners[event] = func
+            return func
+        return register
+
+    app.listener = listener
+    return app
+
+
+def mock_coroutine(return_value=None):
+    async def mock_coro(*args, **kwargs):
+        return return_value
+
+    return Mock(wraps=mock_coro)
+
+
+@pytest.fixture
+def mock_model(mocker):
+    class MockSessionModel:
+        find_one = mock_coroutine()
+        replace_one = mock_coroutine()
+        delete_one = mock_coroutine()
+        update_one = mock_coroutine()
+        create_index = mock_coroutine()
+        index_information = mock_coroutine({'_id_': {}})
+        drop_index = mock_coroutine()
+
+    mocker.patch.object(sanic_session.mongodb, '_SessionModel', MockSessionModel)
+    return MockSessionModel
+
+
+@pytest.mark.asyncio
+async def test_should_return_data_from_mongodb(
+        mock_app, mock_model, mock_dict):
+    request = mock_dict()
+    request.cookies = COOKIES
+    mock_model.find_one = mock_coroutine(
+        {'data': ujson.dumps({'foo': 'bar'})})
+
+    session_interface = MongoDBSessionInterface(
+        mock_app, cookie_name=COOKIE_NAME, pass_dependency_check=True)
+    session = await session_interface.open(request)
+
+    assert session.get('foo') == 'bar'
+    mock_model.find_one.assert_called_with(
+        {'sid': SID}, {'data': 1, '_id': 0}, as_raw=True)
+
+
+@pytest.mark.asyncio
+async def test_should_return_empty_session_if_absent(
+        mock_app, mock_model, mock_dict):
+    request = mock_dict()
+    request.cookies = COOKIES
+
+    session_interface = MongoDBSessionInterface(
+        mock_app, cookie_name=COOKIE_NAME, pass_dependency_check=True)
+    session = await session_interface.open(request)
+
+    assert session == {}
+
+
+@pytest.mark.asyncio
+async def test_should_upsert_session_by_sid(mock_app, mock_model, mock_dict):
+    request = mock_dict()
+    request.cookies = COOKIES
+    response = text('foo')
+
+    session_interface = MongoDBSessionInterface(
+        mock_app, cookie_name=COOKIE_NAME, pass_dependency_check=True)
+    await session_interface.open(request)
+    request['session']['foo'] = 'bar'
+    await session_interface.save(request, response)
+
+    (query, document), kwargs = mock_model.replace_one.call_args
+    assert query == {'sid': SID}
+    assert document['data'] == {'foo': 'bar'}
+    assert kwargs == {'upsert': True}
+    assert response.cookies[COOKIE_NAME].value == SID
+
+
+@pytest.mark.asyncio
+async def test_should_create_unique_sid_index(mock_app, mock_model):
+    MongoDBSessionInterface(mock_app, pass_dependency_check=True)
+    await mock_app.listeners['after_server_start'](mock_app, None)
+
+    mock_model.create_index.assert_any_call('sid', unique=True)
+    mock_model.create_index.assert_any_call('expiry', expireAfterSeconds=0)
+    assert mock_model.drop_index.call_count == 0
+
+
+@pytest.mark.asyncio
+async def test_should_replace_non_unique_sid_index(mock_app, mock_model):
+    mock_model.index_information = mock_coroutine(
+        {'_id_': {}, 'sid_1': {'key': [('sid', 1)]}})
+    MongoDBSessionInterface(mock_app, pass_dependency_check=True)
+    await mock_app.listeners['after_server_start'](mock_app, None)
+
+    mock_model.drop_index.assert_called_once_with('sid_1')
+    mock_model.create_index.assert_any_call('sid', unique=True)
+
+
+@pytest.mark.asyncio
+async def test_should_fall_back_to_non_unique_index_with_duplicates(
+        mock_app, mock_model):
+    class DuplicateKeyError(Exception):
+        code = 11000
+
+    async def create_index(keys, **kwargs):
+        if kwargs.get('unique'):
+            raise DuplicateKeyError()
+
+    mock_model.create_index = Mock(wraps=create_index)
+    MongoDBSessionInterface(mock_app, pass_dependency_check=True)
+    await mock_app.listeners['after_server_start'](mock_app, None)
+
+    mock_model.create_index.assert_any_call('sid')
+    mock_model.create_index.assert_any_call('expiry', expireAfterSeconds=0)
+
+
+def test_should_respect_httponly(mock_app, mock_model):
+    session_interface = MongoDBSessionInterface(
+        mock_app, httponly=False, pass_dependency_check=True)
+
+    assert session_interface.httponly is False
+
+
+@pytest.mark.asyncio
+async def test_should_update_only_changed_fields(
+        mock_app, mock_model, mock_dict):
+    request = mock_dict()
+    request.cookies = COOKIES
+    mock_model.find_one = mock_coroutine(
+        {'data': {'foo': 'bar', 'count': 1, 'old': True}})
+    mock_model.update_one = mock_coroutine(Mock(matched_count=1))
+
+    session_interface = MongoDBSessionInterface(
+        mock_app, cookie_name=COOKIE_NAME, pass_dependency_check=True)
+    session = await session_interface.open(request)
+    assert session == {'foo': 'bar', 'count': 1, 'old': True}
+
+    session['count'] += 1
+    del session['old']
+    await session_interface.save(request, text('foo'))
+
+    (query, update), _ = mock_model.update_one.call_args
+    assert query == {'sid': SID}
+    assert update['$set']['data.count'] == 2
+    assert 'expiry' in update['$set']
+    assert 'data.foo' not in update['$set']
+    assert update['$unset'] == {'data.old': ''}
+    assert mock_model.replace_one.call_count == 0
+
+
+@pytest.mark.asyncio
+async def test_should_rewrite_sessions_stored_as_strings(
+        mock_app, mock_model, mock_dict):
+    request = mock_dict()
+    request.cookies = COOKIES
+    mock_model.find_one = mock_coroutine({'data': ujson.dumps({'foo': 'bar'})})
+
+    session_interface = MongoDBSessionInterface(
+        mock_app, cookie_name=COOKIE_NAME, pass_dependency_check=True)
+    session = await session_interface.open(request)
+    assert session == {'foo': 'bar'}
+
+    session['baz'] = 1
+    await session_interface.save(request, text('foo'))
+
+    assert mock_model.update_one.call_count == 0
+    (_, document), _ = mock_model.replace_one.call_args
+    assert document['data'] == {'foo': 'bar', 'baz': 1}
+
+
+@pytest.mark.asyncio
+async def test_should_rewrite_document_for_unsafe_keys(
+        mock_app, mock_model, mock_dict):
+    request = mock_dict()
+    request.cookies = COOKIES
+    mock_model.find_one = mock_coroutine({'data': {'foo': 'bar'}})
+
+    session_interface = MongoDBSessionInterface(
+        mock_app, cookie_name=COOKIE_NAME, pass_dependency_check=True)
+    session = await session_interface.open(request)
+    session['a.b'] = 1
+    await session_interface.save(request, text('foo'))
+
+    assert mock_model.update_one.call_count == 0
+    (_, document), _ = mock_model.replace_one.call_args
+    assert document['data'] == {'foo': 'bar', 'a.b': 1}
+
+
+@pytest.mark.asyncio
+async def test_should_rewrite_document_which_expired(
+        mock_app, mock_model, mock_dict):
+    request = mock_dict()
+    request.cookies = COOKIES
+    mock_model.find_one = mock_coroutine({'data': {'foo': 'bar'}})
+    mock_model.update_one = mock_coroutine(Mock(matched_count=0))
+
+    session_interface = MongoDBSessionInterface(
+        mock_app, cookie_name=COOKIE_NAME, pass_dependency_check=True)
+    session = await session_interface.open(request)
+    session['baz'] = 1
+    await session_interface.save(request, text('foo'))
+
+    (_, document), _ = mock_model.replace_one.call_args
+    assert document['data'] == {'foo': 'bar', 'baz': 1}
+
+
+@pytest.mark.asyncio
+async def test_should_store_non_string_keys_as_strings(
+        mock_app, mock_model, mock_dict):
+    request = mock_dict()
+    request.cookies = COOKIES
+    mock_model.find_one = mock_coroutine({'data': {'foo': 'bar'}})
+
+    session_interface = MongoDBSessionInterface(
+        mock_app, cookie_name=COOKIE_NAME, pass_dependency_check=True)
+    session = await session_interface.open(request)
+    session[1] = 'x'
+    await session_interface.save(request, text('foo'))
+
+    assert mock_model.update_one.call_count == 0
+    (_, document), _ = mock_model.replace_one.call_args
+    assert document['data'] == {'foo': 'bar', '1': 'x'}
+
+
+@pytest.mark.asyncio
+async def test_should_store_nested_non_string_keys_as_strings(
+        mock_app, mock_model, mock_dict):
+    request = mock_dict()
+    request.cookies = COOKIES
+    mock_model.find_one = mock_coroutine({'data': {'foo': 'bar'}})
+    mock_model.update_one = mock_coroutine(Mock(matched_count=1))
+
+    session_interface = MongoDBSessionInterface(
+        mock_app, cookie_name=COOKIE_NAME, pass_dependency_check=True)
+    session = await session_interface.open(request)
+    session['cart'] = {1: 2, 'items': [{3: 4}]}
+    await session_interface.save(request, text('foo'))
+
+    (_, update), _ = mock_model.update_one.call_args
+    assert update['$set']['data.cart'] == {'1': 2, 'items': [{'3': 4}]}
+
+    session[5] = {6: 7}
+    await session_interface.save(request, text('foo'))
+    (_, document), _ = mock_model.replace_one.call_args
+    assert document['data'] == {
+        'foo': 'bar', 'cart': {'1': 2, 'items': [{'3': 4}]}, '5': {'6': 7}}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_opens_do_not_share_nested_values(
+        mock_app, mock_model, mock_dict):
+    import asyncio
+
+    mock_model.find_one = mock_coroutine({'data': {'cart': ['a']}})
+    session_interface = MongoDBSessionInterface(
+        mock_app, cookie_name=COOKIE_NAME, pass_dependency_check=True)
+
+    requests = [mock_dict(), mock_dict()]
+    for request in requests:
+        request.cookies = COOKIES
+    first, second = await asyncio.gather(*[
+        session_interface.open(request) for request in requests])
+    first['cart'].append('b')
+
+    assert mock_model.find_one.call_count == 1
+    assert second['cart'] == ['a']
+
+
+def test_should_reject_write_behind(mock_app, mock_model):
+    with pytest.raises(ValueError):
+        MongoDBSessionInterface(
+            mock_app, write_behind_delay=1, pass_dependency_check=True)
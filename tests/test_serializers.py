@@ -0,0 +1,101 @@
+import pytest
+import ujson
+
+from sanic.response import text
+from sanic_session.in_memory import InMemorySessionInterface
+from sanic_session.serializers import (
+    JSONSerializer, OrjsonSerializer, MsgpackSerializer,
+    CompressedSerializer,
+)
+
+
+DATA = {'foo': 'bar', 'cart': [1, 2, 3], 'nested': {'flag': True}}
+
+
+@pytest.fixture
+def mock_dict():
+    class MockDict(dict):
+        pass
+
+    return MockDict
+
+
+def test_json_round_trip():
+    serializer = JSONSerializer()
+    value = serializer.dumps(DATA)
+
+    assert value == ujson.dumps(DATA)
+    assert serializer.loads(value) == DATA
+    assert serializer.loads(value.encode()) == DATA
+
+
+def test_orjson_round_trip_on_bytes():
+    pytest.importorskip('orjson')
+    serializer = OrjsonSerializer()
+    value = serializer.dumps(DATA)
+
+    assert isinstance(value, bytes)
+    assert serializer.loads(value) == DATA
+
+
+def test_orjson_reads_values_stored_by_json_serializer():
+    pytest.importorskip('orjson')
+
+    assert OrjsonSerializer().loads(JSONSerializer().dumps(DATA)) == DATA
+
+
+def test_msgpack_round_trip_on_bytes():
+    pytest.importorskip('msgpack')
+    serializer = MsgpackSerializer()
+    value = serializer.dumps(DATA)
+
+    assert isinstance(value, bytes)
+    assert serializer.loads(value) == DATA
+
+
+@pytest.mark.asyncio
+async def test_interface_uses_given_serializer(mock_dict):
+    pytest.importorskip('orjson')
+    session_interface = InMemorySessionInterface(
+        serializer=OrjsonSerializer(), sweep_interval=None)
+
+    request = mock_dict()
+    request.cookies = {}
+    await session_interface.open(request)
+    request['session'].update(DATA)
+    await session_interface.save(request, text('foo'))
+
+    sid = request['session'].sid
+    stored = session_interface.session_store.get('session:' + sid)
+    assert isinstance(stored, bytes)
+
+    request = mock_dict()
+    request.cookies = {'session': sid}
+    session = await session_interface.open(request)
+    assert session == DATA
+
+
+def test_compressed_round_trip():
+    serializer = CompressedSerializer(threshold=100)
+    data = {'cart': ['item {}'.format(i) for i in range(200)]}
+    value = serializer.dumps(data)
+
+    assert value.startswith(CompressedSerializer.MAGIC)
+    assert serializer.loads(value) == data
+    assert serializer.compression_ratio > 1
+
+
+def test_compressed_keeps_small_values_uncompressed():
+    serializer = CompressedSerializer(threshold=100)
+    value = serializer.dumps({'foo': 'bar'})
+
+    assert value == b'{"foo":"bar"}'
+    assert serializer.loads(value) == {'foo': 'bar'}
+    assert serializer.compression_ratio == 1
+
+
+def test_compressed_reads_uncompressed_values():
+    serializer = CompressedSerializer(threshold=100)
+
+    assert serializer.loads(ujson.dumps(DATA)) == DATA
+    assert serializer.loads(ujson.dumps(DATA).encode()) == DATA
@@ -0,0 +1,112 @@
+import uuid
+
+import pytest
+import ujson
+
+from sanic.response import text
+from sanic_session.in_memory import InMemorySessionInterface
+from sanic_session.sharding import HashRing, ShardedSessionInterface
+
+SID = '5235262626'
+COOKIE_NAME = 'cookie'
+COOKIES = {COOKIE_NAME: SID}
+
+
+@pytest.fixture
+def mock_dict():
+    class MockDict(dict):
+        pass
+
+    return MockDict
+
+
+def make_interface(names=('a', 'b', 'c'), **kwargs):
+    shards = {
+        name: InMemorySessionInterface(cookie_name=COOKIE_NAME)
+        for name in names
+    }
+    return ShardedSessionInterface(shards, **kwargs)
+
+
+def test_ring_should_remap_few_keys_when_adding_node():
+    ring = HashRing(['a', 'b', 'c', 'd'])
+    keys = [uuid.uuid4().hex for _ in range(5000)]
+    before = {key: ring.get_node(key) for key in keys}
+
+    ring.add_node('e')
+    moved = [key for key in keys if ring.get_node(key) != before[key]]
+
+    assert all(ring.get_node(key) == 'e' for key in moved), \
+        'keys should only move to the new node'
+    assert 0.1 < len(moved) / len(keys) < 0.3, 'about 1/5 should move'
+
+    ring.remove_node('e')
+    assert all(ring.get_node(key) == before[key] for key in keys)
+
+
+def test_should_reject_shards_with_different_prefixes():
+    with pytest.raises(ValueError):
+        ShardedSessionInterface({
+            'a': InMemorySessionInterface(prefix='a:'),
+            'b': InMemorySessionInterface(prefix='b:'),
+        })
+
+
+@pytest.mark.asyncio
+async def test_should_read_session_from_its_shard(mock_dict):
+    session_interface = make_interface()
+    shard = session_interface.shards[session_interface.ring.get_node(SID)]
+    shard.session_store.set(
+        'session:' + SID, ujson.dumps({'foo': 'bar'}), 100)
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    session = await session_interface.open(request)
+
+    assert session['foo'] == 'bar'
+
+
+@pytest.mark.asyncio
+async def test_should_store_session_on_one_shard(mock_dict):
+    session_interface = make_interface()
+    request = mock_dict()
+    request.cookies = {}
+    await session_interface.open(request)
+    request['session']['foo'] = 'bar'
+    sid = request['session'].sid
+
+    response = text('foo')
+    await session_interface.save(request, response)
+
+    stored = [
+        name for name, shard in session_interface.shards.items()
+        if shard.session_store.get('session:' + sid) is not None
+    ]
+    assert stored == [session_interface.ring.get_node(sid)]
+    assert response.cookies[COOKIE_NAME].value == sid
+
+
+@pytest.mark.asyncio
+async def test_should_embed_shard_hint_in_new_sid(mock_dict):
+    session_interface = make_interface(shard_hint=True)
+    request = mock_dict()
+    request.cookies = {}
+    await session_interface.open(request)
+    request['session']['foo'] = 'bar'
+
+    response = text('foo')
+    await session_interface.save(request, response)
+
+    sid = response.cookies[COOKIE_NAME].value
+    name, _, _ = sid.partition('.')
+    assert name in session_interface.shards
+    assert session_interface.shards[name].session_store.get(
+        'session:' + sid) is not None
+
+    # adding a shard doesn't move hinted sessions
+    session_interface.add_shard(
+        'd', InMemorySessionInterface(cookie_name=COOKIE_NAME))
+    request = mock_dict()
+    request.cookies = {COOKIE_NAME: sid}
+    session = await session_interface.open(request)
+    assert session['foo'] == 'bar'
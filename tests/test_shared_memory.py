@@ -0,0 +1,103 @@
+import multiprocessing
+import time
+
+import pytest
+import ujson
+
+from sanic.response import text
+from sanic_session.shared_memory import (
+    SharedMemoryStore, SharedMemorySessionInterface,
+)
+
+SID = '5235262626'
+COOKIE_NAME = 'cookie'
+COOKIES = {COOKIE_NAME: SID}
+
+
+@pytest.fixture
+def mock_dict():
+    class MockDict(dict):
+        pass
+
+    return MockDict
+
+
+def test_store_should_set_get_and_delete():
+    store = SharedMemoryStore(max_items=100)
+    store.set('foo', 'bar', 60)
+    store.set('baz', b'qux', 60)
+
+    assert store.get('foo') == b'bar'
+    assert store.get('baz') == b'qux'
+    assert len(store) == 2
+
+    store.set('foo', 'longer value', 60)
+    assert store.get('foo') == b'longer value'
+
+    store.delete('foo')
+    assert store.get('foo') is None
+    assert len(store) == 1
+
+
+def test_store_should_expire_and_touch(mocker):
+    store = SharedMemoryStore(max_items=100)
+    store.set('foo', 'bar', 10)
+    store.set('baz', 'qux', 10)
+
+    now = time.time()
+    mocker.patch('time.time', return_value=now + 5)
+    store.touch('baz', 10)
+    mocker.patch('time.time', return_value=now + 11)
+
+    assert store.get('foo') is None
+    assert store.get('baz') == b'qux'
+
+
+def test_store_should_evict_first_expiring_entry_of_full_bucket():
+    store = SharedMemoryStore(max_items=2, bucket_size=2)
+    store.set('a', '1', 30)
+    store.set('b', '2', 10)
+    store.set('c', '3', 20)
+
+    assert store.get('b') is None
+    assert store.get('a') == b'1'
+    assert store.get('c') == b'3'
+    assert store.evictions == 1
+
+
+def test_store_should_refuse_too_large_values():
+    store = SharedMemoryStore(max_items=10, max_value_size=8)
+    with pytest.raises(ValueError):
+        store.set('foo', 'x' * 9, 60)
+
+
+def _write_from_child(store):
+    store.set('session:child', 'written by child', 60)
+
+
+def test_store_should_be_shared_with_forked_processes():
+    context = multiprocessing.get_context('fork')
+    store = SharedMemoryStore(max_items=100)
+
+    process = context.Process(target=_write_from_child, args=(store,))
+    process.start()
+    process.join()
+
+    assert store.get('session:child') == b'written by child'
+
+
+@pytest.mark.asyncio
+async def test_should_save_and_restore_session(mock_dict):
+    session_interface = SharedMemorySessionInterface(cookie_name=COOKIE_NAME)
+    session_interface.session_store.set(
+        'session:' + SID, ujson.dumps({'foo': 'bar'}), 60)
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    session = await session_interface.open(request)
+    assert session == {'foo': 'bar'}
+
+    session['foo'] = 'baz'
+    await session_interface.save(request, text('foo'))
+    assert ujson.loads(session_interface.session_store.get(
+        'session:' + SID)) == {'foo': 'baz'}
@@ -0,0 +1,130 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+import ujson
+
+from sanic.response import text
+from sanic_session.sqlite import SQLiteSessionInterface
+
+SID = '5235262626'
+COOKIE_NAME = 'cookie'
+COOKIES = {COOKIE_NAME: SID}
+
+
+@pytest.fixture
+def mock_dict():
+    class MockDict(dict):
+        pass
+
+    return MockDict
+
+
+@pytest.fixture
+def db_path(tmpdir):
+    return str(tmpdir.join('sessions.sqlite3'))
+
+
+@pytest.mark.asyncio
+async def test_should_survive_restart(mock_dict, db_path):
+    session_interface = SQLiteSessionInterface(db_path, cookie_name=COOKIE_NAME)
+    request = mock_dict()
+    request.cookies = COOKIES
+    session = await session_interface.open(request)
+    session['foo'] = 'bar'
+    await session_interface.save(request, text('foo'))
+    await session_interface.close()
+
+    session_interface = SQLiteSessionInterface(db_path, cookie_name=COOKIE_NAME)
+    request = mock_dict()
+    request.cookies = COOKIES
+    session = await session_interface.open(request)
+    assert session == {'foo': 'bar'}
+    await session_interface.close()
+
+
+@pytest.mark.asyncio
+async def test_should_use_wal_and_expiry_index(db_path):
+    session_interface = SQLiteSessionInterface(db_path)
+    await session_interface._set_value('session:' + SID, ujson.dumps({}))
+    await session_interface.close()
+
+    connection = sqlite3.connect(db_path)
+    assert connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    plan = connection.execute(
+        'EXPLAIN QUERY PLAN DELETE FROM sessions WHERE expires <= 0'
+    ).fetchall()
+    assert 'sessions_expires' in str(plan)
+    connection.close()
+
+
+@pytest.mark.asyncio
+async def test_should_not_return_expired_sessions(mocker, db_path):
+    session_interface = SQLiteSessionInterface(db_path, expiry=10)
+    await session_interface._set_value('session:a', 'a')
+    await session_interface._set_value('session:b', 'b')
+
+    now = time.time()
+    mocker.patch('time.time', return_value=now + 5)
+    await session_interface._touch_key('session:b')
+    mocker.patch('time.time', return_value=now + 11)
+
+    assert await session_interface._get_value('', 'a') is None
+    assert await session_interface._get_value('', 'b') == 'b'
+    assert await session_interface.purge_expired() == 1
+    await session_interface.close()
+
+
+@pytest.mark.asyncio
+async def test_should_delete_session(db_path):
+    session_interface = SQLiteSessionInterface(db_path)
+    await session_interface._set_value('session:' + SID, 'data')
+    await session_interface._delete_key('session:' + SID)
+
+    assert await session_interface._get_value('', SID) is None
+    await session_interface.close()
+
+
+@pytest.mark.asyncio
+async def test_should_commit_concurrent_writes_together(db_path):
+    session_interface = SQLiteSessionInterface(db_path, batch_window=0.01)
+    await asyncio.gather(*[
+        session_interface._set_value('session:{}'.format(i), str(i))
+        for i in range(10)
+    ])
+
+    assert session_interface._set_batcher.batches == 1
+    assert await session_interface._get_value('', '7') == '7'
+    await session_interface.close()
+
+
+@pytest.mark.asyncio
+async def test_should_close_when_server_stops(mock_dict, db_path):
+    from unittest.mock import Mock
+
+    app = Mock()
+    app.listeners = {}
+
+    def listener(event):
+        def register(func):
+            app.listeners[event] = func
+            return func
+        return register
+
+    app.listener = listener
+    session_interface = SQLiteSessionInterface(
+        db_path, cookie_name=COOKIE_NAME, app=app)
+    request = mock_dict()
+    request.cookies = COOKIES
+    session = await session_interface.open(request)
+    session['foo'] = 'bar'
+    await session_interface.save(request, text('foo'))
+    purger = session_interface._purger
+
+    await app.listeners['after_server_stop'](app, None)
+    await asyncio.sleep(0)
+
+    assert purger.cancelled()
+    assert session_interface._connection is None
+    assert session_interface._executor is None
@@ -0,0 +1,214 @@
+import pytest
+import ujson
+from unittest.mock import Mock
+
+from sanic.response import text
+from sanic_session.aioredis import AIORedisSessionInterface
+from sanic_session.tiered import TieredSessionInterface
+
+SID = '5235262626'
+COOKIE_NAME = 'cookie'
+COOKIES = {COOKIE_NAME: SID}
+
+
+@pytest.fixture
+def mock_dict():
+    class MockDict(dict):
+        pass
+
+    return MockDict
+
+
+@pytest.fixture
+def mock_redis():
+    class MockRedisConnection:
+        pass
+
+    return MockRedisConnection
+
+
+def mock_coroutine(return_value=None):
+    async def mock_coro(*args, **kwargs):
+        return return_value
+
+    return Mock(wraps=mock_coro)
+
+
+def make_interface(redis_connection, **kwargs):
+    backend = AIORedisSessionInterface(
+        redis_connection,
+        cookie_name=COOKIE_NAME,
+        pass_dependency_check=True,
+    )
+    return TieredSessionInterface(backend, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_should_take_settings_from_backend(mock_redis):
+    session_interface = make_interface(mock_redis())
+
+    assert session_interface.cookie_name == COOKIE_NAME
+    assert session_interface.prefix == 'session:'
+    assert session_interface.expiry == 2592000
+
+
+@pytest.mark.asyncio
+async def test_should_read_backend_once_for_hot_session(mock_dict, mock_redis):
+    redis_connection = mock_redis()
+    redis_connection.get = mock_coroutine(ujson.dumps({'foo': 'bar'}))
+    session_interface = make_interface(redis_connection)
+
+    for _ in range(3):
+        request = mock_dict()
+        request.cookies = COOKIES
+        session = await session_interface.open(request)
+        assert session == {'foo': 'bar'}
+
+    assert redis_connection.get.call_count == 1
+    assert session_interface.l1_hits == 2
+    assert session_interface.l1_misses == 1
+
+
+@pytest.mark.asyncio
+async def test_should_write_through_to_backend(mock_dict, mock_redis):
+    redis_connection = mock_redis()
+    redis_connection.get = mock_coroutine(ujson.dumps({'foo': 'bar'}))
+    redis_connection.setex = mock_coroutine()
+    session_interface = make_interface(redis_connection)
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    await session_interface.open(request)
+    request['session']['foo'] = 'baz'
+    await session_interface.save(request, text('foo'))
+
+    redis_connection.setex.assert_called_with(
+        'session:{}'.format(SID), 2592000, ujson.dumps({'foo': 'baz'}))
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    session = await session_interface.open(request)
+    assert session == {'foo': 'baz'}
+    assert redis_connection.get.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_should_invalidate_on_keyspace_notification(
+        mock_dict, mock_redis):
+    redis_connection = mock_redis()
+    redis_connection.get = mock_coroutine(ujson.dumps({'foo': 'bar'}))
+    session_interface = make_interface(redis_connection)
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    await session_interface.open(request)
+    assert 'session:{}'.format(SID) in session_interface.l1
+
+    class MockChannel:
+        messages = [(b'__keyspace@0__:session:' + SID.encode(), b'set')]
+
+        async def wait_message(self):
+            return bool(self.messages)
+
+        async def get(self):
+            return self.messages.pop(0)
+
+    subscriber = mock_redis()
+    subscriber.psubscribe = mock_coroutine([MockChannel()])
+    await session_interface.listen_keyspace_notifications(subscriber)
+
+    subscriber.psubscribe.assert_called_with('__keyspace@0__:session:*')
+    assert 'session:{}'.format(SID) not in session_interface.l1
+
+
+@pytest.mark.asyncio
+async def test_should_ignore_notifications_of_own_writes(
+        mock_dict, mock_redis):
+    redis_connection = mock_redis()
+    redis_connection.get = mock_coroutine(ujson.dumps({'foo': 'bar'}))
+    redis_connection.setex = mock_coroutine()
+    session_interface = make_interface(redis_connection)
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    await session_interface.open(request)
+    request['session']['foo'] = 'baz'
+    await session_interface.save(request, text('foo'))
+
+    class MockChannel:
+        messages = [
+            (b'__keyspace@0__:session:' + SID.encode(), b'set'),
+            (b'__keyspace@0__:session:' + SID.encode(), b'expire'),
+        ]
+
+        async def wait_message(self):
+            return bool(self.messages)
+
+        async def get(self):
+            return self.messages.pop(0)
+
+    subscriber = mock_redis()
+    subscriber.psubscribe = mock_coroutine([MockChannel()])
+    await session_interface.listen_keyspace_notifications(subscriber)
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    session = await session_interface.open(request)
+    assert session == {'foo': 'baz'}
+    assert redis_connection.get.call_count == 1
+    assert session_interface.l1_hits == 1
+
+
+@pytest.mark.asyncio
+async def test_should_invalidate_on_other_writes_after_own_write(
+        mock_dict, mock_redis):
+    redis_connection = mock_redis()
+    redis_connection.get = mock_coroutine(ujson.dumps({'foo': 'bar'}))
+    redis_connection.setex = mock_coroutine()
+    session_interface = make_interface(redis_connection)
+
+    request = mock_dict()
+    request.cookies = COOKIES
+    await session_interface.open(request)
+    request['session']['foo'] = 'baz'
+    await session_interface.save(request, text('foo'))
+
+    class MockChannel:
+        # the echo of the own write, then a write of another worker
+        messages = [
+            (b'__keyspace@0__:session:' + SID.encode(), b'set'),
+            (b'__keyspace@0__:session:' + SID.encode(), b'set'),
+        ]
+
+        async def wait_message(self):
+            return bool(self.messages)
+
+        async def get(self):
+            return self.messages.pop(0)
+
+    subscriber = mock_redis()
+    subscriber.psubscribe = mock_coroutine([MockChannel()])
+    await session_interface.listen_keyspace_notifications(subscriber)
+
+    assert 'session:{}'.format(SID) not in session_interface.l1
+
+
+def test_should_reject_hash_mode_backend(mock_redis):
+    backend = AIORedisSessionInterface(
+        mock_redis(), pass_dependency_check=True, use_hash=True)
+
+    with pytest.raises(ValueError):
+        TieredSessionInterface(backend)
+
+
+def test_install_middleware_accepts_interface_instance(mock_redis):
+    from sanic import Sanic
+    from sanic_session import install_middleware
+
+    app = Sanic('test_tiered')
+    session_interface = make_interface(mock_redis())
+    install_middleware(app, session_interface)
+
+    assert app.extensions['session'] is session_interface
+    assert len(app.request_middleware) == 1
+    assert len(app.response_middleware) == 1
@@ -1,4 +1,7 @@
-from sanic_session.utils import ExpiringDict
+import pytest
+
+from sanic_session.base import SessionDict
+from sanic_session.utils import ExpiringDict, BoundedExpiringDict
 
 
 def test_sets_expiry_internally():
@@ -29,3 +32,237 @@ def test_deletes_values():
 
     assert e.get('foo') is None
     assert e.expiry_times.get('foo') is None
+
+
+def test_sweep_evicts_only_expired_values():
+    e = ExpiringDict()
+    e.set('foo', 'bar', -1)
+    e.set('baz', 'qux', 300)
+
+    assert e.has_expired()
+    assert e.sweep() == 1
+    assert 'foo' not in e
+    assert e.expiry_times.get('foo') is None
+    assert e.get('baz') == 'qux'
+    assert not e.has_expired()
+
+
+def test_sweep_skips_keys_set_again_after_indexing():
+    e = ExpiringDict()
+    e.set('foo', 'bar', -1)
+    e.set('foo', 'baz', 300)
+
+    assert e.sweep() == 0
+    assert e.get('foo') == 'baz'
+
+
+def test_sweep_respects_limit():
+    e = ExpiringDict()
+    for i in range(10):
+        e.set(i, 'bar', -1)
+
+    assert e.sweep(limit=4) == 4
+    assert len(e) == 6
+    assert e.has_expired()
+
+
+def test_expiry_index_does_not_grow_with_repeated_sets():
+    e = ExpiringDict()
+    for _ in range(1000):
+        e.set('foo', 'bar', 300)
+
+    assert len(e._expiry_heap) + len(e._compacted_heap or ()) <= \
+        2 * (2 * len(e) + 64)
+
+
+def test_sweep_evicts_entries_of_heap_being_compacted():
+    e = ExpiringDict()
+    for i in range(100):
+        e.set(i, 'bar', 300)
+    e.set('foo', 'bar', -1)
+    for _ in range(200):
+        e.set(0, 'bar', 300)
+
+    assert e._compacted_heap, 'should compact incrementally'
+    assert e.has_expired()
+    assert e.sweep() == 1
+    assert 'foo' not in e
+    assert len(e) == 100
+
+
+def test_bounded_evicts_least_recently_used():
+    e = BoundedExpiringDict(max_items=2)
+    e.set('foo', 'bar', 300)
+    e.set('baz', 'bar', 300)
+    e.get('foo')
+    e.set('qux', 'bar', 300)
+
+    assert set(e) == {'foo', 'qux'}
+    assert e.evictions == 1
+
+
+def test_bounded_evicts_least_frequently_used():
+    e = BoundedExpiringDict(max_items=2, eviction_policy='lfu')
+    e.set('foo', 'bar', 300)
+    e.set('baz', 'bar', 300)
+    e.get('foo')
+    e.get('foo')
+    e.get('baz')
+    e.set('qux', 'bar', 300)
+    e.set('quux', 'bar', 300)
+
+    assert set(e) == {'foo', 'quux'}
+    assert e.evictions == 2
+
+
+def test_bounded_evicts_to_stay_under_max_bytes():
+    e = BoundedExpiringDict(max_bytes=10)
+    e.set('foo', '12345', 300)
+    e.set('baz', '12345', 300)
+    e.set('qux', '123', 300)
+
+    assert set(e) == {'baz', 'qux'}
+    assert e.size_bytes == 8
+
+
+def test_bounded_evicts_other_keys_when_a_value_grows():
+    e = BoundedExpiringDict(max_bytes=10)
+    e.set('foo', '123', 300)
+    e.set('baz', '123', 300)
+    e.set('foo', '12345678', 300)
+
+    assert set(e) == {'foo'}
+    assert e.size_bytes == 8
+    assert e.evictions == 1
+
+
+def test_bounded_rejects_value_over_max_bytes():
+    e = BoundedExpiringDict(max_bytes=10)
+    e.set('foo', '123', 300)
+    e.set('baz', '123', 300)
+
+    with pytest.raises(ValueError):
+        e.set('qux', '12345678901', 300)
+    with pytest.raises(ValueError):
+        e.set('foo', '12345678901', 300)
+
+    assert set(e) == {'foo', 'baz'}
+    assert e.get('foo') == '123'
+    assert e.size_bytes == 6
+    assert e.evictions == 0
+
+
+def test_bounded_lfu_finds_victim_after_removals():
+    e = BoundedExpiringDict(max_items=3, eviction_policy='lfu')
+    e.set('foo', 'bar', 300)
+    e.set('baz', 'bar', 300)
+    e.set('qux', 'bar', 300)
+    e.get('baz')
+    e.get('qux')
+    e.get('qux')
+    e.delete('foo')
+    e.set('foo', 'bar', 300)
+    e.get('foo')
+    e.get('foo')
+    e.get('foo')
+    e.set('quux', 'bar', 300)
+
+    assert set(e) == {'foo', 'qux', 'quux'}
+
+
+def test_bounded_tracks_deletes_and_expiry():
+    e = BoundedExpiringDict(max_items=2)
+    e.set('foo', 'bar', -1)
+    e.set('baz', 'bar', 300)
+    e.sweep()
+    e.delete('baz')
+
+    assert e.size_bytes == 0
+    e.set('qux', 'bar', 300)
+    e.set('quux', 'bar', 300)
+    assert e.evictions == 0
+
+
+def test_bounded_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        BoundedExpiringDict(max_items=2, eviction_policy='fifo')
+
+
+def test_touch_resets_expiry():
+    e = ExpiringDict()
+    e.set('foo', 'bar', 1)
+    expires = e.expiry_times['foo']
+    e.touch('foo', 300)
+
+    assert e.expiry_times['foo'] > expires
+    assert e.get('foo') == 'bar'
+
+
+def test_touch_does_not_revive_expired_values():
+    e = ExpiringDict()
+    e.set('foo', 'bar', -1)
+    e.touch('foo', 300)
+
+    assert e.get('foo') is None
+
+
+def test_session_dict_tracks_changed_and_deleted_keys():
+    session = SessionDict({'foo': 1, 'bar': 2, 'baz': 3}, sid='sid')
+    session['foo'] = 10
+    session.update(qux=4)
+    session.setdefault('quux', 5)
+    session.setdefault('bar', 0)
+    del session['bar']
+    session.pop('baz')
+    session.pop('missing', None)
+
+    assert session.changed_keys == {'foo', 'qux', 'quux'}
+    assert session.deleted_keys == {'bar', 'baz'}
+
+    session['bar'] = 1
+    assert 'bar' in session.changed_keys
+    assert 'bar' not in session.deleted_keys
+
+    session.clear()
+    assert session.changed_keys == set()
+    assert session.deleted_keys == {'foo', 'bar', 'baz', 'qux', 'quux'}
+
+
+def test_session_dict_ignores_no_op_assignments():
+    session = SessionDict({'foo': 1, 'bar': 'baz', 'cart': [1]}, sid='sid')
+    session['foo'] = 1
+    session['bar'] = 'baz'
+    session.update(foo=1, cart=[1])
+
+    assert not session.modified
+    assert session.changed_keys == set()
+
+    session['foo'] = True
+    assert session.modified
+    assert session.changed_keys == {'foo'}
+
+
+def test_session_dict_reassigning_same_object_is_a_change():
+    session = SessionDict({'cart': [1]}, sid='sid')
+    cart = session['cart']
+    cart.append(2)
+    session['cart'] = cart
+
+    assert session.modified
+    assert session.changed_keys == {'cart'}
+
+
+def test_session_dict_collects_nested_changes_when_tracked():
+    session = SessionDict(
+        {'cart': [1], 'prefs': {'a': 1}, 'n': 1}, sid='sid',
+        track_nested=True)
+    session['cart'].append(2)
+    session.collect_nested_changes()
+
+    assert session.modified
+    assert session.changed_keys == {'cart'}
+
+    untracked = SessionDict({'cart': [1]}, sid='sid')
+    untracked['cart'].append(2)
+    untracked.collect_nested_changes()
+    assert not untracked.modified